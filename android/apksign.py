@@ -0,0 +1,369 @@
+"""APK Signature Scheme v2/v3 signing and verification without apksigner"""
+import hashlib
+import mmap
+import os
+import struct
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.hazmat.primitives.serialization import pkcs12
+
+from apkzip import END_RECORD, END_RECORD_SIGNATURE
+from arsc import ArscError, read_min_sdk
+
+# Content digests are computed over 1 MB chunks of the entries, central directory and end record
+CHUNK_SIZE = 1024 * 1024
+DIGEST_WORKERS = min(8, os.cpu_count() or 1)
+
+SIGNING_BLOCK_MAGIC = b"APK Sig Block 42"
+SIGNING_BLOCK_FOOTER = struct.Struct("<Q16s")
+V2_BLOCK_ID = 0x7109871A
+V3_BLOCK_ID = 0xF05368C0
+SCHEME_BLOCK_IDS = {2: V2_BLOCK_ID, 3: V3_BLOCK_ID}
+# v2 attribute telling verifiers that a v3 signature must also be present
+STRIPPING_PROTECTION_ATTR_ID = 0xBEEFF00D
+# v3 signatures apply from Android 9 (P) on
+V3_MIN_SDK = 28
+V3_MAX_SDK = 0x7FFFFFFF
+# Android 7.0 (N) is the first release that verifies v2 signatures; older releases need a v1 (JAR) signature
+V2_MIN_SDK = 24
+
+RSA_PKCS1_SHA256 = 0x0103
+RSA_PKCS1_SHA512 = 0x0104
+ECDSA_SHA256 = 0x0201
+ECDSA_SHA512 = 0x0202
+# Signature algorithm id: (content digest, signature hash, key type)
+SIGNATURE_ALGORITHMS = {
+    RSA_PKCS1_SHA256: ("sha256", hashes.SHA256, rsa.RSAPublicKey),
+    RSA_PKCS1_SHA512: ("sha512", hashes.SHA512, rsa.RSAPublicKey),
+    ECDSA_SHA256: ("sha256", hashes.SHA256, ec.EllipticCurvePublicKey),
+    ECDSA_SHA512: ("sha512", hashes.SHA512, ec.EllipticCurvePublicKey),
+}
+JKS_MAGIC = b"\xfe\xed\xfe\xed"
+
+MAX_EOCD_SEARCH = END_RECORD.size + 0xFFFF
+
+
+class ApkSignError(Exception):
+    """The APK or keystore cannot be signed or verified in-process"""
+
+
+def load_keystore(path, store_password, key_password, alias):
+    """Load the private key and certificate chain of a PKCS#12 keystore as written by keytool"""
+    with open(path, "rb") as file:
+        data = file.read()
+    if data.startswith(JKS_MAGIC):
+        raise ApkSignError(f"{path} is a JKS keystore, only PKCS#12 keystores can be loaded")
+    for password in dict.fromkeys((store_password, key_password)):
+        try:
+            store = pkcs12.load_pkcs12(data, password.encode("UTF-8"))
+            break
+        except ValueError:
+            continue
+    else:
+        raise ApkSignError(f"Cannot open {path} with the configured passwords")
+    if store.key is None or store.cert is None:
+        raise ApkSignError(f"{path} does not contain a private key entry")
+    name = store.cert.friendly_name
+    if name is not None and name.decode("UTF-8").lower() != alias.lower():
+        raise ApkSignError(f"Key alias {alias} not found in {path}")
+    return store.key, [store.cert.certificate] + [cert.certificate for cert in store.additional_certs]
+
+
+def signature_algorithm(key):
+    """Pick the signature algorithm apksigner would use for a key"""
+    if isinstance(key, rsa.RSAPrivateKey):
+        return RSA_PKCS1_SHA256 if key.key_size <= 3072 else RSA_PKCS1_SHA512
+    if isinstance(key, ec.EllipticCurvePrivateKey):
+        return ECDSA_SHA256 if key.key_size <= 256 else ECDSA_SHA512
+    raise ApkSignError(f"Unsupported key type {type(key).__name__}")
+
+
+def length_prefixed(data):
+    return struct.pack("<I", len(data)) + data
+
+
+def length_prefixed_sequence(items):
+    return length_prefixed(b"".join(length_prefixed(item) for item in items))
+
+
+def read_length_prefixed(data, pos):
+    """Return the length-prefixed value at pos and the position after it"""
+    if pos + 4 > len(data):
+        raise ApkSignError("Truncated APK signature block")
+    size, = struct.unpack_from("<I", data, pos)
+    end = pos + 4 + size
+    if end > len(data):
+        raise ApkSignError("Truncated APK signature block")
+    return data[pos + 4:end], end
+
+
+def read_sequence(data):
+    items = []
+    pos = 0
+    while pos < len(data):
+        item, pos = read_length_prefixed(data, pos)
+        items.append(item)
+    return items
+
+
+def find_end_record(view):
+    """Locate the end of central directory record, return (offset, central directory offset, size)"""
+    start = max(0, len(view) - MAX_EOCD_SEARCH)
+    tail = bytes(view[start:])
+    pos = len(tail) - END_RECORD.size
+    while pos >= 0:
+        pos = tail.rfind(struct.pack("<I", END_RECORD_SIGNATURE), 0, pos + 4)
+        if pos < 0:
+            break
+        record = END_RECORD.unpack_from(tail, pos)
+        if pos + END_RECORD.size + record[7] == len(tail):
+            return start + pos, record[6], record[5]
+        pos -= 1
+    raise ApkSignError("Not a zip file: end of central directory record not found")
+
+
+def find_signing_block(view, central_offset):
+    """Return the offset of the APK signing block before the central directory, central_offset if absent"""
+    if central_offset < SIGNING_BLOCK_FOOTER.size:
+        return central_offset
+    size, magic = SIGNING_BLOCK_FOOTER.unpack_from(view, central_offset - SIGNING_BLOCK_FOOTER.size)
+    if magic != SIGNING_BLOCK_MAGIC:
+        return central_offset
+    start = central_offset - size - 8
+    if start < 0 or struct.unpack_from("<Q", view, start)[0] != size:
+        raise ApkSignError("Corrupt APK signing block")
+    return start
+
+
+def parse_signing_block(block):
+    """Map the id of each id-value pair in the signing block to its value"""
+    pairs = {}
+    pos = 8
+    end = len(block) - SIGNING_BLOCK_FOOTER.size
+    while pos < end:
+        size, = struct.unpack_from("<Q", block, pos)
+        if size < 4 or pos + 8 + size > end:
+            raise ApkSignError("Corrupt APK signing block")
+        pair_id, = struct.unpack_from("<I", block, pos + 8)
+        pairs[pair_id] = block[pos + 12:pos + 8 + size]
+        pos += 8 + size
+    return pairs
+
+
+def build_signing_block(pairs):
+    body = b"".join(struct.pack("<QI", len(value) + 4, pair_id) + value for pair_id, value in pairs)
+    size = len(body) + SIGNING_BLOCK_FOOTER.size
+    return struct.pack("<Q", size) + body + SIGNING_BLOCK_FOOTER.pack(size, SIGNING_BLOCK_MAGIC)
+
+
+def chunk_digests(chunk, algorithms):
+    prefix = b"\xa5" + struct.pack("<I", len(chunk))
+    digests = []
+    for algorithm in algorithms:
+        digest = hashlib.new(algorithm, prefix)
+        digest.update(chunk)
+        digests.append(digest.digest())
+    return digests
+
+
+def content_digests(sections, algorithms):
+    """Compute the v2/v3 content digests of the given sections, chunks are hashed on a thread pool"""
+    chunks = [section[pos:pos + CHUNK_SIZE] for section in sections for pos in range(0, len(section), CHUNK_SIZE)]
+    with ThreadPoolExecutor(max_workers=DIGEST_WORKERS) as executor:
+        results = list(executor.map(lambda chunk: chunk_digests(chunk, algorithms), chunks))
+    for chunk in chunks:
+        if isinstance(chunk, memoryview):
+            chunk.release()
+    top = {}
+    for index, algorithm in enumerate(algorithms):
+        digest = hashlib.new(algorithm, b"\x5a" + struct.pack("<I", len(chunks)))
+        for result in results:
+            digest.update(result[index])
+        top[algorithm] = digest.digest()
+    return top
+
+
+def read_zip_sections(path, algorithms):
+    """Digest an APK as the signature schemes see it, the signing block left out
+
+    Returns (entries end, central directory, end record, {digest algorithm: content digest}).
+    """
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        view = memoryview(data)
+        try:
+            eocd_offset, central_offset, central_size = find_end_record(view)
+            if central_offset + central_size != eocd_offset:
+                raise ApkSignError("Zip64 or otherwise unsupported central directory layout")
+            entries_end = find_signing_block(view, central_offset)
+            central = bytes(view[central_offset:eocd_offset])
+            end_record = bytes(view[eocd_offset:])
+            # The digested end record points the central directory at where the signing block starts
+            digested_end = end_record[:16] + struct.pack("<I", entries_end) + end_record[20:]
+            entries = view[:entries_end]
+            digests = content_digests([entries, central, digested_end], algorithms)
+            entries.release()
+        finally:
+            view.release()
+    return entries_end, central, end_record, digests
+
+
+def signer_block(signed_data, extra, key, algorithm):
+    _, hash_type, _ = SIGNATURE_ALGORITHMS[algorithm]
+    if isinstance(key, rsa.RSAPrivateKey):
+        signature = key.sign(signed_data, padding.PKCS1v15(), hash_type())
+    else:
+        signature = key.sign(signed_data, ec.ECDSA(hash_type()))
+    public_key = key.public_key().public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    signer = (length_prefixed(signed_data) + extra + length_prefixed_sequence([struct.pack("<I", algorithm) + length_prefixed(signature)])
+              + length_prefixed(public_key))
+    return length_prefixed_sequence([signer])
+
+
+def apk_min_sdk(path):
+    """Read minSdkVersion from the APK's compiled AndroidManifest.xml"""
+    try:
+        with zipfile.ZipFile(path) as apk:
+            manifest = apk.read("AndroidManifest.xml")
+        return read_min_sdk(manifest)
+    except (KeyError, zipfile.BadZipFile, ArscError, struct.error, IndexError) as e:
+        raise ApkSignError(f"Cannot read minSdkVersion from {path}: {e}")
+
+
+def sign_apk_file(path, key, certificates):
+    """Sign an APK with APK Signature Scheme v2 and v3, replacing any existing signing block in place
+
+    Only the signing block, central directory and end record are rewritten. v1 (JAR) signatures are not
+    produced, so APKs whose minSdkVersion is below 24 (Android 7.0) are refused with ApkSignError.
+    """
+    min_sdk = apk_min_sdk(path)
+    if min_sdk < V2_MIN_SDK:
+        raise ApkSignError(f"APK supports Android releases before 7.0 (minSdkVersion {min_sdk}), "
+                           f"which need a v1 signature that is not produced in-process")
+    algorithm = signature_algorithm(key)
+    digest_name = SIGNATURE_ALGORITHMS[algorithm][0]
+    entries_end, central, end_record, digests = read_zip_sections(path, [digest_name])
+    digest_list = length_prefixed_sequence([struct.pack("<I", algorithm) + length_prefixed(digests[digest_name])])
+    certificate_list = length_prefixed_sequence([cert.public_bytes(serialization.Encoding.DER) for cert in certificates])
+    sdk_range = struct.pack("<II", V3_MIN_SDK, V3_MAX_SDK)
+
+    v2_attributes = length_prefixed_sequence([struct.pack("<II", STRIPPING_PROTECTION_ATTR_ID, 3)])
+    v2_block = signer_block(digest_list + certificate_list + v2_attributes, b"", key, algorithm)
+    v3_block = signer_block(digest_list + certificate_list + sdk_range + length_prefixed_sequence([]), sdk_range, key, algorithm)
+    block = build_signing_block([(V2_BLOCK_ID, v2_block), (V3_BLOCK_ID, v3_block)])
+
+    end_record = end_record[:16] + struct.pack("<I", entries_end + len(block)) + end_record[20:]
+    with open(path, "r+b") as file:
+        file.seek(entries_end)
+        file.write(block)
+        file.write(central)
+        file.write(end_record)
+        file.truncate()
+
+
+def verify_signature(public_key, algorithm, signature, data):
+    _, hash_type, key_type = SIGNATURE_ALGORITHMS[algorithm]
+    if not isinstance(public_key, key_type):
+        raise ApkSignError(f"Signature algorithm {algorithm:#06x} does not match the signer's key")
+    try:
+        if isinstance(public_key, rsa.RSAPublicKey):
+            public_key.verify(signature, data, padding.PKCS1v15(), hash_type())
+        else:
+            public_key.verify(signature, data, ec.ECDSA(hash_type()))
+    except InvalidSignature:
+        raise ApkSignError("Signature does not verify")
+
+
+def parse_signer(scheme, signer):
+    """Check a signer's signatures and certificate, return its {signature algorithm: content digest}"""
+    signed_data, pos = read_length_prefixed(signer, 0)
+    if scheme == 3:
+        sdk_range = signer[pos:pos + 8]
+        pos += 8
+    signatures, pos = read_length_prefixed(signer, pos)
+    public_key_der, _ = read_length_prefixed(signer, pos)
+    public_key = serialization.load_der_public_key(public_key_der)
+
+    signature_ids = set()
+    supported = {}
+    for item in read_sequence(signatures):
+        algorithm, = struct.unpack_from("<I", item)
+        signature_ids.add(algorithm)
+        if algorithm in SIGNATURE_ALGORITHMS:
+            supported[algorithm], _ = read_length_prefixed(item, 4)
+    if not supported:
+        raise ApkSignError(f"No supported signature algorithm in v{scheme} signer")
+    for algorithm, signature in supported.items():
+        verify_signature(public_key, algorithm, signature, signed_data)
+
+    digests, pos = read_length_prefixed(signed_data, 0)
+    certificates, pos = read_length_prefixed(signed_data, pos)
+    if scheme == 3 and signed_data[pos:pos + 8] != sdk_range:
+        raise ApkSignError("v3 signer SDK range does not match its signed data")
+    digests = {struct.unpack_from("<I", item)[0]: read_length_prefixed(item, 4)[0] for item in read_sequence(digests)}
+    if set(digests) != signature_ids:
+        raise ApkSignError(f"v{scheme} signature and digest algorithms differ")
+    certificates = read_sequence(certificates)
+    if not certificates:
+        raise ApkSignError(f"No certificate in v{scheme} signer")
+    certificate_key = x509.load_der_x509_certificate(certificates[0]).public_key().public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    if certificate_key != public_key_der:
+        raise ApkSignError(f"v{scheme} signer public key does not match its certificate")
+    return {algorithm: digests[algorithm] for algorithm in supported}
+
+
+def has_stripping_protection(v2_block):
+    for signer in read_sequence(v2_block):
+        signed_data, _ = read_length_prefixed(signer, 0)
+        _, pos = read_length_prefixed(signed_data, 0)
+        _, pos = read_length_prefixed(signed_data, pos)
+        attributes, _ = read_length_prefixed(signed_data, pos)
+        for attribute in read_sequence(attributes):
+            if struct.unpack_from("<I", attribute)[0] == STRIPPING_PROTECTION_ATTR_ID:
+                return True
+    return False
+
+
+def verify_apk_file(path):
+    """Verify the v2/v3 signatures of an APK, return the verified scheme versions or raise ApkSignError"""
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        view = memoryview(data)
+        try:
+            _, central_offset, _ = find_end_record(view)
+            start = find_signing_block(view, central_offset)
+            block = bytes(view[start:central_offset])
+        finally:
+            view.release()
+    if not block:
+        raise ApkSignError("APK has no v2/v3 signing block")
+    pairs = parse_signing_block(block)
+
+    expected = {}
+    schemes = []
+    for scheme, block_id in SCHEME_BLOCK_IDS.items():
+        if block_id not in pairs:
+            continue
+        signers = read_sequence(read_length_prefixed(pairs[block_id], 0)[0])
+        if not signers:
+            raise ApkSignError(f"No signers in v{scheme} block")
+        for signer in signers:
+            for algorithm, digest in parse_signer(scheme, signer).items():
+                expected.setdefault(algorithm, set()).add(digest)
+        schemes.append(scheme)
+    if not schemes:
+        raise ApkSignError("APK has no v2/v3 signature")
+    if V2_BLOCK_ID in pairs and V3_BLOCK_ID not in pairs:
+        if has_stripping_protection(read_length_prefixed(pairs[V2_BLOCK_ID], 0)[0]):
+            raise ApkSignError("v3 signature was stripped")
+
+    digest_names = sorted({SIGNATURE_ALGORITHMS[algorithm][0] for algorithm in expected})
+    _, _, _, actual = read_zip_sections(path, digest_names)
+    for algorithm, digests in expected.items():
+        if digests != {actual[SIGNATURE_ALGORITHMS[algorithm][0]]}:
+            raise ApkSignError("APK contents do not match the signed digest")
+    return schemes
@@ -1,32 +1,60 @@
+import argparse
+import hashlib
+import json
 import logging
 import os
 import platform
 import re
 import shutil
 import stat
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import requests
 import subprocess
 import sys
 from bs4 import BeautifulSoup
 from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from urllib3.util.retry import Retry
+
+from apksign import ApkSignError, load_keystore, sign_apk_file, verify_apk_file
+from apkzip import is_aligned, rewrite_apk, zipalign
+from arsc import patch_string_resources
 
 # ------------------------------ Parameters Configuration ------------------------------
 APP_FILE = "Termius"
 DIR_TMP = ".tmp_dir"
+DIR_CACHE = ".cache"
 EXT_APKM = ".apkm"
 EXT_APK = ".apk"
 APKM_FILENAME = f"{APP_FILE}{EXT_APKM}"
 APK_EDITOR_FILENAME = "APKEditor.jar"
 LANGUAGE_XML = "strings.xml"
-BASE_APK_URL = "https://www.apkmirror.com/apk/termius-corporation/termius-ssh-telnet-client/"  # APK mirror base URL
+RESOURCES_ARSC = "resources.arsc"
+# Base URLs can be overridden through the environment, e.g. to point at a local stand-in server
+APKMIRROR_URL = os.environ.get("APKMIRROR_URL", "https://www.apkmirror.com").rstrip('/')
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip('/')
+BASE_APK_URL = f"{APKMIRROR_URL}/apk/termius-corporation/termius-ssh-telnet-client/"  # APK mirror base URL
 GITHUB_REPO_OWNER = "REAndroid"
 GITHUB_REPO_NAME = "APKEditor"
 APK_SIGN_PROPERTIES = "apk.sign.properties"
 ALIGNED_SUFFIX = "_aligned"
 SIGNED_SUFFIX = "_signed"
 ZH_SUFFIX = "_zh"
+REPORT_PREVIEW = 10
+# Bump when a stage's behaviour changes in a way its input digests do not capture
+STAGE_CACHE_VERSION = 1
+# Outputs kept per stage besides those used by the current run
+STAGE_CACHE_LIMIT = 3
+# In-process tools whose source is part of the cache key of the stages using them
+PATCH_TOOL_FILES = ("arsc.py", "apkzip.py")
+SIGN_TOOL_FILES = ("apksign.py", "arsc.py")
 
 # ------------------------------ Log Configuration ------------------------------
 logging.basicConfig(
@@ -40,6 +68,21 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0"
 }
 
+# ------------------------------ HTTP Configuration ------------------------------
+HTTP_POOL_SIZE = 8
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_SEGMENTS = 4
+DOWNLOAD_SEGMENT_MIN_SIZE = 8 * 1024 * 1024
+DOWNLOAD_ATTEMPTS = 3
+PART_SUFFIX = ".part"
+
+_session = None
+_session_lock = threading.Lock()
+_file_digests = {}
+
 
 def is_windows():
     return platform.system() == 'Windows'
@@ -128,10 +171,45 @@ def safe_rmtree(path):
         shutil.rmtree(path, onerror=_handle_remove_readonly)
 
 
-def fetch_page(url, headers):
+def create_session():
+    """Create a pooled session with keep-alive and retry/backoff on connection errors and transient statuses"""
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=("GET", "HEAD"),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+def get_session():
+    """Return the shared session, creating it on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def close_session():
+    """Close the shared session and its pooled connections"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def fetch_page(url, headers=None):
     """Fetch page content and return BeautifulSoup object"""
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_session().get(url, headers=headers, timeout=10)
         # Check HTTP status code (4xx/5xx will raise an exception)
         response.raise_for_status()
         return BeautifulSoup(response.text, 'html.parser')
@@ -174,7 +252,7 @@ def build_apkmirror_download_chain(base_url, version_slug, headers):
             logger.error("Android APK download button not found, page structure may have changed")
             return None, None
 
-        full_apk_url = f"https://www.apkmirror.com{apk_button['href'].rstrip('/')}"
+        full_apk_url = f"{APKMIRROR_URL}{apk_button['href'].rstrip('/')}"
         return download_page_url, full_apk_url
 
     except Exception as e:
@@ -194,7 +272,7 @@ def get_final_download_url(session, url):
         soup = BeautifulSoup(response.text, 'html.parser')
         download_link = soup.find('a', id='download-link', href=True)
         if download_link:
-            return f"https://www.apkmirror.com{download_link['href']}"
+            return f"{APKMIRROR_URL}{download_link['href']}"
 
         logger.error("Unable to obtain valid download link, page structure may have changed")
         return None
@@ -204,34 +282,164 @@ def get_final_download_url(session, url):
         return None
 
 
-def download_file(session, url, save_path):
+def probe_download(session, url):
+    """Request the first byte to learn the final URL, total size, validator and whether Range is supported"""
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=20) as response:
+        response.raise_for_status()
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        if response.status_code == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit():
+                return response.url, int(total), validator, True
+        total = int(response.headers.get("content-length", 0))
+        return response.url, total or None, validator, False
+
+
+def plan_segments(total_size, accepts_ranges):
+    """Split a download into inclusive byte ranges, one range when the size is unknown or Range is unsupported"""
+    if not total_size:
+        return [[0, None]]
+    if not accepts_ranges or total_size < 2 * DOWNLOAD_SEGMENT_MIN_SIZE:
+        return [[0, total_size - 1]]
+    count = min(DOWNLOAD_SEGMENTS, total_size // DOWNLOAD_SEGMENT_MIN_SIZE)
+    step = -(-total_size // count)
+    return [[start, min(start + step, total_size) - 1] for start in range(0, total_size, step)]
+
+
+def segment_path(part_path, index):
+    """The first segment is written to the .part file itself, the others to numbered siblings"""
+    return part_path if index == 0 else f"{part_path}.{index}"
+
+
+def load_part_state(state_path):
+    """Load the size, validator and segment plan saved alongside a partial download"""
     try:
-        with session.get(url, stream=True, timeout=20) as response:
-            response.raise_for_status()
-
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-
-            progress_bar = tqdm(
-                total=total_size,
-                unit='B',
-                unit_scale=True,
-                unit_divisor=1024,
-                desc=os.path.basename(save_path),
-                leave=True
-            )
-
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
+        with open(state_path, 'r', encoding='UTF-8') as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_part_files(part_path, state):
+    """Delete a partial download, its segment files and its state file"""
+    for index in range(len(state["segments"]) if state else 1):
+        path = segment_path(part_path, index)
+        if os.path.exists(path):
+            os.remove(path)
+    if os.path.exists(part_path + ".json"):
+        os.remove(part_path + ".json")
+
+
+def download_segment(session, url, path, start, end, accepts_ranges, progress_bar):
+    """Download one byte range into its own file, resuming from what is already on disk
+
+    Before each retry the progress bar is rolled back by what the failed attempt counted but did not keep,
+    so restarted bytes are not counted twice.
+    """
+    counted = None
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        done = os.path.getsize(path) if os.path.exists(path) and accepts_ranges else 0
+        if counted is not None:
+            progress_bar.update(done - counted)
+        counted = done
+        if end is not None and done >= end - start + 1:
+            return
+        headers = {"Range": f"bytes={start + done}-{'' if end is None else end}"} if accepts_ranges else {}
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=20) as response:
+                response.raise_for_status()
+                if accepts_ranges and response.status_code != 206:
+                    raise requests.exceptions.RequestException("Server ignored the Range request")
+                with open(path, 'ab' if done else 'wb', buffering=DOWNLOAD_CHUNK_SIZE) as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                         f.write(chunk)
-                        downloaded += len(chunk)
                         progress_bar.update(len(chunk))
-
+                        counted += len(chunk)
+            return
+        except requests.exceptions.RequestException as e:
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise
+            logger.warning(f"Segment {start}-{end} interrupted ({e}), resuming (attempt {attempt + 1}/{DOWNLOAD_ATTEMPTS})")
+
+
+def hash_file(path):
+    """Compute the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download_file(session, url, save_path, expected_size=None, expected_sha256=None):
+    """Download url to save_path through a resumable .part file
+
+    Large files on Range-capable servers are fetched as parallel byte-range segments. The result is checked
+    against the expected size and SHA-256 (when known) before being renamed into place, so save_path only
+    ever exists complete.
+    """
+    part_path = save_path + PART_SUFFIX
+    state_path = part_path + ".json"
+    try:
+        final_url, total_size, validator, accepts_ranges = probe_download(session, url)
+        if expected_size and total_size and expected_size != total_size:
+            raise ValueError(f"Server reports {total_size} bytes, expected {expected_size}")
+        total_size = total_size or expected_size
+
+        state = load_part_state(state_path)
+        if not accepts_ranges or not state or state.get("size") != total_size or state.get("validator") != validator:
+            # Nothing to resume, or the remote file changed since the partial download
+            remove_part_files(part_path, state)
+            state = {"size": total_size, "validator": validator, "segments": plan_segments(total_size, accepts_ranges)}
+            with open(state_path, 'w', encoding='UTF-8') as state_file:
+                json.dump(state, state_file)
+        segments = state["segments"]
+
+        resumed = sum(os.path.getsize(path) for path in (segment_path(part_path, i) for i in range(len(segments)))
+                      if os.path.exists(path))
+        if resumed:
+            logger.info(f"Resuming {os.path.basename(save_path)} from {resumed} bytes")
+        progress_bar = tqdm(
+            total=total_size,
+            initial=resumed,
+            unit='B',
+            unit_scale=True,
+            unit_divisor=1024,
+            desc=os.path.basename(save_path),
+            leave=True
+        )
+        try:
+            with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+                futures = [executor.submit(download_segment, session, final_url, segment_path(part_path, i),
+                                           start, end, accepts_ranges, progress_bar)
+                           for i, (start, end) in enumerate(segments)]
+                for future in futures:
+                    future.result()
+        finally:
             progress_bar.close()
-            logger.info(f"File download completed: {save_path} ({downloaded}/{total_size} bytes)" if total_size else
-                        f"File download completed: {save_path} (unknown size)")
-            return True
+
+        # Append the remaining segments to the .part file, dropping anything left by an interrupted earlier append
+        with open(part_path, 'r+b') as f:
+            if len(segments) > 1:
+                f.truncate(segments[0][1] + 1)
+                f.seek(0, os.SEEK_END)
+            for i in range(1, len(segments)):
+                with open(segment_path(part_path, i), 'rb') as segment_file:
+                    shutil.copyfileobj(segment_file, f, DOWNLOAD_CHUNK_SIZE)
+                os.remove(segment_path(part_path, i))
+
+        downloaded = os.path.getsize(part_path)
+        if total_size and downloaded != total_size:
+            remove_part_files(part_path, None)
+            raise ValueError(f"Size mismatch: got {downloaded} bytes, expected {total_size}")
+        sha256 = hash_file(part_path)
+        if expected_sha256 and sha256 != expected_sha256.lower():
+            remove_part_files(part_path, None)
+            raise ValueError(f"SHA-256 mismatch: got {sha256}, expected {expected_sha256}")
+        os.replace(part_path, save_path)
+        os.remove(state_path)
+        logger.info(f"File download completed: {save_path} ({downloaded} bytes, sha256 {sha256})")
+        return True
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Download failed: {str(e)} - URL: {url}, Target path: {save_path}")
@@ -244,14 +452,15 @@ def download_file(session, url, save_path):
 def download_apk_editor_jar(file_dir, filename):
     """Download APKEditor.jar"""
     file_path = os.path.join(file_dir, filename)
-    if os.path.exists(filename):
+    if os.path.exists(file_path):
         logger.info(f"{filename} already exists, skipping download.")
         return
     try:
         logger.info(f"{filename} not found, starting download...")
+        session = get_session()
         # Construct GitHub API URL
-        api_url = f"https://api.github.com/repos/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}/releases/latest"
-        response = requests.get(api_url)
+        api_url = f"{GITHUB_API_URL}/repos/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}/releases/latest"
+        response = session.get(api_url, timeout=10)
         response.raise_for_status()
         release_data = response.json()
         assets = release_data.get('assets', [])
@@ -260,12 +469,13 @@ def download_apk_editor_jar(file_dir, filename):
         download_url = assets[0].get('browser_download_url')
         if not download_url:
             raise Exception("Asset download link not found.")
-        with requests.Session() as session:
-            session.headers.update(HEADERS)
-            logger.info(f"Starting download of {filename}: {download_url}")
-            if not download_file(session, download_url, file_path):
-                raise Exception(f"{filename} download failed.")
-            logger.info(f"{filename} download completed, saved to: {file_path}")
+        # GitHub publishes the asset size and a "sha256:<hex>" digest
+        algorithm, _, digest = (assets[0].get('digest') or '').partition(':')
+        logger.info(f"Starting download of {filename}: {download_url}")
+        if not download_file(session, download_url, file_path, assets[0].get('size'),
+                             digest if algorithm == 'sha256' else None):
+            raise Exception(f"{filename} download failed.")
+        logger.info(f"{filename} download completed, saved to: {file_path}")
     except Exception as e:
         logger.error(f"Error downloading {filename}: {str(e)}")
 
@@ -291,16 +501,15 @@ def download_termius_apk(file_dir, filename):
         _, apk_download_page_url = build_apkmirror_download_chain(BASE_APK_URL, version_slug, HEADERS)
         if not apk_download_page_url:
             raise Exception("Failed to construct a valid download link, terminating the program.")
-        with requests.Session() as session:
-            session.headers.update(HEADERS)
-            direct_download_url = get_final_download_url(session, apk_download_page_url)
-            if not direct_download_url:
-                raise Exception("Failed to obtain the final download link, terminating the program.")
-            logger.info(f"Final download link obtained: {direct_download_url}")
-            logger.info(f"Starting download of {filename}...")
-            if not download_file(session, direct_download_url, file_path):
-                raise Exception(f"{filename} download failed.")
-            logger.info(f"{filename} download completed.")
+        session = get_session()
+        direct_download_url = get_final_download_url(session, apk_download_page_url)
+        if not direct_download_url:
+            raise Exception("Failed to obtain the final download link, terminating the program.")
+        logger.info(f"Final download link obtained: {direct_download_url}")
+        logger.info(f"Starting download of {filename}...")
+        if not download_file(session, direct_download_url, file_path):
+            raise Exception(f"{filename} download failed.")
+        logger.info(f"{filename} download completed.")
     except Exception as e:
         logger.error(f"Error occurred while downloading {filename}: {str(e)}")
 
@@ -311,7 +520,11 @@ def load_sign_properties(file_dir):
         path_sign_config_file = os.path.abspath(os.path.join(os.path.expanduser('~'), APK_SIGN_PROPERTIES))
         if not os.path.exists(path_sign_config_file):
             return None
+    return read_sign_properties(path_sign_config_file)
 
+
+def read_sign_properties(path_sign_config_file):
+    """Parse an apk.sign.properties file, None if it lacks a required key"""
     sign_config_file_lines = list()
     with open(path_sign_config_file, 'r', encoding='UTF-8') as sign_config_file:
         sign_config_file_lines = sign_config_file.readlines()
@@ -342,11 +555,11 @@ def zipalign_apk(file_dir, apk_filename):
     if not os.path.exists(built_apk_file):
         raise Exception("APK file for zipalign does not exist")
     built_apk_aligned_file = os.path.join(file_dir, apk_filename + ALIGNED_SUFFIX + EXT_APK)
-    if os.path.exists(built_apk_aligned_file):
-        os.remove(built_apk_aligned_file)
-    run_command(f'zipalign -p -f 4 {built_apk_file} {built_apk_aligned_file}', shell=True)
-    os.remove(built_apk_file)
-    shutil.move(str(built_apk_aligned_file), str(built_apk_file))
+    if is_aligned(built_apk_file):
+        logger.info('APK is already aligned, skipping zipalign')
+        return
+    zipalign(built_apk_file, built_apk_aligned_file)
+    os.replace(built_apk_aligned_file, built_apk_file)
     logger.info('Zipalign operation completed successfully')
 
 
@@ -364,11 +577,48 @@ def generate_keystore(file_dir, sign_config):
     logger.info('Keystore generation completed')
 
 
-def sign_apk(file_dir, tmp_dir, apk_filename, sign_properties):
+def unshare_file(path):
+    """Give a hardlinked file its own copy so that it can be modified in place"""
+    if os.stat(path).st_nlink > 1:
+        shutil.copyfile(path, path + ".unshared")
+        os.replace(path + ".unshared", path)
+
+
+def sign_apk(file_dir, tmp_dir, apk_filename, sign_properties, cross_check=False):
+    """Sign with APK Signature Scheme v2/v3 in-process, falling back to apksigner for keystores it cannot load
+    and for APKs that still support Android releases before 7.0, which apksigner also gives a v1 signature
+
+    With cross_check the result is also verified by apksigner.
+    """
     logger.info('Signing APK file')
     build_apk_file = os.path.join(tmp_dir, apk_filename + EXT_APK)
     if not os.path.exists(build_apk_file):
         raise Exception("APK file for signing does not exist")
+    keystore = os.path.join(file_dir, sign_properties["sign.keystore"])
+    try:
+        key, certificates = load_keystore(keystore, sign_properties["sign.keystore.password"],
+                                          sign_properties["sign.key.password"], sign_properties["sign.key.alias"])
+        unshare_file(build_apk_file)
+        sign_apk_file(build_apk_file, key, certificates)
+    except ApkSignError as e:
+        if not shutil.which("apksigner"):
+            raise Exception(f"{e}, and apksigner is not installed to sign it instead")
+        logger.warning(f"{e}, signing with apksigner instead")
+        apksigner_sign(file_dir, tmp_dir, apk_filename, sign_properties)
+    logger.info('APK signing completed')
+    logger.info('Verifying APK signature')
+    try:
+        schemes = verify_apk_file(build_apk_file)
+    except ApkSignError as e:
+        raise Exception(f"APK signature verification failed: {e}")
+    logger.info(f"Verified using APK Signature Scheme {', '.join(f'v{scheme}' for scheme in schemes)}")
+    if cross_check:
+        run_command(f'apksigner verify --verbose {build_apk_file}', shell=True)
+    logger.info('APK signature verification completed')
+
+
+def apksigner_sign(file_dir, tmp_dir, apk_filename, sign_properties):
+    build_apk_file = os.path.join(tmp_dir, apk_filename + EXT_APK)
     build_apk_signed_file = os.path.join(tmp_dir, apk_filename + SIGNED_SUFFIX + EXT_APK)
     if os.path.exists(build_apk_signed_file):
         os.remove(build_apk_signed_file)
@@ -381,10 +631,6 @@ def sign_apk(file_dir, tmp_dir, apk_filename, sign_properties):
     "{build_apk_file}"', shell=True, log=False)
     os.remove(build_apk_file)
     shutil.move(str(build_apk_signed_file), str(build_apk_file))
-    logger.info('APK signing completed')
-    logger.info('Verifying APK signature')
-    run_command(f'apksigner verify --verbose {build_apk_file}', shell=True)
-    logger.info('APK signature verification completed')
 
 
 def apkm_to_apk(apk_editor_jar, apkm_file, apk_file):
@@ -403,13 +649,103 @@ def decode_apk(apk_editor_jar, apk_file, out_dir):
     run_command(f'java -jar {apk_editor_jar} d -i {apk_file} -o {out_dir}', shell=True)
 
 
-def replace_language_xml(source_dir, target_dir):
-    if not os.path.exists(source_dir):
-        raise Exception(f"Failed to replace {LANGUAGE_XML}, source file not found: {source_dir}")
-    src_xml = os.path.join(source_dir, LANGUAGE_XML)
+def format_names(names):
+    preview = ', '.join(names[:REPORT_PREVIEW])
+    return f"{preview} ..." if len(names) > REPORT_PREVIEW else preview
+
+
+def report_translation(untranslated, stale):
+    """Log upstream strings without a translation and translations whose key no longer exists upstream"""
+    if untranslated:
+        logger.warning(f"{len(untranslated)} upstream strings have no translation in {LANGUAGE_XML}: {format_names(untranslated)}")
+        logger.debug(f"Untranslated strings: {', '.join(untranslated)}")
+    if stale:
+        logger.warning(f"{len(stale)} strings in {LANGUAGE_XML} no longer exist upstream: {format_names(stale)}")
+        logger.debug(f"Stale strings: {', '.join(stale)}")
+
+
+def iter_resource_elements(xml_path):
+    """Stream the direct children of <resources>, discarding each one once the caller is done with it"""
+    depth = 0
+    root = None
+    for event, item in ET.iterparse(xml_path, events=("start-ns", "start", "end")):
+        if event == "start-ns":
+            # Keep prefixes such as xliff when elements are serialized again
+            ET.register_namespace(*item)
+        elif event == "start":
+            depth += 1
+            if depth == 1:
+                root = item
+        else:
+            depth -= 1
+            if depth == 1:
+                item.tail = None
+                yield item
+                root.remove(item)
+
+
+def serialize_element(element):
+    """Serialize a resource element, formatting plain elements without children or namespaces directly"""
+    # ElementTree declares the namespaces (tools:, xliff:, ...) an element uses on the element itself
+    if len(element) or '}' in element.tag or any('}' in key for key in element.attrib):
+        return ET.tostring(element, encoding='unicode')
+    attributes = ''.join(f" {key}={quoteattr(value)}" for key, value in element.attrib.items())
+    return f"<{element.tag}{attributes}>{escape(element.text or '')}</{element.tag}>"
+
+
+def merge_language_xml(upstream_xml, translated_xml, out_xml):
+    """Write upstream_xml with every <string> that translated_xml defines replaced by its translation
+
+    Untranslated strings and other resources keep their upstream definition and order. Returns
+    (names translated, untranslated names, names only in translated_xml).
+    """
+    translations = {}
+    for element in iter_resource_elements(translated_xml):
+        if element.tag == 'string' and element.get('name'):
+            translations[element.get('name')] = serialize_element(element)
+    translated = set()
+    untranslated = []
+    with open(out_xml, 'w', encoding='UTF-8') as out:
+        out.write("<?xml version='1.0' encoding='utf-8' ?>\n<resources>\n")
+        for element in iter_resource_elements(upstream_xml):
+            name = element.get('name')
+            if element.tag == 'string' and name in translations:
+                out.write(f"  {translations[name]}\n")
+                translated.add(name)
+                continue
+            if element.tag == 'string':
+                untranslated.append(name)
+            out.write(f"  {serialize_element(element)}\n")
+        out.write("</resources>\n")
+    return translated, untranslated, sorted(set(translations) - translated)
+
+
+def replace_language_xml(src_xml, target_dir):
+    if not os.path.exists(src_xml):
+        raise Exception(f"Failed to replace {LANGUAGE_XML}, source file not found: {src_xml}")
     tar_xml = os.path.join(target_dir, 'resources', 'package_1', 'res', 'values', LANGUAGE_XML)
-    logger.info(f"Replacing language file: Source={src_xml}, Target={tar_xml}")
-    replace_file(src_xml, tar_xml)
+    if not os.path.exists(tar_xml):
+        logger.warning(f"Upstream {LANGUAGE_XML} not found, copying translation as is: {tar_xml}")
+        replace_file(src_xml, tar_xml)
+        return
+    logger.info(f"Merging language file: Source={src_xml}, Target={tar_xml}")
+    merged_xml = tar_xml + ".merged"
+    translated, untranslated, stale = merge_language_xml(tar_xml, src_xml, merged_xml)
+    os.replace(merged_xml, tar_xml)
+    logger.info(f"Merged {len(translated)} translated strings into {tar_xml}")
+    report_translation(untranslated, stale)
+
+
+def patch_apk_strings(apk_file, language_xml, out_apk_file):
+    """Rewrite the default string values in resources.arsc and copy every other APK entry unchanged, aligned"""
+    with zipfile.ZipFile(apk_file) as apk:
+        arsc_data = apk.read(RESOURCES_ARSC)
+    patched, changed, untranslated, stale = patch_string_resources(arsc_data, language_xml)
+    logger.info(f"Patched {len(changed)} string resources in {RESOURCES_ARSC}")
+    report_translation(untranslated, stale)
+    if os.path.exists(out_apk_file):
+        os.remove(out_apk_file)
+    rewrite_apk(apk_file, out_apk_file, {RESOURCES_ARSC: patched}, align=True)
 
 
 def build_apk(apk_editor_jar, file_dir, out_dir, apk_filename):
@@ -434,69 +770,293 @@ def export_apk(file_dir, tmp_dir, apk_filename, export_filename):
     shutil.move(str(apk_file), str(export_apk_file))
 
 
-def apk_file_modify(file_dir, sign_properties):
-    """Modify APK file"""
-    tmp_dir = create_tmp_dir(file_dir)
-    decompile_dir = os.path.join(tmp_dir, APP_FILE)
-    apkm_file = os.path.join(file_dir, APP_FILE + EXT_APKM)
-    apk_file = os.path.join(tmp_dir, APP_FILE + EXT_APK)
-    filename_zh = APP_FILE + ZH_SUFFIX
-    apk_editor_jar = os.path.join(file_dir, APK_EDITOR_FILENAME)
+def default_variant(file_dir, sign_properties):
+    """The single variant built without --variants, exported as Termius.apk"""
+    return {"name": "", "language_xml": os.path.join(file_dir, LANGUAGE_XML), "sign_properties": sign_properties}
+
+
+def load_variants(variants_file, file_dir, sign_properties):
+    """Read build variants from a JSON list of {"name", "strings", "sign"} objects, paths relative to file_dir"""
+    with open(variants_file, 'r', encoding='UTF-8') as f:
+        specs = json.load(f)
+    variants = []
+    for spec in specs:
+        name = spec.get('name')
+        if not name or not re.fullmatch(r'[\w.-]+', name):
+            raise Exception(f"Invalid variant name: {name}")
+        if any(variant["name"] == name for variant in variants):
+            raise Exception(f"Duplicate variant name: {name}")
+        properties = sign_properties
+        if spec.get('sign'):
+            properties = read_sign_properties(os.path.join(file_dir, spec['sign']))
+            if not properties:
+                raise Exception(f"Invalid signature configuration for variant {name}: {spec['sign']}")
+        variants.append({
+            "name": name,
+            "language_xml": os.path.join(file_dir, spec.get('strings', LANGUAGE_XML)),
+            "sign_properties": properties
+        })
+    if not variants:
+        raise Exception(f"No variants defined in {variants_file}")
+    return variants
+
+
+def link_or_copy(src, dst):
+    """Hardlink a file, copying it where links are not supported"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def file_digest(path):
+    """SHA-256 of a file, memoized by path, size and modification time"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key not in _file_digests:
+        _file_digests[key] = hash_file(path)
+    return _file_digests[key]
+
+
+def tool_digests(names=PATCH_TOOL_FILES):
+    """Digests of in-process tools"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return [file_digest(os.path.join(script_dir, name)) for name in names]
+
+
+def tool_identity(command):
+    """Identify an external tool by its resolved path, size and modification time"""
+    path = shutil.which(command)
+    if not path:
+        return f"{command}:missing"
+    st = os.stat(os.path.realpath(path))
+    return f"{os.path.realpath(path)}:{st.st_size}:{st.st_mtime_ns}"
 
-    logger.info("Starting APK file processing")
-    apkm_to_apk(apk_editor_jar, apkm_file, apk_file)
 
-    logger.info("Decompiling APK file")
-    decode_apk(apk_editor_jar, apk_file, decompile_dir)
+def properties_digest(properties):
+    return hashlib.sha256(json.dumps(properties, sort_keys=True).encode('UTF-8')).hexdigest()
 
-    logger.info("Replacing language resources")
-    replace_language_xml(file_dir, decompile_dir)
 
-    logger.info("Repackaging APK file")
-    build_apk(apk_editor_jar, tmp_dir, decompile_dir, filename_zh)
+def stage_key(name, inputs):
+    digest = hashlib.sha256(f"{name}:{STAGE_CACHE_VERSION}".encode('UTF-8'))
+    for value in inputs:
+        digest.update(b"\0" + str(value).encode('UTF-8'))
+    return digest.hexdigest()
 
-    logger.info("Executing zipalign operation")
-    zipalign_apk(tmp_dir, filename_zh)
+
+def remove_path(path):
+    if os.path.isdir(path):
+        safe_rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def place_output(src, dst):
+    """Hardlink a file or directory tree to dst, replacing what is there"""
+    remove_path(dst)
+    if os.path.isdir(src):
+        shutil.copytree(src, dst, copy_function=link_or_copy)
+    else:
+        link_or_copy(src, dst)
+
+
+def run_stage(cache_dir, name, inputs, output_path, build):
+    """Run one pipeline stage through the content-addressed stage cache
+
+    inputs are the digests of the stage's input files, the keys of the upstream stages it consumes and any
+    parameter that changes the output. On a hit output_path is hardlinked from the cache, otherwise
+    build(output_path) runs and its output is stored. Returns the stage key, for use by downstream stages.
+    Stages must replace their outputs (write and rename) rather than modify them in place.
+    """
+    key = stage_key(name, inputs)
+    if cache_dir is None:
+        build(output_path)
+        return key
+    cached = os.path.join(cache_dir, name, key)
+    if os.path.exists(cached):
+        logger.info(f"Stage {name} is up to date, using cached output {key[:12]}")
+        os.utime(cached)
+        place_output(cached, output_path)
+        return key
+    build(output_path)
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    staging = f"{cached}.{os.getpid()}.tmp"
+    place_output(output_path, staging)
+    try:
+        os.replace(staging, cached)
+    except OSError:
+        # Another worker stored the same output first
+        remove_path(staging)
+    return key
+
+
+def prune_stage_cache(cache_dir, used_since):
+    """Drop cached outputs beyond the STAGE_CACHE_LIMIT most recent per stage, keeping those used since used_since"""
+    if not os.path.isdir(cache_dir):
+        return
+    for stage in os.listdir(cache_dir):
+        stage_dir = os.path.join(cache_dir, stage)
+        entries = [os.path.join(stage_dir, entry) for entry in os.listdir(stage_dir)]
+        stale = sorted((path for path in entries if os.path.getmtime(path) < used_since), key=os.path.getmtime, reverse=True)
+        for path in stale[STAGE_CACHE_LIMIT:]:
+            remove_path(path)
+
+
+def build_variant(file_dir, tmp_dir, cache_dir, apk_file, source_key, decompile_dir, variant, cross_check=False):
+    """Replace, build, align, sign and export one variant in its own scratch directory
+
+    Without decompile_dir the strings are patched directly into resources.arsc; False is returned when that
+    fails and the variant needs the decompiled tree. Otherwise the shared tree is hardlinked into the
+    scratch directory, where only strings.xml is replaced (by rename, never in place). source_key is the
+    stage key of apk_file or decompile_dir.
+    """
+    name = variant["name"]
+    filename = f"{APP_FILE}_{name}" if name else APP_FILE + ZH_SUFFIX
+    scratch_dir = os.path.join(tmp_dir, filename)
+    apk_path = os.path.join(scratch_dir, filename + EXT_APK)
+    apk_editor_jar = os.path.join(file_dir, APK_EDITOR_FILENAME)
+    create_or_recreate_dir(scratch_dir)
+    logger.info(f"Building {filename}")
+    language_digest = file_digest(variant["language_xml"])
+
+    if decompile_dir is None:
+        try:
+            logger.info("Patching language resources")
+            key = run_stage(cache_dir, "patch", [source_key, language_digest, *tool_digests()], apk_path,
+                            lambda out: patch_apk_strings(apk_file, variant["language_xml"], out))
+        except Exception as e:
+            logger.warning(f"Direct {RESOURCES_ARSC} patching failed for {filename}: {e}")
+            safe_rmtree(scratch_dir)
+            return False
+    else:
+        def build(_):
+            variant_dir = os.path.join(scratch_dir, APP_FILE)
+            shutil.copytree(decompile_dir, variant_dir, copy_function=link_or_copy)
+
+            logger.info("Replacing language resources")
+            replace_language_xml(variant["language_xml"], variant_dir)
+
+            logger.info("Repackaging APK file")
+            build_apk(apk_editor_jar, scratch_dir, variant_dir, filename)
+
+            logger.info("Executing zipalign operation")
+            zipalign_apk(scratch_dir, filename)
+
+        key = run_stage(cache_dir, "build", [source_key, language_digest, file_digest(apk_editor_jar), *tool_digests()],
+                        apk_path, build)
 
     logger.info("Signing APK file")
-    sign_apk(file_dir, tmp_dir, filename_zh, sign_properties)
+    sign_properties = variant["sign_properties"]
+    keystore = os.path.join(file_dir, sign_properties["sign.keystore"])
+    run_stage(cache_dir, "sign", [key, file_digest(keystore), properties_digest(sign_properties),
+                                  *tool_digests(SIGN_TOOL_FILES), tool_identity("apksigner")],
+              apk_path, lambda _: sign_apk(file_dir, scratch_dir, filename, sign_properties, cross_check))
 
     logger.info("Exporting final APK file")
-    export_apk(file_dir, tmp_dir, filename_zh, APP_FILE)
+    export_apk(file_dir, scratch_dir, filename, f"{APP_FILE}_{name}" if name else APP_FILE)
+    safe_rmtree(scratch_dir)
+    return True
+
+
+def build_variants(file_dir, tmp_dir, cache_dir, apk_file, source_key, decompile_dir, variants, jobs, cross_check=False):
+    """Build variants, in parallel worker processes when there are several; return those that need decompiling"""
+    args = (file_dir, tmp_dir, cache_dir, apk_file, source_key, decompile_dir)
+    jobs = min(jobs or os.cpu_count() or 1, len(variants))
+    if jobs <= 1:
+        return [variant for variant in variants if not build_variant(*args, variant, cross_check)]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(build_variant, *args, variant, cross_check) for variant in variants]
+        return [variant for variant, future in zip(variants, futures) if not future.result()]
+
+
+def apk_file_modify(file_dir, variants, jobs=1, use_cache=True, cross_check=False):
+    """Modify APK file: merge the APKM once, then build every variant from it
+
+    Each step runs as a stage of run_stage, so with use_cache only the stages whose inputs changed since a
+    previous run are executed, e.g. editing strings.xml re-runs patching and signing but not the merge.
+    """
+    started = time.time()
+    tmp_dir = create_tmp_dir(file_dir)
+    cache_dir = os.path.join(file_dir, DIR_CACHE) if use_cache else None
+    if cache_dir and not os.path.exists(cache_dir):
+        os.mkdir(cache_dir)
+        if is_windows():
+            windows_hide_file(cache_dir)
+    decompile_dir = os.path.join(tmp_dir, APP_FILE)
+    apkm_file = os.path.join(file_dir, APP_FILE + EXT_APKM)
+    apk_file = os.path.join(tmp_dir, APP_FILE + EXT_APK)
+    apk_editor_jar = os.path.join(file_dir, APK_EDITOR_FILENAME)
+
+    logger.info("Starting APK file processing")
+    apk_key = run_stage(cache_dir, "merge", [file_digest(apkm_file), file_digest(apk_editor_jar)], apk_file,
+                        lambda out: apkm_to_apk(apk_editor_jar, apkm_file, out))
+
+    pending = build_variants(file_dir, tmp_dir, cache_dir, apk_file, apk_key, None, variants, jobs, cross_check)
+    if pending:
+        # Fall back to a full APKEditor decompile, done once and shared by the remaining variants
+        logger.info("Decompiling APK file")
+        decode_key = run_stage(cache_dir, "decode", [apk_key, file_digest(apk_editor_jar)], decompile_dir,
+                               lambda out: decode_apk(apk_editor_jar, apk_file, out))
+        build_variants(file_dir, tmp_dir, cache_dir, apk_file, decode_key, decompile_dir, pending, jobs, cross_check)
 
     logger.info(f"Cleaning temporary directory: {tmp_dir}")
     safe_rmtree(tmp_dir)
+    if cache_dir:
+        prune_stage_cache(cache_dir, started)
 
 
-def file_exists(file_dir, sign_properties):
-    language_xml = os.path.join(file_dir, LANGUAGE_XML)
-    if not os.path.exists(language_xml):
-        raise Exception("Language file not found.")
+def file_exists(file_dir, variants):
+    for variant in variants:
+        if not os.path.exists(variant["language_xml"]):
+            raise Exception(f"Language file not found: {variant['language_xml']}")
+    # The Termius APKM and APKEditor.jar are independent, fetch them concurrently over the shared session
+    downloads = []
     termius_apk = os.path.join(file_dir, APKM_FILENAME)
     if not os.path.exists(termius_apk):
-        download_termius_apk(file_dir, APKM_FILENAME)
+        downloads.append((download_termius_apk, APKM_FILENAME))
     apk_editor_jar = os.path.join(file_dir, APK_EDITOR_FILENAME)
     if not os.path.exists(apk_editor_jar):
-        download_apk_editor_jar(file_dir, APK_EDITOR_FILENAME)
-    sign_keystore = os.path.join(file_dir, sign_properties["sign.keystore"])
-    if not os.path.exists(sign_keystore):
-        generate_keystore(file_dir, sign_properties)
+        downloads.append((download_apk_editor_jar, APK_EDITOR_FILENAME))
+    if downloads:
+        with ThreadPoolExecutor(max_workers=len(downloads)) as executor:
+            futures = [executor.submit(download, file_dir, filename) for download, filename in downloads]
+            for future in futures:
+                future.result()
+    for variant in variants:
+        sign_properties = variant["sign_properties"]
+        sign_keystore = os.path.join(file_dir, sign_properties["sign.keystore"])
+        if not os.path.exists(sign_keystore):
+            generate_keystore(file_dir, sign_properties)
 
 
 def main():
     logger.info("Process initialization started")
     script_path = Path(__file__).resolve()
     script_dir = script_path.parent
+    parser = argparse.ArgumentParser(description="Build the localized Termius Android APK.")
+    parser.add_argument("--variants", metavar="FILE", help="JSON list of variants to build in one run, e.g. "
+                        '[{"name": "zh", "strings": "strings.xml", "sign": "apk.sign.properties"}]')
+    parser.add_argument("--no-cache", action="store_true", help=f"Run every stage instead of reusing outputs cached in {DIR_CACHE}")
+    parser.add_argument("--apksigner-verify", action="store_true", help="Also verify signed APKs with apksigner")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Worker processes for building variants, 0 for all CPUs (default: %(default)s)")
+    args = parser.parse_args()
+
     sign_properties = load_sign_properties(script_dir)
     if not sign_properties:
         logger.error("Signature configuration file not found")
         sys.exit(1)
     try:
-        file_exists(script_dir, sign_properties)
-        apk_file_modify(script_dir, sign_properties)
+        if args.variants:
+            variants = load_variants(os.path.join(script_dir, args.variants), script_dir, sign_properties)
+        else:
+            variants = [default_variant(script_dir, sign_properties)]
+        file_exists(script_dir, variants)
+        apk_file_modify(script_dir, variants, args.jobs, not args.no_cache, args.apksigner_verify)
     except Exception as e:
         logger.error(f"Process terminated abnormally: {e}")
         sys.exit(1)
+    finally:
+        close_session()
     logger.info("Process completed successfully")
 
 
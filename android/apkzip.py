@@ -0,0 +1,170 @@
+"""Rewriting APK (zip) archives by copying compressed entries byte-for-byte"""
+import struct
+import zipfile
+import zlib
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_RECORD = struct.Struct("<IHHHHIIH")
+LOCAL_HEADER_SIGNATURE = 0x04034B50
+CENTRAL_HEADER_SIGNATURE = 0x02014B50
+END_RECORD_SIGNATURE = 0x06054B50
+FLAG_DATA_DESCRIPTOR = 0x0008
+FLAG_UTF8 = 0x0800
+ZIP64_LIMIT = 0xFFFFFFFF
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# zipalign -p 4: stored entries start on 4-byte boundaries, stored shared libraries on page boundaries
+ALIGNMENT = 4
+PAGE_ALIGNMENT = 4096
+# Extra field record used by zipalign/apksigner to pad local headers: id, size, alignment, zero padding
+ALIGNMENT_EXTRA_ID = 0xD935
+ALIGNMENT_EXTRA_MIN_SIZE = 6
+
+# v1 (JAR) signature files, regenerated by the signer
+SIGNATURE_SUFFIXES = (".SF", ".RSA", ".DSA", ".EC")
+
+
+def is_signature_file(name):
+    """Check whether a zip entry belongs to the v1 signature in META-INF"""
+    if not name.startswith("META-INF/") or "/" in name[len("META-INF/"):]:
+        return False
+    return name == "META-INF/MANIFEST.MF" or name.upper().endswith(SIGNATURE_SUFFIXES)
+
+
+def dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11 | minute << 5 | second // 2), ((year - 1980) << 9 | month << 5 | day)
+
+
+def encode_name(info):
+    return info.filename.encode("utf-8" if info.flag_bits & FLAG_UTF8 else "cp437")
+
+
+def compress(data, method):
+    if method == zipfile.ZIP_STORED:
+        return data
+    if method == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+        return compressor.compress(data) + compressor.flush()
+    raise ValueError(f"Unsupported compression method {method}")
+
+
+def copy_range(src, dst, length):
+    """Copy length bytes from the current position of src to dst"""
+    while length:
+        chunk = src.read(min(length, COPY_BUFFER_SIZE))
+        if not chunk:
+            raise EOFError("Unexpected end of zip file")
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def entry_alignment(info):
+    """Required data alignment of an entry, 1 for compressed entries"""
+    if info.compress_type != zipfile.ZIP_STORED:
+        return 1
+    return PAGE_ALIGNMENT if info.filename.endswith(".so") else ALIGNMENT
+
+
+def strip_alignment(extra):
+    """Drop alignment records and the raw zero padding older zipalign versions append to the extra field"""
+    records = []
+    pos = 0
+    while pos + 4 <= len(extra):
+        record_id, size = struct.unpack_from("<HH", extra, pos)
+        if pos + 4 + size > len(extra) or record_id == 0 and not any(extra[pos:]):
+            break
+        if record_id != ALIGNMENT_EXTRA_ID:
+            records.append(extra[pos:pos + 4 + size])
+        pos += 4 + size
+    return b"".join(records)
+
+
+def align_extra(extra, data_offset, alignment):
+    """Extend the local extra field so that data written after it lands on an alignment boundary"""
+    padding = -data_offset % alignment
+    if not padding:
+        return extra
+    while padding < ALIGNMENT_EXTRA_MIN_SIZE:
+        padding += alignment
+    return extra + struct.pack("<HHH", ALIGNMENT_EXTRA_ID, padding - 4, alignment) + b"\0" * (padding - ALIGNMENT_EXTRA_MIN_SIZE)
+
+
+def read_local_extra(src, info):
+    """Position src at the entry's data and return its local extra field"""
+    src.seek(info.header_offset)
+    header = LOCAL_HEADER.unpack(src.read(LOCAL_HEADER.size))
+    if header[0] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    src.seek(header[9], 1)
+    return src.read(header[10])
+
+
+def rewrite_apk(src_path, dst_path, replacements=None, exclude=is_signature_file, align=False):
+    """Write a copy of an APK with some entries replaced
+
+    Entries not in replacements are copied without recompression, replacements keep the original entry's
+    compression method. Entries matched by exclude (the v1 signature by default) are dropped, as is any
+    APK signing block, so the result must be signed again. With align, the output is aligned the way
+    zipalign -p 4 does in the same pass.
+    """
+    replacements = replacements or {}
+    central = []
+    with zipfile.ZipFile(src_path) as source, open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        for info in source.infolist():
+            if exclude and exclude(info.filename):
+                continue
+            extra = read_local_extra(src, info)
+            content = replacements.get(info.filename)
+            if content is not None:
+                payload = compress(content, info.compress_type)
+                crc, compress_size, file_size = zlib.crc32(content), len(payload), len(content)
+            else:
+                crc, compress_size, file_size = info.CRC, info.compress_size, info.file_size
+            if max(compress_size, file_size, dst.tell()) >= ZIP64_LIMIT:
+                raise ValueError("Zip64 archives are not supported")
+
+            name = encode_name(info)
+            flags = info.flag_bits & ~FLAG_DATA_DESCRIPTOR
+            dos_time, dos_date = dos_date_time(info.date_time)
+            offset = dst.tell()
+            if align:
+                extra = strip_alignment(extra)
+                extra = align_extra(extra, offset + LOCAL_HEADER.size + len(name) + len(extra), entry_alignment(info))
+            dst.write(LOCAL_HEADER.pack(LOCAL_HEADER_SIGNATURE, info.extract_version, flags, info.compress_type,
+                                        dos_time, dos_date, crc, compress_size, file_size, len(name), len(extra)))
+            dst.write(name)
+            dst.write(extra)
+            if content is not None:
+                dst.write(payload)
+            else:
+                copy_range(src, dst, compress_size)
+            central.append(CENTRAL_HEADER.pack(
+                CENTRAL_HEADER_SIGNATURE, info.create_version | info.create_system << 8, info.extract_version, flags,
+                info.compress_type, dos_time, dos_date, crc, compress_size, file_size, len(name), len(info.extra),
+                len(info.comment), 0, info.internal_attr, info.external_attr, offset) + name + info.extra + info.comment)
+
+        central_offset = dst.tell()
+        for record in central:
+            dst.write(record)
+        central_size = dst.tell() - central_offset
+        dst.write(END_RECORD.pack(END_RECORD_SIGNATURE, 0, 0, len(central), len(central), central_size,
+                                  central_offset, len(source.comment)) + source.comment)
+
+
+def zipalign(src_path, dst_path):
+    """Align an APK without changing its entries, equivalent to zipalign -p -f 4"""
+    rewrite_apk(src_path, dst_path, exclude=None, align=True)
+
+
+def is_aligned(path):
+    """Check the alignment of every stored entry, equivalent to zipalign -c -p 4"""
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as file:
+        for info in archive.infolist():
+            alignment = entry_alignment(info)
+            if alignment > 1:
+                read_local_extra(file, info)
+                if file.tell() % alignment:
+                    return False
+    return True
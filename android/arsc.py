@@ -0,0 +1,406 @@
+"""Reading and in-place patching of compiled Android resource tables (resources.arsc), and reading compiled manifests"""
+import re
+import struct
+import xml.etree.ElementTree as ET
+
+# ------------------------------ Chunk Types ------------------------------
+RES_STRING_POOL_TYPE = 0x0001
+RES_TABLE_TYPE = 0x0002
+RES_XML_TYPE = 0x0003
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+RES_TABLE_PACKAGE_TYPE = 0x0200
+RES_TABLE_TYPE_TYPE = 0x0201
+
+# ------------------------------ Flags ------------------------------
+SORTED_FLAG = 0x0001
+UTF8_FLAG = 0x0100
+TYPE_FLAG_SPARSE = 0x01
+TYPE_FLAG_OFFSET16 = 0x02
+ENTRY_FLAG_COMPLEX = 0x0001
+ENTRY_FLAG_COMPACT = 0x0008
+VALUE_TYPE_STRING = 0x03
+VALUE_TYPE_INT_DEC = 0x10
+VALUE_TYPE_INT_HEX = 0x11
+NO_STRING = 0xFFFFFFFF
+# android:minSdkVersion, as listed in the manifest's resource map
+MIN_SDK_VERSION_ATTR = 0x0101020C
+# Platform default when a manifest declares no minSdkVersion
+DEFAULT_MIN_SDK = 1
+NO_ENTRY = 0xFFFFFFFF
+NO_ENTRY16 = 0xFFFF
+SPAN_END = 0xFFFFFFFF
+
+# Markup elements that aapt drops while keeping their text
+IGNORED_SPAN_TAGS = ("{urn:oasis:names:tc:xliff:document:1.2}g",)
+ESCAPES = {"n": "\n", "t": "\t"}
+XML_WHITESPACE = " \t\n\r\f\v"
+HEX_DIGITS = re.compile("[0-9a-fA-F]{0,4}")
+
+
+class ArscError(Exception):
+    """The resource table uses a layout this patcher does not rewrite"""
+
+
+class StringPool:
+    """A ResStringPool chunk; strings can be appended and the chunk rebuilt, existing indices never move"""
+
+    def __init__(self, data, offset):
+        (chunk_type, header_size, size, self.string_count, self.style_count, self.flags,
+         strings_start, styles_start) = struct.unpack_from("<HHIIIIII", data, offset)
+        if chunk_type != RES_STRING_POOL_TYPE:
+            raise ArscError(f"Expected a string pool at offset {offset}")
+        self.size = size
+        self.utf8 = bool(self.flags & UTF8_FLAG)
+        offsets_start = offset + header_size
+        self.string_offsets = list(struct.unpack_from(f"<{self.string_count}I", data, offsets_start))
+        self.style_offsets = list(struct.unpack_from(f"<{self.style_count}I", data, offsets_start + 4 * self.string_count))
+        strings_end = offset + (styles_start or size)
+        self.strings_data = bytearray(data[offset + strings_start:strings_end])
+        self.styles_data = bytearray(data[offset + styles_start:offset + size]) if styles_start else bytearray()
+        # Styled strings appended by add(), as (index, spans)
+        self.new_styles = []
+        self._unstyled_index = None
+
+    def __len__(self):
+        return len(self.string_offsets)
+
+    def get(self, index):
+        """Decode the string at index"""
+        pos = self.string_offsets[index]
+        if self.utf8:
+            _, pos = self._read_length8(pos)
+            length, pos = self._read_length8(pos)
+            return bytes(self.strings_data[pos:pos + length]).decode("utf-8", errors="replace")
+        length, pos = self._read_length16(pos)
+        return bytes(self.strings_data[pos:pos + 2 * length]).decode("utf-16-le", errors="replace")
+
+    def _read_length8(self, pos):
+        length = self.strings_data[pos]
+        if length & 0x80:
+            return (length & 0x7F) << 8 | self.strings_data[pos + 1], pos + 2
+        return length, pos + 1
+
+    def _read_length16(self, pos):
+        length = struct.unpack_from("<H", self.strings_data, pos)[0]
+        if length & 0x8000:
+            return (length & 0x7FFF) << 16 | struct.unpack_from("<H", self.strings_data, pos + 2)[0], pos + 4
+        return length, pos + 2
+
+    def add(self, text, spans=()):
+        """Append a string (with optional (tag, first, last) spans) and return its index
+
+        Unstyled strings reuse an existing unstyled entry with the same text.
+        """
+        if not spans:
+            if self._unstyled_index is None:
+                self._unstyled_index = {}
+                for index in range(self.style_count, len(self)):
+                    self._unstyled_index.setdefault(self.get(index), index)
+            if text in self._unstyled_index:
+                return self._unstyled_index[text]
+        index = len(self.string_offsets)
+        self.string_offsets.append(len(self.strings_data))
+        self.strings_data += self._encode(text)
+        if spans:
+            self.new_styles.append((index, [(self.add(tag), first, last) for tag, first, last in spans]))
+        else:
+            self._unstyled_index[text] = index
+        return index
+
+    def _encode(self, text):
+        utf16_length = len(text.encode("utf-16-le")) // 2
+        if self.utf8:
+            encoded = text.encode("utf-8")
+            return encode_length8(utf16_length) + encode_length8(len(encoded)) + encoded + b"\0"
+        return encode_length16(utf16_length) + text.encode("utf-16-le") + b"\0\0"
+
+    def build(self):
+        """Serialize the pool; strings styled by add() extend the style array, gaps get an empty style"""
+        strings_data = self.strings_data + b"\0" * (-len(self.strings_data) % 4)
+        styles_data = bytearray(self.styles_data)
+        style_offsets = list(self.style_offsets)
+        if self.new_styles:
+            empty_style = len(styles_data)
+            styles_data += struct.pack("<I", SPAN_END)
+            for index, spans in self.new_styles:
+                style_offsets.extend([empty_style] * (index - len(style_offsets)))
+                style_offsets.append(len(styles_data))
+                for name, first, last in spans:
+                    styles_data += struct.pack("<III", name, first, last)
+                styles_data += struct.pack("<I", SPAN_END)
+            styles_data += struct.pack("<II", SPAN_END, SPAN_END)
+
+        header_size = 28
+        strings_start = header_size + 4 * (len(self.string_offsets) + len(style_offsets))
+        styles_start = strings_start + len(strings_data) if style_offsets else 0
+        size = strings_start + len(strings_data) + len(styles_data)
+        flags = self.flags & ~SORTED_FLAG if len(self) > self.string_count else self.flags
+        return b"".join((
+            struct.pack("<HHIIIIII", RES_STRING_POOL_TYPE, header_size, size, len(self.string_offsets),
+                        len(style_offsets), flags, strings_start, styles_start),
+            struct.pack(f"<{len(self.string_offsets)}I", *self.string_offsets),
+            struct.pack(f"<{len(style_offsets)}I", *style_offsets),
+            strings_data,
+            styles_data,
+        ))
+
+
+class ResourceTable:
+    """A parsed resources.arsc; entry values are patched in place and the global string pool is rebuilt"""
+
+    def __init__(self, data):
+        self.data = bytearray(data)
+        chunk_type, self.header_size, size, _ = struct.unpack_from("<HHII", self.data, 0)
+        if chunk_type != RES_TABLE_TYPE:
+            raise ArscError("Not a resource table")
+        self.string_pool = None
+        self.packages = []
+        for offset, chunk_type in iter_chunks(self.data, self.header_size, size):
+            if chunk_type == RES_STRING_POOL_TYPE and self.string_pool is None:
+                self.pool_offset = offset
+                self.string_pool = StringPool(self.data, offset)
+            elif chunk_type == RES_TABLE_PACKAGE_TYPE:
+                self.packages.append(offset)
+        if self.string_pool is None:
+            raise ArscError("Resource table has no global string pool")
+
+    def iter_default_entries(self, type_name):
+        """Yield (key name, entry offset) for every entry of type_name in the default configuration"""
+        for package in self.packages:
+            header_size, size = struct.unpack_from("<HI", self.data, package + 2)
+            type_strings, _, key_strings = struct.unpack_from("<III", self.data, package + 268)
+            type_pool = StringPool(self.data, package + type_strings)
+            key_pool = StringPool(self.data, package + key_strings)
+            type_ids = [i + 1 for i in range(len(type_pool)) if type_pool.get(i) == type_name]
+            for offset, chunk_type in iter_chunks(self.data, package + header_size, package + size):
+                if chunk_type != RES_TABLE_TYPE_TYPE or self.data[offset + 8] not in type_ids:
+                    continue
+                if not is_default_config(self.data, offset + 20):
+                    continue
+                for entry in iter_type_entries(self.data, offset):
+                    key = struct.unpack_from("<H" if is_compact_entry(self.data, entry) else "<4xI", self.data, entry)[0]
+                    yield key_pool.get(key), entry
+
+    def set_string_values(self, values):
+        """Point default string resources named in values at new pool strings
+
+        values maps resource names to (text, spans) as returned by parse_string_values. Returns the names
+        changed and the default string names values did not cover.
+        """
+        changed = set()
+        untranslated = []
+        for name, entry in self.iter_default_entries("string"):
+            if name not in values:
+                untranslated.append(name)
+                continue
+            flags = struct.unpack_from("<H", self.data, entry + 2)[0]
+            if flags & ENTRY_FLAG_COMPLEX:
+                raise ArscError(f"String resource {name} is a bag, not a simple value")
+            index = self.string_pool.add(*values[name])
+            if flags & ENTRY_FLAG_COMPACT:
+                # Compact entries keep the value type in the high byte of the flags
+                struct.pack_into("<HI", self.data, entry + 2, (flags & 0xFF) | VALUE_TYPE_STRING << 8, index)
+            else:
+                value = entry + struct.unpack_from("<H", self.data, entry)[0]
+                struct.pack_into("<BI", self.data, value + 3, VALUE_TYPE_STRING, index)
+            changed.add(name)
+        return changed, untranslated
+
+    def to_bytes(self):
+        """Serialize the table with the rebuilt global string pool"""
+        pool = self.string_pool.build()
+        data = self.data[:self.pool_offset] + pool + self.data[self.pool_offset + self.string_pool.size:]
+        struct.pack_into("<I", data, 4, len(data))
+        return bytes(data)
+
+
+def iter_chunks(data, start, end):
+    """Yield (offset, type) of the consecutive chunks between start and end"""
+    offset = start
+    while offset < end:
+        chunk_type, _, size = struct.unpack_from("<HHI", data, offset)
+        if size < 8:
+            raise ArscError(f"Invalid chunk size at offset {offset}")
+        yield offset, chunk_type
+        offset += size
+
+
+def iter_type_entries(data, offset):
+    """Yield the absolute offsets of the entries present in a ResTable_type chunk"""
+    header_size = struct.unpack_from("<H", data, offset + 2)[0]
+    flags = data[offset + 9]
+    entry_count, entries_start = struct.unpack_from("<II", data, offset + 12)
+    index_start = offset + header_size
+    entries = offset + entries_start
+    if flags & TYPE_FLAG_SPARSE:
+        for i in range(entry_count):
+            yield entries + 4 * struct.unpack_from("<H", data, index_start + 4 * i + 2)[0]
+    elif flags & TYPE_FLAG_OFFSET16:
+        for entry_offset in struct.unpack_from(f"<{entry_count}H", data, index_start):
+            if entry_offset != NO_ENTRY16:
+                yield entries + 4 * entry_offset
+    else:
+        for entry_offset in struct.unpack_from(f"<{entry_count}I", data, index_start):
+            if entry_offset != NO_ENTRY:
+                yield entries + entry_offset
+
+
+def is_compact_entry(data, entry):
+    return bool(struct.unpack_from("<H", data, entry + 2)[0] & ENTRY_FLAG_COMPACT)
+
+
+def is_default_config(data, offset):
+    """A ResTable_config with every qualifier unset"""
+    size = struct.unpack_from("<I", data, offset)[0]
+    return not any(data[offset + 4:offset + size])
+
+
+def encode_length8(length):
+    if length > 0x7FFF:
+        raise ArscError("String too long for a UTF-8 string pool")
+    return bytes((length >> 8 | 0x80, length & 0xFF)) if length > 0x7F else bytes((length,))
+
+
+def encode_length16(length):
+    if length > 0x7FFFFFFF:
+        raise ArscError("String too long for a UTF-16 string pool")
+    return struct.pack("<HH", length >> 16 | 0x8000, length & 0xFFFF) if length > 0x7FFF else struct.pack("<H", length)
+
+
+class StringBuilder:
+    """Flattens string resource text the way aapt2 compiles it
+
+    Outside double quotes, runs of whitespace collapse into one space and leading/trailing whitespace is
+    dropped; unescaped double quotes only toggle quoting; backslash escapes (\\n, \\t, \\uXXXX, \\<char>)
+    are resolved. Lengths are counted in UTF-16 units, as span positions are.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.length = 0
+        self.quoted = False
+        self.last_space = True
+        self.trailing_space = False
+
+    def append_text(self, text):
+        i = 0
+        while i < len(text):
+            char = text[i]
+            i += 1
+            if not self.quoted and char in XML_WHITESPACE:
+                if not self.last_space:
+                    self._append(" ", collapsed=True)
+                    self.last_space = True
+                continue
+            self.last_space = False
+            if char == "\\":
+                if i == len(text):
+                    continue
+                char = text[i]
+                i += 1
+                if char == "u":
+                    digits = HEX_DIGITS.match(text, i).group()
+                    i += len(digits)
+                    self._append(chr(int(digits, 16)) if digits else char)
+                else:
+                    self._append(ESCAPES.get(char, char))
+            elif char == '"':
+                self.quoted = not self.quoted
+            else:
+                self._append(char)
+
+    def _append(self, text, collapsed=False):
+        self.parts.append(text)
+        self.length += utf16_length(text)
+        self.trailing_space = collapsed
+
+    def build(self):
+        """Return the flattened text with the trailing collapsed space dropped, and its UTF-16 length"""
+        if self.trailing_space:
+            self.parts.pop()
+            self.length -= 1
+        return "".join(self.parts), self.length
+
+
+def utf16_length(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def flatten_element(element):
+    """Turn a <string> element into (text, spans) with aapt-style "tag;attr=value" span names
+
+    Span positions are inclusive UTF-16 indices, as ResStringPool stores them.
+    """
+    builder = StringBuilder()
+    spans = []
+
+    def visit(node):
+        if node.text:
+            builder.append_text(node.text)
+        for child in node:
+            start = builder.length
+            visit(child)
+            end = builder.length
+            if child.tag not in IGNORED_SPAN_TAGS and end > start:
+                tag = ";".join([child.tag] + [f"{key}={value}" for key, value in child.attrib.items()])
+                spans.append((tag, start, end - 1))
+            if child.tail:
+                builder.append_text(child.tail)
+
+    visit(element)
+    text, length = builder.build()
+    # A span ending on the dropped trailing space is clamped to the text
+    spans = [(tag, first, min(last, length - 1)) for tag, first, last in spans if first < length]
+    return text, sorted(spans, key=lambda span: span[1])
+
+
+def read_min_sdk(manifest_data):
+    """Return android:minSdkVersion of <uses-sdk> in a compiled AndroidManifest.xml, DEFAULT_MIN_SDK if absent
+
+    A codename (preview SDK) value counts as the newest release, so it is returned as a large number.
+    """
+    chunk_type, header_size, size = struct.unpack_from("<HHI", manifest_data, 0)
+    if chunk_type != RES_XML_TYPE:
+        raise ArscError("Not a compiled XML document")
+    strings = None
+    resource_ids = []
+    for offset, chunk_type in iter_chunks(manifest_data, header_size, size):
+        if chunk_type == RES_STRING_POOL_TYPE and strings is None:
+            strings = StringPool(manifest_data, offset)
+        elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+            chunk_header, chunk_size = struct.unpack_from("<HI", manifest_data, offset + 2)
+            resource_ids = struct.unpack_from(f"<{(chunk_size - chunk_header) // 4}I", manifest_data, offset + chunk_header)
+        elif chunk_type == RES_XML_START_ELEMENT_TYPE:
+            chunk_header = struct.unpack_from("<H", manifest_data, offset + 2)[0]
+            element = offset + chunk_header
+            name, attribute_start, attribute_size, attribute_count = struct.unpack_from("<4xIHHH", manifest_data, element)
+            if strings is None or strings.get(name) != "uses-sdk":
+                continue
+            for i in range(attribute_count):
+                attribute = element + attribute_start + i * attribute_size
+                name, raw_value, data_type, data = struct.unpack_from("<4xII3xBI", manifest_data, attribute)
+                named = resource_ids[name] == MIN_SDK_VERSION_ATTR if name < len(resource_ids) else strings.get(name) == "minSdkVersion"
+                if not named:
+                    continue
+                if data_type in (VALUE_TYPE_INT_DEC, VALUE_TYPE_INT_HEX):
+                    return data
+                if raw_value != NO_STRING and strings.get(raw_value).isdigit():
+                    return int(strings.get(raw_value))
+                return NO_STRING
+            return DEFAULT_MIN_SDK
+    return DEFAULT_MIN_SDK
+
+
+def parse_string_values(xml_path):
+    """Read a values/strings.xml into {name: (text, spans)}"""
+    root = ET.parse(xml_path).getroot()
+    return {element.get("name"): flatten_element(element) for element in root.iter("string") if element.get("name")}
+
+
+def patch_string_resources(arsc_data, xml_path):
+    """Return (patched resources.arsc bytes, names changed, untranslated names, names the table lacks)"""
+    values = parse_string_values(xml_path)
+    table = ResourceTable(arsc_data)
+    changed, untranslated = table.set_string_values(values)
+    return table.to_bytes(), changed, untranslated, sorted(set(values) - changed)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""app.asar 归档的读取与写入, 不依赖 Node.js 的 asar 命令行工具"""
+import copy
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+# asar 文件完整性校验的分块大小(与官方 asar 工具一致)
+INTEGRITY_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class AsarArchive:
+    """以内存映射方式打开的 asar 归档, 打包在归档内的文件可零拷贝读取"""
+
+    def __init__(self, path, unpacked_dir=None):
+        self.path = path
+        self.unpacked_dir = unpacked_dir or f"{path}.unpacked"
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+            self.header, self.data_offset = parse_header(self._view)
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """释放内存映射, 调用前需确保 read 返回的 memoryview 均已释放"""
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def iter_files(self, prefix=""):
+        """遍历归档内的文件(不含目录与链接), 返回 (相对路径, 条目)"""
+        node = self.header
+        parts = [part for part in prefix.strip("/").split("/") if part]
+        for part in parts:
+            node = node.get("files", {}).get(part)
+            if node is None:
+                return
+        if "files" not in node:
+            if not is_link_entry(node):
+                yield "/".join(parts), node
+            return
+        yield from walk_entries(node["files"], "/".join(parts))
+
+    def get_entry(self, path):
+        """按相对路径查找条目, 不存在时返回 None"""
+        node = self.header
+        for part in path.strip("/").split("/"):
+            node = node.get("files", {}).get(part)
+            if node is None:
+                return None
+        return node
+
+    def read(self, path):
+        """读取文件内容: 打包在归档内的文件返回 memoryview, 解包存放的文件返回 bytes"""
+        entry = self.get_entry(path)
+        if entry is None or "files" in entry or is_link_entry(entry):
+            raise FileNotFoundError(f"{path} not found in {self.path}")
+        if entry.get("unpacked"):
+            with open(os.path.join(self.unpacked_dir, *path.split("/")), "rb") as file:
+                return file.read()
+        start = self.data_offset + int(entry["offset"])
+        return self._view[start:start + entry["size"]]
+
+    def write(self, dest_path, replacements=None, unpack_dirs=(), unpacked_dir=None):
+        """写出新归档: 未修改的条目直接复制原始字节区间, 仅替换 replacements 中的文件
+
+        unpack_dirs 中的目录(如 node_modules/@termius)与 asar pack --unpack-dir 一样存放到 .unpacked 目录。
+        """
+        replacements = replacements or {}
+        unpacked_dir = unpacked_dir or f"{dest_path}.unpacked"
+        same_unpacked_dir = os.path.abspath(unpacked_dir) == os.path.abspath(self.unpacked_dir)
+        header = copy.deepcopy(self.header)
+        # 数据区按顺序由若干片段组成: [源偏移, 长度] 表示从原归档复制, bytes 表示新内容
+        chunks = []
+        offset = 0
+        for path, entry in walk_entries(header["files"]):
+            content = replacements.get(path)
+            if content is not None:
+                entry["size"] = len(content)
+                if "integrity" in entry:
+                    entry["integrity"] = compute_integrity(content)
+
+            if entry.get("unpacked") or is_in_dirs(path, unpack_dirs):
+                if content is None and entry.get("unpacked") and same_unpacked_dir:
+                    continue
+                data = content if content is not None else self.read(path)
+                write_unpacked_file(unpacked_dir, path, data, entry.get("executable"))
+                entry.pop("offset", None)
+                entry["unpacked"] = True
+                continue
+
+            if content is not None:
+                chunks.append(content)
+            else:
+                source = self.data_offset + int(entry["offset"])
+                if chunks and isinstance(chunks[-1], list) and sum(chunks[-1]) == source:
+                    chunks[-1][1] += entry["size"]
+                else:
+                    chunks.append([source, entry["size"]])
+            entry["offset"] = str(offset)
+            offset += entry["size"]
+
+        with open(dest_path, "wb") as file:
+            file.write(build_header(header))
+            for chunk in chunks:
+                if isinstance(chunk, list):
+                    file.write(self._view[chunk[0]:chunk[0] + chunk[1]])
+                else:
+                    file.write(chunk)
+
+    def extract(self, dest_dir):
+        """将归档内的全部文件(含解包存放的文件)解压到 dest_dir, 符号链接条目会被跳过"""
+        for path, entry in walk_entries(self.header["files"]):
+            data = self.read(path)
+            try:
+                write_unpacked_file(dest_dir, path, data, entry.get("executable"))
+            finally:
+                if isinstance(data, memoryview):
+                    data.release()
+
+
+def parse_header(buf):
+    """解析 Chromium Pickle 格式的归档头, 返回 (头部 JSON, 数据区起始偏移)"""
+    size_pickle_len, header_size = struct.unpack_from("<II", buf, 0)
+    if size_pickle_len != 4:
+        raise ValueError("Invalid asar header.")
+    _, json_len = struct.unpack_from("<II", buf, 8)
+    header = json.loads(bytes(buf[16:16 + json_len]).decode("utf-8"))
+    return header, 8 + header_size
+
+
+def build_header(header):
+    """生成 Chromium Pickle 格式的归档头"""
+    header_json = json.dumps(header, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    padding = -len(header_json) % 4
+    header_pickle = struct.pack("<II", len(header_json) + padding + 4, len(header_json)) + header_json + b"\0" * padding
+    return struct.pack("<II", 4, len(header_pickle)) + header_pickle
+
+
+def walk_entries(files, prefix=""):
+    """按归档头中的顺序遍历文件条目"""
+    for name, entry in files.items():
+        path = f"{prefix}/{name}" if prefix else name
+        if "files" in entry:
+            yield from walk_entries(entry["files"], path)
+        elif not is_link_entry(entry):
+            yield path, entry
+
+
+def is_link_entry(entry):
+    """判断是否为符号链接条目"""
+    return "link" in entry
+
+
+def is_in_dirs(path, dirs):
+    """判断路径是否位于指定目录之下"""
+    return any(path == d or path.startswith(f"{d}/") for d in dirs)
+
+
+def compute_integrity(content):
+    """计算 asar 文件完整性信息(整体及分块 SHA256)"""
+    view = memoryview(content)
+    blocks = [hashlib.sha256(view[i:i + INTEGRITY_BLOCK_SIZE]).hexdigest()
+              for i in range(0, len(view), INTEGRITY_BLOCK_SIZE)]
+    return {
+        "algorithm": "SHA256",
+        "hash": hashlib.sha256(view).hexdigest(),
+        "blockSize": INTEGRITY_BLOCK_SIZE,
+        "blocks": blocks,
+    }
+
+
+def write_unpacked_file(unpacked_dir, path, data, executable=False):
+    """写入解包存放的文件"""
+    file_path = os.path.join(unpacked_dir, *path.split("/"))
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as file:
+        file.write(data)
+    if executable:
+        os.chmod(file_path, os.stat(file_path).st_mode | 0o111)
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""lang.py 替换流程的基准测试: 离线生成合成的压缩 JS 语料与规则文件, 分阶段计时并记录吞吐量"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import string
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from asar import build_header, compute_integrity, write_unpacked_file
+from lang import UNPACK_DIRS, TermiusModifier
+
+# 语料中代码文件的分布: (路径, 占总大小的比例)
+CORPUS_LAYOUT = (
+    ("ui-process/assets/main.js", 0.70),
+    ("ui-process/assets/chunk-vendors.js", 0.15),
+    ("background-process/assets/main.js", 0.10),
+    ("main-process/main.js", 0.05),
+)
+# 不参与替换但会被打包的其他文件
+EXTRA_FILES = {
+    "package.json": b'{"name":"termius-app","main":"main-process/main.js"}',
+    "ui-process/assets/style.css": b"body{font-family:Inter,sans-serif}",
+    "node_modules/@termius/native/index.js": b"module.exports=require('./build/native.node');",
+}
+STAGES = ("load_rules", "load_files", "replace_rules", "write_files", "pack_to_asar")
+JS_KEYWORDS = ("return ", "var ", "const ", "let ", "function ", "new ", "typeof ", "void 0", "!0", "!1", "null")
+
+
+def random_identifier(rng):
+    """生成压缩后风格的短标识符"""
+    return rng.choice(string.ascii_letters + "$_") + "".join(rng.choices(string.ascii_letters + string.digits, k=rng.randint(0, 2)))
+
+
+def generate_rules(count, regex_ratio, seed):
+    """生成与 rules/localize.txt 结构相近的规则行, 返回 (规则文件内容, 语料中可命中的片段)"""
+    rng = random.Random(seed)
+    lines = []
+    needles = []
+    for i in range(count):
+        if i % 25 == 0:
+            lines.append(f"#第 {i // 25 + 1} 组")
+        if rng.random() < regex_ratio:
+            lines.append(f'/label:"Menu item {i}",([\\w$]+)\\(!1,/|label:"菜单项 {i}",\\g<1>(!1,')
+            needles.append(f'label:"Menu item {i}",{random_identifier(rng)}(!1,')
+        elif i % 3 == 0:
+            lines.append(f'title:"Section {i}"|title:"分区 {i}"')
+            needles.append(f'title:"Section {i}"')
+        else:
+            lines.append(f'"Phrase number {i}"|"短语 {i}"')
+            needles.append(f'"Phrase number {i}"')
+        if i % 50 == 49:
+            lines.append("")
+    return "\n".join(lines) + "\n", needles
+
+
+def generate_js(size, needles, match_ratio, rng):
+    """生成指定大小的压缩 JS 语料, 按比例嵌入规则可命中的片段"""
+    live = [needle for needle in needles if rng.random() < match_ratio]
+    parts = []
+    length = 0
+    while length < size:
+        if live and rng.random() < 0.05:
+            part = rng.choice(live)
+        else:
+            name = random_identifier(rng)
+            part = (f"{name}=function({random_identifier(rng)}){{{rng.choice(JS_KEYWORDS)}"
+                    f"{random_identifier(rng)}.{random_identifier(rng)}}},")
+            if rng.random() < 0.2:
+                part += f'"{" ".join(rng.choices(("Host", "Vault", "key", "the", "open", "Termius"), k=3))}",'
+        parts.append(part)
+        length += len(part)
+    # 保证每个可命中的片段至少出现一次
+    parts.extend(live)
+    return "".join(parts).encode("utf-8")
+
+
+def build_archive(path, files):
+    """按 asar 格式写出合成归档, UNPACK_DIRS 中的文件存放到 .unpacked 目录"""
+    root = {"files": {}}
+    chunks = []
+    offset = 0
+    for file_path in sorted(files):
+        data = files[file_path]
+        node = root
+        *dirs, name = file_path.split("/")
+        for part in dirs:
+            node = node["files"].setdefault(part, {"files": {}})
+        if any(file_path.startswith(f"{d}/") for d in UNPACK_DIRS):
+            node["files"][name] = {"size": len(data), "unpacked": True}
+            write_unpacked_file(f"{path}.unpacked", file_path, data)
+            continue
+        node["files"][name] = {"size": len(data), "offset": str(offset), "integrity": compute_integrity(data)}
+        chunks.append(data)
+        offset += len(data)
+    with open(path, "wb") as file:
+        file.write(build_header(root))
+        for chunk in chunks:
+            file.write(chunk)
+
+
+def prepare_workspace(work_dir, args):
+    """在临时目录中生成 resources 目录(app.asar)与规则目录, 返回语料总字节数"""
+    rules_text, needles = generate_rules(args.rules, args.regex_ratio, args.seed)
+    rng = random.Random(args.seed + 1)
+    files = dict(EXTRA_FILES)
+    corpus_bytes = 0
+    for path, ratio in CORPUS_LAYOUT:
+        files[path] = generate_js(int(args.size * 1024 * 1024 * ratio), needles, args.match_ratio, rng)
+        corpus_bytes += len(files[path])
+
+    resources_dir = os.path.join(work_dir, "resources")
+    rules_dir = os.path.join(work_dir, "rules")
+    os.makedirs(resources_dir)
+    os.makedirs(rules_dir)
+    build_archive(os.path.join(resources_dir, "app.asar"), files)
+    with open(os.path.join(rules_dir, "localize.txt"), "w", encoding="utf-8") as file:
+        file.write(rules_text)
+    return corpus_bytes
+
+
+def create_modifier(work_dir, args):
+    """创建指向临时工作区的修改器, 规则缓存写入临时目录"""
+    modifier_args = SimpleNamespace(localize=True, trial=False, style=False, skip_login=False,
+                                    jobs=args.jobs, max_memory=0, extract=False)
+    modifier = TermiusModifier(os.path.join(work_dir, "resources"), modifier_args)
+    modifier.rules_dir = os.path.join(work_dir, "rules")
+    modifier.cache_dir = os.path.join(work_dir, "cache")
+    return modifier
+
+
+def time_stages(work_dir, args):
+    """分阶段执行一次替换流程, 返回各阶段耗时(秒)"""
+    shutil.rmtree(os.path.join(work_dir, "cache"), ignore_errors=True)
+    modifier = create_modifier(work_dir, args)
+    modifier.manage_workspace()
+    modifier.open_asar()
+    timings = {}
+    try:
+        for stage in STAGES:
+            start = time.perf_counter()
+            getattr(modifier, stage)()
+            timings[stage] = time.perf_counter() - start
+    finally:
+        modifier.close_asar()
+    return timings
+
+
+def time_full_run(work_dir, args):
+    """执行一次完整的 apply_changes(含还原备份、打包), 返回耗时(秒)"""
+    modifier = create_modifier(work_dir, args)
+    start = time.perf_counter()
+    modifier.apply_changes()
+    return time.perf_counter() - start
+
+
+def summarize(samples, corpus_mb, rule_count):
+    """汇总多次运行的耗时中位数与吞吐量"""
+    seconds = statistics.median(samples)
+    return {
+        "seconds": round(seconds, 6),
+        "min_seconds": round(min(samples), 6),
+        "mb_per_s": round(corpus_mb / seconds, 3) if seconds else None,
+        "rule_mb_per_s": round(rule_count * corpus_mb / seconds, 1) if seconds else None,
+    }
+
+
+def compare_baseline(results, baseline_path):
+    """与已有基准结果对比, 输出各阶段耗时变化"""
+    try:
+        with open(baseline_path, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        return
+    if baseline.get("parameters") != results["parameters"]:
+        logging.warning("Baseline was recorded with different parameters, comparison may be misleading.")
+    for name, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if previous and previous["seconds"]:
+            ratio = current["seconds"] / previous["seconds"]
+            logging.info(f"{name:>14}: {previous['seconds']:.3f}s -> {current['seconds']:.3f}s ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lang.py patching pipeline on a synthetic corpus.")
+    parser.add_argument("--size", type=float, default=8, help="Total size of generated JS in MB (default: %(default)s)")
+    parser.add_argument("--rules", type=int, default=1400, help="Number of generated rules (default: %(default)s)")
+    parser.add_argument("--regex-ratio", type=float, default=0.05, help="Fraction of regex rules (default: %(default)s)")
+    parser.add_argument("--match-ratio", type=float, default=0.95, help="Fraction of rules present in the corpus (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per benchmark (default: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes passed to replace_rules (default: %(default)s)")
+    parser.add_argument("-o", "--output", default=os.path.join(".cache", "benchmark.json"), help="JSON file to write results to (default: %(default)s)")
+    parser.add_argument("--baseline", help="Previous JSON result to compare against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)7s - %(message)s", force=True)
+
+    work_dir = tempfile.mkdtemp(prefix="termius-bench-")
+    try:
+        corpus_bytes = prepare_workspace(work_dir, args)
+        corpus_mb = corpus_bytes / 1024 / 1024
+        logging.info(f"Generated {corpus_mb:.2f} MB corpus and {args.rules} rules in {work_dir}")
+
+        # 基准运行期间只输出警告及以上级别的日志
+        logging.getLogger().setLevel(logging.WARNING)
+        stage_samples = {stage: [] for stage in STAGES}
+        full_samples = []
+        for _ in range(args.repeat):
+            for stage, seconds in time_stages(work_dir, args).items():
+                stage_samples[stage].append(seconds)
+            full_samples.append(time_full_run(work_dir, args))
+        logging.getLogger().setLevel(logging.INFO)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    stages = {stage: summarize(samples, corpus_mb, args.rules) for stage, samples in stage_samples.items()}
+    stages["apply_changes"] = summarize(full_samples, corpus_mb, args.rules)
+    results = {
+        "parameters": {key: getattr(args, key) for key in ("size", "rules", "regex_ratio", "match_ratio", "seed", "jobs")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "corpus_bytes": corpus_bytes,
+        "stages": stages,
+    }
+
+    for name, result in stages.items():
+        logging.info(f"{name:>14}: {result['seconds']:.3f}s  {result['mb_per_s']:>9} MB/s  {result['rule_mb_per_s']:>10} rules*MB/s")
+    if args.baseline:
+        compare_baseline(results, args.baseline)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    logging.info(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
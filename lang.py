@@ -1,16 +1,92 @@
 # -*- coding: utf-8 -*-
 import argparse
+import bisect
+import difflib
+import hashlib
+import itertools
+import json
 import logging
+import mmap
+import multiprocessing
 import os
+import pickle
 import platform
 import re
 import shutil
 import stat
-import subprocess
+import string
 import sys
 import time
-import tkinter as tk
-from tkinter import filedialog
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import tkinter as tk
+    from tkinter import filedialog
+except ImportError:  # 未安装 Tk 的无界面环境
+    tk = None
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+from asar import AsarArchive
+
+# Linux 下创建 reflink 的 ioctl 请求号(FICLONE), 文件系统不支持时还原回退为硬链接或复制, 备份回退为复制
+FICLONE = 0x40049409
+# 复制文件并计算哈希时的缓冲区大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# 编译后规则集的缓存目录及格式版本, 规则结构变化时需递增版本号
+CACHE_DIR = ".cache"
+RULE_CACHE_VERSION = 3
+# 解压目录缓存中最多保留的原始目录树个数
+TREE_CACHE_LIMIT = 2
+
+LiteralRule = namedtuple("LiteralRule", ["line", "old_val", "new_val", "prefix_len", "suffix_len"])
+RegexRule = namedtuple("RegexRule", ["line", "pattern", "new_val", "anchor"])
+
+# 需要处理的代码目录(归档内相对路径)
+CODE_DIRS = ("background-process/assets", "ui-process/assets", "main-process")
+# 与 asar pack --unpack-dir {node_modules/@termius,out} 保持一致, 这些目录始终解包存放
+UNPACK_DIRS = ("node_modules/@termius", "out")
+# 替换模板中的转义字符
+TEMPLATE_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "f": "\f", "v": "\v", "a": "\a", "b": "\b"}
+# 替换模板中的分组引用
+TEMPLATE_GROUP_REF = re.compile(r"\\(?:g<[^>]*>|\d{1,2})")
+# 候选模式不超过该数量时逐个 str.find 查找, 否则使用多模式整体扫描
+DIRECT_FIND_LIMIT = 8
+# 合并执行的字面量规则涉及的分段超过该数量时, 改用全部字面量规则的匹配器整体扫描一次
+SEGMENT_SCAN_LIMIT = 8
+# 正则检查: 量词操作码、字符集重叠判断用的探测字符及字符类别
+LINT_REPEATS = tuple(op for op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+                                   getattr(sre_constants, "POSSESSIVE_REPEAT", None)) if op is not None)
+LINT_PROBE_CHARS = string.printable + "\u00a0é中"
+LINT_CATEGORIES = {
+    "CATEGORY_DIGIT": re.compile(r"\d"), "CATEGORY_NOT_DIGIT": re.compile(r"\D"),
+    "CATEGORY_SPACE": re.compile(r"\s"), "CATEGORY_NOT_SPACE": re.compile(r"\S"),
+    "CATEGORY_WORD": re.compile(r"\w"), "CATEGORY_NOT_WORD": re.compile(r"\W"),
+}
+# 正则规则在整个语料上的默认耗时上限(毫秒), 超过上限若干倍仍未完成时终止计时
+LINT_BUDGET_MS = 200
+LINT_TIMEOUT_FACTOR = 10
+# --find 每个文件每个条件最多输出的命中数
+FIND_MAX_HITS = 20
+# --profile 表格中列出的最耗时规则数
+PROFILE_TOP = 20
+# 写入时每批并行处理的文件数
+WRITE_BATCH_SIZE = 16
+# --watch 检查规则文件变化的间隔(秒)
+WATCH_INTERVAL = 0.3
+# --batch 报告的默认文件名(位于缓存目录)
+BATCH_REPORT_NAME = "batch.json"
 
 
 class TermiusModifier:
@@ -24,6 +100,21 @@ class TermiusModifier:
         """原始文件路径"""
         return os.path.join(self.termius_path, "app.asar")
 
+    @property
+    def _backup_hash_path(self):
+        """备份文件的 SHA-256 校验文件"""
+        return f"{self._backup_path}.sha256"
+
+    @property
+    def _manifest_path(self):
+        """记录各代码文件修改前后内容哈希的清单"""
+        return os.path.join(self.termius_path, "app.asar.manifest.json")
+
+    @property
+    def _unpacked_dir(self):
+        """解包存放的文件目录"""
+        return os.path.join(self.termius_path, "app.asar.unpacked")
+
     @property
     def _app_dir(self):
         return os.path.join(self.termius_path, "app")
@@ -32,53 +123,243 @@ class TermiusModifier:
         """初始化修改器实例"""
         self.termius_path = termius_path
         self.args = args
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.rules_dir = os.path.join(script_dir, "rules")
+        self.cache_dir = os.path.join(script_dir, CACHE_DIR)
+        self.archive = None
         self.files_cache = {}
+        self.modified_files = set()
+        self.replacements = {}
+        self.spool = None
+        self.manifest = {}
         self.loaded_rules = []
         self.applied_rules = set()
+        self.profile = RuleProfile() if getattr(args, "profile", None) is not None else None
+        self.rule_set = None
 
-    def load_rules(self):
-        """动态加载与参数同名的规则文件"""
-        script_dir = os.path.dirname(os.path.abspath(__file__))
+    def selected_rule_files(self):
+        """与所选参数同名的规则文件"""
         # 定义需要处理的参数列表
         rule_args = ["skip_login", "trial", "style", "localize"]
 
+        rule_files = []
         for arg in rule_args:
             if not getattr(self.args, arg, False):
                 continue
             # 自动生成文件名, 强制保持参数名与文件名一致
-            file_name = f"{arg}.txt"
-            try:
-                file_path = os.path.join(script_dir, "rules", file_name)
-                if content := read_file(file_path):
-                    self.loaded_rules.extend(content)
-            except Exception as e:
-                logging.error(f"Error loading {file_name}: {e}")
-                sys.exit(1)
+            rule_files.append(os.path.join(self.rules_dir, f"{arg}.txt"))
+        return rule_files
+
+    def load_rules(self):
+        """动态加载与参数同名的规则文件"""
+        rule_files = self.selected_rule_files()
+        cache_path = os.path.join(self.cache_dir, f"rules-{hash_rule_files(rule_files)}.pickle")
+        self.rule_set = load_rule_cache(cache_path)
+        if self.rule_set is None:
+            lines = []
+            for file_path in rule_files:
+                try:
+                    if content := read_file(file_path):
+                        lines.extend(content)
+                except Exception as e:
+                    logging.error(f"Error loading {os.path.basename(file_path)}: {e}")
+                    sys.exit(1)
+            self.rule_set = RuleSet(lines)
+            save_rule_cache(cache_path, self.rule_set)
+        else:
+            logging.debug(f"Loaded compiled rules from cache: {cache_path}")
 
-    def decompress_asar(self):
-        """解压 app.asar 文件"""
-        cmd = f"asar extract {self._original_path} {self._app_dir}"
-        run_command(cmd, shell=True)
+        for line, message in self.rule_set.errors:
+            logging.error(f"{message}: {line}")
+        self.report_dependencies()
+        self.loaded_rules = self.rule_set.lines
+
+    def report_dependencies(self):
+        """输出规则间的顺序依赖: 依赖前面规则输出的规则提示说明, 产生前面规则模式的规则给出警告"""
+        counts = {}
+        for earlier, later, kind in self.rule_set.dependencies:
+            counts[kind] = counts.get(kind, 0) + 1
+            if kind == "creates":
+                logging.info(f"Rule depends on the output of an earlier rule, keep their order: {later} ← {earlier}")
+            elif kind == "shadows":
+                logging.warning(f"Rule produces text matched by an earlier rule that has already run: {later} → {earlier}")
+        batches = sum(1 for kind, *step in self.rule_set.steps if kind == "literal" and step[1]) + bool(self.rule_set.literal_rules)
+        logging.debug(f"Rule dependency graph: {counts or 'no edges'}, literal rules form at most {batches} batches.")
+
+    def open_asar(self):
+        """以内存映射方式打开 app.asar 文件"""
+        try:
+            self.archive = AsarArchive(self._original_path, self._unpacked_dir)
+        except Exception as e:
+            logging.error(f"Failed to open {self._original_path}: {e}")
+            sys.exit(1)
+
+    def close_asar(self):
+        """关闭 app.asar 文件"""
+        if self.archive:
+            self.archive.close()
+            self.archive = None
+
+    def extract_app(self):
+        """生成修改后的 app 目录: 从按原始 app.asar 哈希缓存的只读目录树硬链接, 仅修改过的文件单独写入"""
+        tree_dir = os.path.join(self.cache_dir, "trees", self.read_backup_hash())
+        if not os.path.isdir(tree_dir):
+            logging.info("Extracting pristine app tree into cache...")
+            build_tree_cache(self._backup_path, self._unpacked_dir, tree_dir)
+            prune_tree_cache(os.path.dirname(tree_dir), TREE_CACHE_LIMIT)
+        else:
+            # 更新修改时间, 淘汰缓存时按最近使用排序
+            os.utime(tree_dir)
+        linked = clone_tree(tree_dir, self._app_dir, self.replacements)
+        logging.info(f"Extracted app directory: {linked} files linked from cache, {len(self.replacements)} written.")
 
     def pack_to_asar(self):
-        """打包 app.asar 文件"""
-        cmd = f"asar pack {self._app_dir} {self._original_path} --unpack-dir {{node_modules/@termius,out}}"
-        run_command(cmd, shell=True)
+        """打包 app.asar 文件: 未修改的文件直接复制原始字节, 仅替换修改过的文件"""
+        tmp_path = f"{self._original_path}.tmp"
+        packed = len(self.replacements)
+        try:
+            self.archive.write(tmp_path, self.replacements, UNPACK_DIRS, self._unpacked_dir)
+            self.close_asar()
+            os.replace(tmp_path, self._original_path)
+        except Exception as e:
+            logging.error(f"Failed to pack {self._original_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            sys.exit(1)
+        finally:
+            # 释放暂存区的内存映射
+            self.replacements = {}
+            if self.spool:
+                self.spool.close()
+                self.spool = None
+        logging.info(f"Packed {packed} modified files into app.asar.")
+
+    def stream_files(self):
+        """流式处理: 逐个文件读取、替换、编码后立即释放, 修改结果超出内存上限时暂存到磁盘"""
+        if self.rule_set is None:
+            self.rule_set = RuleSet(self.loaded_rules)
+        memory_limit = self.args.max_memory * 1024 * 1024
+        self.spool = ReplacementSpool(f"{self._original_path}.spool", memory_limit)
+        logging.info(f"Streaming replacement with a {self.args.max_memory} MB memory ceiling...")
+        paths = self.collect_code_files()
+        jobs = min(self.args.jobs or os.cpu_count() or 1, len(paths))
+        if jobs > 1:
+            initargs = (self.rule_set, self.archive.path, self.archive.unpacked_dir, self.profile is not None)
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_replace_worker, initargs=initargs) as executor:
+                for path, new_content, applied_rules, profile in executor.map(_replace_worker, paths):
+                    self.applied_rules.update(applied_rules)
+                    if profile:
+                        self.profile.merge(profile)
+                    self._stream_result(path, new_content)
+        else:
+            for path in paths:
+                content = self.read_entry(path)
+                new_content = self.rule_set.apply(content, self.applied_rules, self.profile)
+                self._stream_result(path, new_content if new_content != content else None)
+                del content, new_content
+        self.replacements = self.spool.contents()
+        logging.info(f"Streaming completed: {len(self.replacements)} changed, "
+                     f"{len(paths) - len(self.replacements)} unchanged files skipped.")
+
+    def _stream_result(self, path, new_content):
+        """记录单个文件的处理结果并交给暂存区"""
+        before = self.hash_entry(path)
+        self.manifest[path] = {"before": before, "after": before}
+        if new_content is None:
+            return
+        data = new_content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        self.manifest[path]["after"] = digest
+        if digest != before:
+            self.spool.add(path, data)
+
+    def hash_entry(self, path):
+        """计算归档内文件的 SHA-256"""
+        data = self.archive.read(path)
+        try:
+            return hashlib.sha256(data).hexdigest()
+        finally:
+            if isinstance(data, memoryview):
+                data.release()
+
+    def read_entry(self, path):
+        """读取归档内的文本文件"""
+        data = self.archive.read(path)
+        try:
+            return str(data, "utf-8")
+        except Exception as e:
+            logging.error(f"Read error: {path} - {e}")
+            sys.exit(1)
+        finally:
+            if isinstance(data, memoryview):
+                data.release()
 
     def restore_backup(self):
-        """完整还原操作"""
+        """完整还原操作: 当前 app.asar 已与备份一致时跳过, 否则以 reflink/硬链接/复制的顺序还原"""
         if not os.path.exists(self._backup_path):
             logging.info("Backup file not found, skip backup restore.")
             return
 
-        shutil.copy(self._backup_path, self._original_path)
-        logging.info("Restored from backup.")
+        backup_hash = self.read_backup_hash()
+        if self.is_pristine(backup_hash):
+            logging.info("app.asar already matches backup, skip backup restore.")
+            return
+        try:
+            method, digest = clone_file(self._backup_path, self._original_path)
+        except Exception as e:
+            logging.error(f"Failed to restore {self._original_path}: {e}")
+            sys.exit(1)
+        # reflink 与硬链接不读取数据, 直接信任; 只有缓冲复制时顺带校验备份的哈希
+        if digest is not None and digest != backup_hash:
+            logging.error(f"Backup {self._backup_path} does not match its SHA-256, remove it and reinstall Termius.")
+            sys.exit(1)
+        logging.info(f"Restored from backup ({method}).")
+
+    def is_pristine(self, backup_hash):
+        """判断当前 app.asar 是否与备份内容一致"""
+        if not os.path.exists(self._original_path):
+            return False
+        # 即使与备份是同一 inode 也要校验哈希, 原地覆盖会同时改动两者
+        if os.path.getsize(self._original_path) != os.path.getsize(self._backup_path):
+            return False
+        return hash_file(self._original_path) == backup_hash
+
+    def read_backup_hash(self):
+        """读取备份的 SHA-256, 旧版本创建的备份没有校验文件时补算"""
+        try:
+            with open(self._backup_hash_path, "r", encoding="utf-8") as file:
+                return file.read().split()[0]
+        except (OSError, IndexError):
+            digest = hash_file(self._backup_path)
+            self.write_backup_hash(digest)
+            return digest
+
+    def write_backup_hash(self, digest):
+        """以 sha256sum 格式保存备份的 SHA-256"""
+        with open(self._backup_hash_path, "w", encoding="utf-8") as file:
+            file.write(f"{digest}  {os.path.basename(self._original_path)}\n")
 
     def create_backup(self):
-        """智能备份管理（仅在缺失时创建）"""
+        """智能备份管理（仅在缺失时创建）, 同时记录原始 app.asar 的 SHA-256
+
+        备份以 reflink 或复制创建; 旧版本以硬链接创建、或以硬链接还原后仍与 app.asar 共用 inode 的备份会先断开为独立副本。
+        """
+        shared = os.path.exists(self._backup_path) and os.path.exists(self._original_path)
+        if shared and os.path.samefile(self._original_path, self._backup_path):
+            try:
+                method, _ = clone_file(self._original_path, self._backup_path, hardlink=False)
+            except Exception as e:
+                logging.error(f"Failed to separate backup {self._backup_path} from app.asar: {e}")
+                sys.exit(1)
+            logging.debug(f"Separated backup from app.asar ({method}).")
         if not os.path.exists(self._backup_path):
-            shutil.copy(self._original_path, self._backup_path)
-            logging.info("Created initial backup.")
+            try:
+                method, digest = clone_file(self._original_path, self._backup_path, hardlink=False)
+                self.write_backup_hash(digest or hash_file(self._backup_path))
+            except Exception as e:
+                logging.error(f"Failed to back up {self._original_path}: {e}")
+                sys.exit(1)
+            logging.info(f"Created initial backup ({method}).")
 
     def manage_workspace(self):
         # 备份
@@ -97,87 +378,341 @@ class TermiusModifier:
         self.clean_workspace()
         if os.path.exists(self._backup_path):
             os.remove(self._backup_path)
+        if os.path.exists(self._backup_hash_path):
+            os.remove(self._backup_hash_path)
+        if os.path.exists(self._manifest_path):
+            os.remove(self._manifest_path)
 
     def load_files(self):
         """加载所有代码文件到内存"""
-        code_files = self.collect_code_files()
-        for file in code_files:
-            if os.path.exists(file):
-                self.files_cache[file] = read_file(file, strip_empty=False)
+        for path in self.collect_code_files():
+            self.files_cache[path] = self.read_entry(path)
+            self.manifest[path] = {"before": self.hash_entry(path)}
 
     def replace_content(self, file_content):
         """执行内容替换的核心逻辑"""
         if not file_content:
             return file_content
-
-        for line in self.loaded_rules:
-            try:
-                if is_comment_line(line):
-                    self.applied_rules.add(line)
-                    continue
-                old_val, new_val = parse_replace_rule(line)
-                original_content = file_content
-                if is_regex_pattern(old_val):
-                    pattern = re.compile(old_val[1:-1])
-                    file_content = pattern.sub(new_val, file_content)
-                else:
-                    file_content = file_content.replace(old_val, new_val)
-
-                if original_content != file_content:
-                    # 仅关注内容是否改变
-                    self.applied_rules.add(line)
-
-            except ValueError as e:
-                logging.error(f"Skipping invalid rule: {line} → {str(e)}")
-            except re.error as e:
-                logging.error(f"Regex error: {line} → {str(e)}")
-
-        return file_content
+        if self.rule_set is None:
+            self.rule_set = RuleSet(self.loaded_rules)
+        return self.rule_set.apply(file_content, self.applied_rules, self.profile)
 
     def replace_rules(self):
         """规则替换"""
         logging.info("Starting replacement...")
-        for file_path in self.files_cache:
-            self.files_cache[file_path] = self.replace_content(self.files_cache[file_path])
+        jobs = self.args.jobs or os.cpu_count() or 1
+        if jobs > 1 and len(self.files_cache) > 1:
+            self.replace_rules_parallel(jobs)
+        else:
+            for file_path, content in self.files_cache.items():
+                new_content = self.replace_content(content)
+                if new_content != content:
+                    self.files_cache[file_path] = new_content
+                    self.modified_files.add(file_path)
         logging.info("Replacement completed.")
 
+    def replace_rules_parallel(self, jobs):
+        """使用进程池并行替换: 每个工作进程只接收一次规则集, 并自行从归档读取文件"""
+        if self.rule_set is None:
+            self.rule_set = RuleSet(self.loaded_rules)
+        # 大文件优先调度, 使各进程负载更均衡
+        paths = sorted(self.files_cache, key=lambda path: len(self.files_cache[path]), reverse=True)
+        jobs = min(jobs, len(paths))
+        logging.info(f"Replacing with {jobs} worker processes...")
+        initargs = (self.rule_set, self.archive.path, self.archive.unpacked_dir, self.profile is not None)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_replace_worker, initargs=initargs) as executor:
+            for file_path, new_content, applied_rules, profile in executor.map(_replace_worker, paths):
+                self.applied_rules.update(applied_rules)
+                if profile:
+                    self.profile.merge(profile)
+                if new_content is not None:
+                    self.files_cache[file_path] = new_content
+                    self.modified_files.add(file_path)
+
     def write_files(self):
-        """将修改后的内容写入文件"""
+        """按批并行编码并计算哈希, 仅内容确实变化的文件会在打包时写入归档"""
         logging.info("Starting writing...")
-        for file_path, content in self.files_cache.items():
-            with open(file_path, "w", encoding="utf-8") as file:
-                file.write(content)
-        logging.info("Writing completed.")
+        paths = sorted(self.modified_files)
+        with ThreadPoolExecutor() as executor:
+            for i in range(0, len(paths), WRITE_BATCH_SIZE):
+                for path, data, digest in executor.map(self._encode_file, paths[i:i + WRITE_BATCH_SIZE]):
+                    self.manifest[path]["after"] = digest
+                    if digest != self.manifest[path]["before"]:
+                        self.replacements[path] = data
+        for entry in self.manifest.values():
+            entry.setdefault("after", entry["before"])
+        skipped = len(self.files_cache) - len(self.replacements)
+        logging.info(f"Writing completed: {len(self.replacements)} changed, {skipped} unchanged files skipped.")
+
+    def _encode_file(self, path):
+        """编码修改后的文件内容并计算哈希"""
+        data = self.files_cache[path].encode("utf-8")
+        return path, data, hashlib.sha256(data).hexdigest()
+
+    def save_manifest(self):
+        """保存内容哈希清单, 供后续运行判断哪些文件与原始 app.asar 不同"""
+        manifest = {
+            "archive": os.path.basename(self._original_path),
+            "files": self.manifest,
+        }
+        tmp_path = f"{self._manifest_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(manifest, file, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self._manifest_path)
+        except Exception as e:
+            logging.warning(f"Failed to save manifest {self._manifest_path}: {e}")
+
+    def code_extensions(self):
+        """需要处理的代码文件扩展名"""
+        return (".js", ".css") if self.args.style else (".js",)
 
     def collect_code_files(self):
-        """获取所有代码文件路径"""
-        prefix_links = [
-            os.path.join(self._app_dir, "background-process", "assets"),
-            os.path.join(self._app_dir, "ui-process", "assets"),
-            os.path.join(self._app_dir, "main-process"),
-        ]
+        """获取归档内所有代码文件路径"""
+        extensions = self.code_extensions()
         code_files = []
-        for prefix in prefix_links:
-            for root, _, files in os.walk(prefix):
-                if self.args.style:
-                    code_files.extend([os.path.join(root, f) for f in files if f.endswith((".js", ".css"))])
-                else:
-                    code_files.extend([os.path.join(root, f) for f in files if f.endswith(".js")])
+        for prefix in CODE_DIRS:
+            code_files.extend(path for path, _ in self.archive.iter_files(prefix) if path.endswith(extensions))
         return code_files
 
     def apply_changes(self):
         """规则替换功能"""
         start_time = time.monotonic()
         self.manage_workspace()
-        self.decompress_asar()
-        self.load_rules()
-        self.load_files()
-        self.replace_rules()
-        self.write_files()
-        self.pack_to_asar()
+        self.open_asar()
+        try:
+            self.load_rules()
+            if self.args.max_memory:
+                self.stream_files()
+            else:
+                self.load_files()
+                self.replace_rules()
+                self.write_files()
+            if self.args.extract:
+                self.extract_app()
+            self.pack_to_asar()
+        finally:
+            self.close_asar()
+        self.save_manifest()
         elapsed = time.monotonic() - start_time
         logging.info(f"Replacement done in {elapsed:.2f} seconds.")
+        self.report_rules()
+        if self.profile is not None:
+            self.profile.report(self.loaded_rules, self.args.profile or os.path.join(self.cache_dir, "profile.json"))
+
+    def watch_rules(self):
+        """监视模式: 原始文件内容与编译后的规则常驻内存, 规则文件保存后只重新处理受影响的规则与文件并重新打包"""
+        self.manage_workspace()
+        # 从备份读取原始内容, app.asar 可随时被替换
+        try:
+            self.archive = AsarArchive(self._backup_path, self._unpacked_dir)
+        except Exception as e:
+            logging.error(f"Failed to open {self._backup_path}: {e}")
+            sys.exit(1)
+        rule_files = self.selected_rule_files()
+        try:
+            start_time = time.monotonic()
+            self.load_rules()
+            watched = {}
+            for path in self.collect_code_files():
+                watched[path] = WatchedFile(path, self.read_entry(path), self.hash_entry(path))
+            changed = self.replace_watched(watched, list(watched))
+            self.applied_rules = set(self.rule_set.comments).union(*(file.applied for file in watched.values()))
+            self.repack_watched(watched, changed, initial=True)
+            logging.info(f"Replacement done in {time.monotonic() - start_time:.2f} seconds.")
+            self.report_rules()
+
+            stamps = rule_file_stamps(rule_files)
+            logging.info(f"Watching {', '.join(map(os.path.basename, rule_files))} for changes, press Ctrl+C to stop...")
+            while True:
+                time.sleep(WATCH_INTERVAL)
+                current = rule_file_stamps(rule_files)
+                if current == stamps:
+                    continue
+                # 等待编辑器写完文件
+                while True:
+                    time.sleep(WATCH_INTERVAL)
+                    stamps, current = current, rule_file_stamps(rule_files)
+                    if current == stamps:
+                        break
+                self.update_watched(watched, rule_files)
+        except KeyboardInterrupt:
+            logging.info("Stopped watching.")
+        finally:
+            self.close_asar()
+
+    def replace_watched(self, watched, paths):
+        """用当前规则集从原始内容重新替换指定文件, 返回内容发生变化的文件"""
+        changed = set()
+        jobs = min(self.args.jobs or os.cpu_count() or 1, len(paths))
+        if jobs > 1:
+            # 大文件优先调度, 使各进程负载更均衡
+            paths = sorted(paths, key=lambda path: len(watched[path].pristine), reverse=True)
+            initargs = (self.rule_set, self.archive.path, self.archive.unpacked_dir)
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_replace_worker, initargs=initargs) as executor:
+                for path, new_content, applied_rules, _ in executor.map(_replace_worker, paths):
+                    file = watched[path]
+                    if file.update(file.pristine if new_content is None else new_content, applied_rules):
+                        changed.add(path)
+        else:
+            for path in paths:
+                file = watched[path]
+                applied_rules = set()
+                if file.update(self.rule_set.apply(file.pristine, applied_rules), applied_rules):
+                    changed.add(path)
+        return changed
+
+    def update_watched(self, watched, rule_files):
+        """规则文件变化后增量更新: 只重新替换结果可能改变的文件, 其余文件沿用上次的结果"""
+        start_time = time.monotonic()
+        try:
+            rule_set = RuleSet(read_rule_lines(rule_files))
+        except (OSError, UnicodeDecodeError) as e:
+            logging.error(f"Failed to read rules, keeping the previous result: {e}")
+            return
+        for line, message in rule_set.errors:
+            logging.error(f"{message}: {line}")
+        change = RuleChange(self.rule_set, rule_set)
+        self.rule_set = rule_set
+        self.loaded_rules = rule_set.lines
+
+        replace = [path for path, file in watched.items() if change.affects(file)]
+        changed = self.replace_watched(watched, replace) if replace else set()
+        if changed:
+            self.repack_watched(watched, changed)
+        self.applied_rules = set(rule_set.comments).union(*(file.applied for file in watched.values()))
+        logging.info(f"Rules updated in {time.monotonic() - start_time:.2f} seconds: {change.edited} edited, "
+                     f"{len(change.removed) - change.edited} removed, {change.added} added; {len(replace)} files replaced again, "
+                     f"{len(changed)} files changed.")
+        self.report_rules()
+
+    def repack_watched(self, watched, changed, initial=False):
+        """将当前替换结果打包为 app.asar, 更新内容哈希清单, 并同步解包的 app 目录"""
+        self.replacements = {path: file.data for path, file in watched.items() if file.data is not None}
+        self.manifest = {path: {"before": file.before, "after": file.after} for path, file in watched.items()}
+        tmp_path = f"{self._original_path}.tmp"
+        try:
+            self.archive.write(tmp_path, self.replacements, UNPACK_DIRS, self._unpacked_dir)
+            os.replace(tmp_path, self._original_path)
+        except Exception as e:
+            # 监视模式下打包失败不退出, 下次规则变化时重试
+            logging.error(f"Failed to pack {self._original_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.save_manifest()
+        if self.args.extract:
+            if initial:
+                self.extract_app()
+            else:
+                for path in changed:
+                    file = watched[path]
+                    target = os.path.join(self._app_dir, *path.split("/"))
+                    with open(f"{target}.tmp", "wb") as output:
+                        output.write(file.pristine.encode("utf-8") if file.data is None else file.data)
+                    os.replace(f"{target}.tmp", target)
+        logging.info(f"Packed {len(self.replacements)} modified files into app.asar ({len(changed)} changed).")
+
+    def check_rules(self):
+        """规则覆盖检查: 只读方式打开原始归档, 与 apply_changes 一样执行全部规则但丢弃替换结果, 不备份、不写入、不打包"""
+        start_time = time.monotonic()
+        # 已修改过的安装以备份作为原始内容
+        source = self._backup_path if os.path.exists(self._backup_path) else self._original_path
+        try:
+            self.archive = AsarArchive(source, self._unpacked_dir)
+        except Exception as e:
+            logging.error(f"Failed to open {source}: {e}")
+            sys.exit(1)
+        try:
+            self.load_rules()
+            paths = self.collect_code_files()
+            logging.info(f"Checking {len(self.loaded_rules)} rules against {len(paths)} files in {source}...")
+            jobs = min(self.args.jobs or os.cpu_count() or 1, len(paths))
+            if jobs > 1:
+                initargs = (self.rule_set, self.archive.path, self.archive.unpacked_dir)
+                with ProcessPoolExecutor(max_workers=jobs, initializer=_init_replace_worker, initargs=initargs) as executor:
+                    for matched_rules in executor.map(_check_worker, paths):
+                        self.applied_rules.update(matched_rules)
+            else:
+                for path in paths:
+                    self.rule_set.apply(self.read_entry(path), self.applied_rules)
+        finally:
+            self.close_asar()
+        elapsed = time.monotonic() - start_time
+        logging.info(f"Check done in {elapsed:.2f} seconds.")
+        self.report_rules()
+
+    def lint_rules(self):
+        """正则规则检查: 静态分析高风险写法、找出可改写为字面量的规则, 并在原始代码文件上逐条计时"""
+        self.load_rules()
+        budget = self.args.lint_budget / 1000
+        problems = 0
+        rules = self.rule_set.regex_rules
+        for rule in rules:
+            if literal := regex_as_literal(rule.line.split("|", 1)[0], rule.new_val):
+                logging.info(f"Regex rule can be a literal rule: {rule.line} → {literal}")
+            for level, message in lint_regex(rule.pattern):
+                getattr(logging, level)(f"Regex rule {message}: {rule.line}")
+                problems += level == "error"
+
+        timings = self.time_regex_rules(budget)
+        for index, (seconds, files, count) in sorted(timings.items(), key=lambda item: -(item[1][0] or float("inf"))):
+            rule = rules[index]
+            if seconds is None:
+                logging.error(f"Regex rule did not finish within {budget * LINT_TIMEOUT_FACTOR:.1f}s, "
+                              f"likely catastrophic backtracking: {rule.line}")
+                problems += 1
+            elif seconds > budget:
+                logging.warning(f"Regex rule took {seconds * 1000:.0f} ms on {files} files ({count} matches), "
+                                f"over the {self.args.lint_budget} ms budget: {rule.line}")
+                problems += 1
+            else:
+                logging.debug(f"Regex rule took {seconds * 1000:.1f} ms on {files} files ({count} matches): {rule.line}")
+        logging.info(f"Linted {len(rules)} regex rules, {problems} problems found.")
+        if problems:
+            sys.exit(1)
 
+    def time_regex_rules(self, budget):
+        """在原始代码文件上计时各正则规则, 只计入包含其锚点的文件, 返回 {规则序号: (秒数或 None, 文件数, 命中数)}"""
+        source = self._backup_path if os.path.exists(self._backup_path) else self._original_path
+        try:
+            self.archive = AsarArchive(source, self._unpacked_dir)
+        except Exception as e:
+            logging.warning(f"Skipping regex timing, cannot open {source}: {e}")
+            return {}
+        try:
+            contents = [self.read_entry(path) for path in self.collect_code_files()]
+        finally:
+            self.close_asar()
+        logging.info(f"Timing {len(self.rule_set.regex_rules)} regex rules on {len(contents)} files from {source}...")
+        rules = self.rule_set.regex_rules
+        remaining = []
+        for index, rule in enumerate(rules):
+            files = [i for i, content in enumerate(contents) if not rule.anchor or rule.anchor in content]
+            remaining.append((index, rule.pattern, files))
+        timings = {}
+        while remaining:
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_lint_timing_worker, args=(sender, remaining, contents), daemon=True)
+            process.start()
+            sender.close()
+            # 等待工作进程就绪后再开始计时, 进程启动与传输语料的时间不计入超时
+            receiver.recv()
+            for index, _, files in remaining:
+                if not receiver.poll(budget * LINT_TIMEOUT_FACTOR):
+                    process.terminate()
+                    timings[index] = (None, len(files), 0)
+                    break
+                index, seconds, count = receiver.recv()
+                timings[index] = (seconds, len(files), count)
+            process.join()
+            receiver.close()
+            # 超时的规则之后的规则在新进程中继续计时
+            remaining = [item for item in remaining if item[0] not in timings]
+        return timings
+
+    def report_rules(self):
+        """输出规则生效情况, 未生效的规则详情在 DEBUG 级别输出"""
         logging.info(f"Rules applied: {len(self.applied_rules)}/{len(self.loaded_rules)}")
         unmatched_rules = list(filter(lambda x: x not in self.applied_rules, self.loaded_rules))
         if unmatched_rules:
@@ -189,33 +724,1188 @@ class TermiusModifier:
             logging.debug("All rules matched.")
 
     def find_in_content(self):
-        """文件内容搜索功能"""
-        code_files = self.collect_code_files()
-        if not os.path.exists(self._app_dir):
-            self.decompress_asar()
-        find_terms = self.args.find
+        """文件内容搜索功能: 支持字面量与 /regex/ 条件, 输出每处命中的文件、字节偏移与上下文"""
+        terms = []
+        for term in self.args.find:
+            try:
+                terms.append(compile_search_term(term))
+            except re.error as e:
+                logging.error(f"Invalid search term {term}: {e}")
+                sys.exit(1)
+        # 存在解包目录时直接搜索该目录, 否则从归档中读取
+        if os.path.isdir(self._app_dir):
+            source = self._app_dir
+            read = lambda path: read_mapped_file(os.path.join(source, *path.split("/")))
+            paths = collect_tree_files(source, self.code_extensions())
+        else:
+            self.open_asar()
+            source = self._original_path
+            read = self.archive.read
+            paths = self.collect_code_files()
+        logging.info(f"Searching {len(paths)} files in {source}...")
+
+        def search(path):
+            data = read(path)
+            try:
+                return path, search_buffer(data, terms, self.args.context)
+            finally:
+                if isinstance(data, memoryview):
+                    data.release()
+                elif isinstance(data, mmap.mmap):
+                    data.close()
+
         found_files = []
-        for file_path in code_files:
-            file_content = read_file(file_path, strip_empty=False)
-            if file_content and all(term in file_content for term in find_terms):
-                found_files.append(file_path)
+        try:
+            with ThreadPoolExecutor(max_workers=self.args.jobs or None) as executor:
+                for path, hits in executor.map(search, paths):
+                    if hits is None:
+                        continue
+                    found_files.append(path)
+                    for term, offset, snippet in hits:
+                        logging.info(f"{path}:{offset}: [{term}] {snippet}")
+        finally:
+            self.close_asar()
         if found_files:
-            logging.info(f"Found all terms {find_terms} in: {found_files}")
+            logging.info(f"Found all terms {self.args.find} in: {found_files}")
+        else:
+            logging.warning(f"No results found for terms {self.args.find}.")
+
+
+class BatchModifier:
+    """批量修改多个安装: 规则只编译一次, 原始 app.asar 相同的安装只替换一次, 各不相同的安装共用一个进程池并行替换"""
+
+    def __init__(self, resources_dirs, args):
+        self.args = args
+        self.modifiers = []
+        for resources_dir in resources_dirs:
+            path = os.path.abspath(resources_dir)
+            if all(modifier.termius_path != path for modifier in self.modifiers):
+                self.modifiers.append(TermiusModifier(path, args))
+        self.rule_set = None
+        self.results = {modifier.termius_path: {"status": "failed"} for modifier in self.modifiers}
+        self.start_time = None
+
+    def group_targets(self):
+        """按原始 app.asar 的 SHA-256 分组(已修改过的安装取备份的哈希), 缺少 app.asar 的目录记为失败"""
+        groups = {}
+        for modifier in self.modifiers:
+            result = self.results[modifier.termius_path]
+            if not check_asar_existence(modifier.termius_path):
+                logging.error(f"Termius app.asar file not found at: {modifier._original_path}")
+                result["error"] = "app.asar not found"
+                continue
+            try:
+                if os.path.exists(modifier._backup_path):
+                    digest = modifier.read_backup_hash()
+                else:
+                    digest = hash_file(modifier._original_path)
+            except OSError as e:
+                logging.error(f"Failed to hash {modifier._original_path}: {e}")
+                result["error"] = str(e)
+                continue
+            result["input"] = digest
+            groups.setdefault(digest, []).append(modifier)
+        return groups
+
+    def prepare(self, modifier):
+        """还原备份并打开 app.asar, 单个安装出错不影响其他安装(错误已记录在日志中)"""
+        try:
+            modifier.manage_workspace()
+            modifier.open_asar()
+        except SystemExit:
+            modifier.close_asar()
+            self.results[modifier.termius_path]["error"] = "failed to restore or open app.asar"
+            return False
+        modifier.rule_set = self.rule_set
+        modifier.loaded_rules = self.rule_set.lines
+        return True
+
+    def finish(self, modifier, replace_seconds, duplicate_of=None):
+        """打包一个安装并记录耗时与规则覆盖情况, 成功时返回写入的修改内容"""
+        started = time.monotonic()
+        for entry in modifier.manifest.values():
+            entry.setdefault("after", entry["before"])
+        replacements = dict(modifier.replacements)
+        try:
+            if self.args.extract:
+                modifier.extract_app()
+            modifier.pack_to_asar()
+        except OSError as e:
+            logging.error(f"Failed to extract {modifier._app_dir}: {e}")
+            self.results[modifier.termius_path]["error"] = str(e)
+            return None
+        except SystemExit:
+            self.results[modifier.termius_path]["error"] = "failed to pack app.asar"
+            return None
+        finally:
+            modifier.close_asar()
+        modifier.save_manifest()
+        unmatched = [rule for rule in modifier.loaded_rules if rule not in modifier.applied_rules]
+        self.results[modifier.termius_path].update({
+            "status": "duplicate" if duplicate_of else "patched",
+            "duplicate_of": duplicate_of,
+            "files": len(modifier.manifest),
+            "changed": len(replacements),
+            "rules_applied": len(modifier.loaded_rules) - len(unmatched),
+            "rules_total": len(modifier.loaded_rules),
+            "unmatched": unmatched,
+            "replace_seconds": round(replace_seconds, 3),
+            "pack_seconds": round(time.monotonic() - started, 3),
+        })
+        return replacements
+
+    def finish_group(self, group, replace_seconds):
+        """打包一组相同输入的安装: 第一个写入替换结果, 其余直接复用其修改内容"""
+        first, *duplicates = group
+        replacements = self.finish(first, replace_seconds)
+        if replacements is None:
+            return
+        for modifier in duplicates:
+            if not self.prepare(modifier):
+                continue
+            modifier.replacements = dict(replacements)
+            modifier.manifest = {path: dict(entry) for path, entry in first.manifest.items()}
+            modifier.applied_rules = set(first.applied_rules)
+            self.finish(modifier, 0.0, first.termius_path)
+
+    def run(self):
+        """批量修改功能"""
+        self.start_time = time.monotonic()
+        groups = list(self.group_targets().values())
+        if not groups:
+            logging.error("No valid Termius resources directory to patch.")
+            self.report()
+            return
+        # 规则只加载、编译一次, 由所有安装共用
+        groups[0][0].load_rules()
+        self.rule_set = groups[0][0].rule_set
+        logging.info(f"Patching {sum(map(len, groups))} installs with {len(groups)} distinct app.asar inputs...")
+
+        # 每组只替换第一个能打开的安装; 工作进程从备份读取, 打包时替换 app.asar 不受其影响
+        tasks, targets = [], {}
+        for group in groups:
+            while group and not self.prepare(group[0]):
+                group.pop(0)
+            if not group:
+                continue
+            modifier = group[0]
+            targets[modifier._backup_path] = [group, 0.0]
+            for path in modifier.collect_code_files():
+                modifier.manifest[path] = {"before": modifier.hash_entry(path)}
+                tasks.append((modifier._backup_path, modifier._unpacked_dir, path, modifier.archive.get_entry(path)["size"]))
+        # 各安装的文件按大小统一调度, 大文件优先
+        tasks.sort(key=lambda task: task[3], reverse=True)
+
+        jobs = min(self.args.jobs or os.cpu_count() or 1, len(tasks))
+        if jobs > 1:
+            logging.info(f"Replacing {len(tasks)} files with {jobs} worker processes...")
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_batch_worker, initargs=(self.rule_set,)) as executor:
+                for result in executor.map(_batch_replace_worker, [task[:3] for task in tasks]):
+                    self.collect(targets, *result)
+        else:
+            _init_batch_worker(self.rule_set)
+            for task in tasks:
+                self.collect(targets, *_batch_replace_worker(task[:3]))
+            for archive in _worker_archives.values():
+                archive.close()
+        for group, replace_seconds in targets.values():
+            self.finish_group(group, replace_seconds)
+        self.report()
+
+    def collect(self, targets, archive_path, path, data, digest, applied_rules, seconds):
+        """记录单个文件的替换结果, 仅内容确实变化的文件会在打包时写入归档"""
+        target = targets[archive_path]
+        modifier = target[0][0]
+        target[1] += seconds
+        modifier.applied_rules.update(applied_rules)
+        if data is not None:
+            modifier.manifest[path]["after"] = digest
+            if digest != modifier.manifest[path]["before"]:
+                modifier.replacements[path] = data
+
+    def report(self):
+        """输出各安装的耗时与规则覆盖情况, 并写入 JSON 报告; 有安装失败时以非零状态退出"""
+        for path, result in self.results.items():
+            if result["status"] == "failed":
+                logging.error(f"{'failed':>9}: {result.get('error', 'not patched')}: {path}")
+                continue
+            logging.info(f"{result['status']:>9}: {result['rules_applied']}/{result['rules_total']} rules, "
+                         f"{result['changed']}/{result['files']} files changed, replace {result['replace_seconds']:.2f}s, "
+                         f"pack {result['pack_seconds']:.2f}s: {path}")
+        failed = sum(result["status"] == "failed" for result in self.results.values())
+        logging.info(f"Batch done in {time.monotonic() - self.start_time:.2f} seconds: "
+                     f"{len(self.results) - failed} patched, {failed} failed.")
+        report_path = self.args.report or os.path.join(self.modifiers[0].cache_dir, BATCH_REPORT_NAME)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+            with open(report_path, "w", encoding="utf-8") as file:
+                json.dump({"targets": self.results}, file, ensure_ascii=False, indent=2)
+            logging.info(f"Batch report written to {report_path}")
+        except OSError as e:
+            logging.warning(f"Failed to write batch report {report_path}: {e}")
+        if failed:
+            sys.exit(1)
+
+
+class ReplacementSpool:
+    """修改后文件内容的暂存区: 超出内存上限的内容写入临时文件, 打包时通过内存映射读取"""
+
+    def __init__(self, path, memory_limit):
+        self.path = path
+        self.memory_limit = memory_limit
+        self._buffered = {}
+        self._buffered_size = 0
+        self._spooled = {}
+        self._file = None
+        self._mmap = None
+        self._views = []
+
+    def add(self, name, data):
+        """加入一个文件的新内容"""
+        if self._buffered and self._buffered_size + len(data) > self.memory_limit:
+            self._spill()
+        self._buffered[name] = data
+        self._buffered_size += len(data)
+        if self._buffered_size > self.memory_limit:
+            self._spill()
+
+    def _spill(self):
+        """将内存中的内容写入临时文件"""
+        if self._file is None:
+            self._file = open(self.path, "w+b")
+        for name, data in self._buffered.items():
+            offset = self._file.seek(0, os.SEEK_END)
+            self._file.write(data)
+            self._spooled[name] = (offset, len(data))
+        self._buffered.clear()
+        self._buffered_size = 0
+
+    def contents(self):
+        """返回 {路径: 内容}, 已写入临时文件的内容以 memoryview 形式零拷贝提供"""
+        contents = dict(self._buffered)
+        if self._spooled:
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            for name, (offset, size) in self._spooled.items():
+                view = memoryview(self._mmap)[offset:offset + size]
+                self._views.append(view)
+                contents[name] = view
+        return contents
+
+    def close(self):
+        """释放内存映射并删除临时文件"""
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self.path)
+        self._buffered.clear()
+
+
+class RuleProfile:
+    """按规则统计的性能数据: 累计耗时、扫描文件数、替换次数与改写字节数"""
+
+    def __init__(self):
+        self.rules = {}
+        self.prefilter_seconds = 0.0
+
+    def _stats(self, line):
+        stats = self.rules.get(line)
+        if stats is None:
+            stats = self.rules[line] = {"seconds": 0.0, "files": 0, "substitutions": 0, "bytes": 0}
+        return stats
+
+    def record_scan(self, line, seconds):
+        """记录规则在一个文件上的一次执行"""
+        stats = self._stats(line)
+        stats["seconds"] += seconds
+        stats["files"] += 1
+
+    def record_substitution(self, line, old_text):
+        """记录一次替换, 字节数按被替换原文的 UTF-8 长度计算"""
+        stats = self._stats(line)
+        stats["substitutions"] += 1
+        stats["bytes"] += len(old_text.encode("utf-8"))
+
+    def merge(self, other):
+        """合并工作进程返回的统计数据"""
+        self.prefilter_seconds += other.prefilter_seconds
+        for line, other_stats in other.rules.items():
+            stats = self._stats(line)
+            for key, value in other_stats.items():
+                stats[key] += value
+
+    def report(self, rule_lines, output_path):
+        """输出按耗时排序的表格, 并写入 JSON 报告; 从未执行过的规则记为 0"""
+        rows = []
+        for line in rule_lines:
+            if is_comment_line(line):
+                continue
+            stats = self.rules.get(line, {"seconds": 0.0, "files": 0, "substitutions": 0, "bytes": 0})
+            rows.append(dict(rule=line, **stats))
+        rows.sort(key=lambda row: row["seconds"], reverse=True)
+        total = sum(row["seconds"] for row in rows)
+
+        table = [f"{'ms':>9} {'files':>5} {'subs':>7} {'bytes':>9}  rule"]
+        for row in rows[:PROFILE_TOP]:
+            rule = row["rule"] if len(row["rule"]) <= 80 else f"{row['rule'][:77]}..."
+            table.append(f"{row['seconds'] * 1000:>9.2f} {row['files']:>5} {row['substitutions']:>7} {row['bytes']:>9}  {rule}")
+        dead = sum(1 for row in rows if not row["substitutions"])
+        logging.info(f"Rule profile (top {min(PROFILE_TOP, len(rows))} of {len(rows)} by time, "
+                     f"{total:.3f}s in rules, {self.prefilter_seconds:.3f}s in prefilter, {dead} rules never matched):\n"
+                     + "\n".join(table))
+
+        report = {"total_seconds": total, "prefilter_seconds": self.prefilter_seconds, "rules": rows}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            with open(output_path, "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            logging.info(f"Profile report written to {output_path}")
+        except Exception as e:
+            logging.warning(f"Failed to write profile report {output_path}: {e}")
+
+
+class RuleSet:
+    """编译后的规则集: 注释已剔除, 规则只解析一次, 正则已预编译, 字面量与正则规则分组存放
+
+    所有字面量规则共用一个多模式匹配器; 执行时相邻且互不影响的字面量规则合并为一次扫描,
+    当前文件中不可能命中的正则规则不会打断合并, 因此大多数文件只需很少几次扫描。
+    """
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self.comments = []
+        self.literal_rules = []
+        self.regex_rules = []
+        self.errors = []
+        # 按规则顺序排列的执行步骤: ("literal", 字面量规则序号, 所在分段, 是否需另起一批) 或 ("regex", 正则规则)
+        self.steps = []
+        for line in self.lines:
+            if is_comment_line(line):
+                self.comments.append(line)
+                continue
+            try:
+                old_val, new_val = parse_replace_rule(line)
+                if is_regex_pattern(old_val):
+                    pattern = re.compile(old_val[1:-1])
+                    rule = RegexRule(line, pattern, new_val, extract_anchor(pattern))
+                    self.regex_rules.append(rule)
+                    self.steps.append(("regex", rule))
+                    continue
+            except ValueError as e:
+                self.errors.append((line, f"Skipping invalid rule → {str(e)}"))
+                continue
+            except re.error as e:
+                self.errors.append((line, f"Regex error → {str(e)}"))
+                continue
+            rule = LiteralRule(line, old_val, new_val, *split_affixes(old_val, new_val))
+            self.steps.append(("literal", len(self.literal_rules)))
+            self.literal_rules.append(rule)
+        self.literal_matcher = LiteralMatcher([rule.old_val for rule in self.literal_rules])
+
+        # 每条规则的必需子串(锚点): 字面量规则为其本身, 正则规则为模式中必然出现的最长字面量
+        anchors = {rule.old_val for rule in self.literal_rules}
+        anchors.update(rule.anchor for rule in self.regex_rules if rule.anchor)
+        self.anchor_matcher = LiteralMatcher(sorted(anchors)) if anchors else None
+        self.anchor_margin = max(map(len, anchors), default=1) - 1
+        creation_index = CreationIndex(anchors)
+        created_by = [creation_index.created_by(rule) for rule in self.literal_rules]
+
+        # 前面规则的替换结果可能产生或破坏本规则的匹配时, 必须另起一批以保持顺序语义;
+        # 被正则规则或上述依赖隔开的连续字面量规则构成一个分段, 各分段有独立的匹配器
+        batch_created = set()
+        segments = []
+        for i, (kind, *step) in enumerate(self.steps):
+            if kind != "literal":
+                continue
+            index, = step
+            new_batch = self.literal_rules[index].old_val in batch_created
+            if new_batch:
+                batch_created = set()
+            batch_created |= created_by[index]
+            if new_batch or not segments or self.steps[i - 1][0] != "literal":
+                segments.append([])
+            segments[-1].append(index)
+            self.steps[i] = (kind, index, len(segments) - 1, new_batch)
+        self.segment_starts = [segment[0] for segment in segments]
+        self.segment_matchers = [LiteralMatcher([self.literal_rules[i].old_val for i in segment]) for segment in segments]
+        # 各字面量规则的替换结果可能产生的后续锚点(仅保存非空集合)
+        self.created_anchors = {}
+        later_anchors = set()
+        for kind, *step in reversed(self.steps):
+            if kind == "literal":
+                index = step[0]
+                created = created_by[index] & later_anchors
+                if created:
+                    self.created_anchors[index] = frozenset(created)
+                later_anchors.add(self.literal_rules[index].old_val)
+            elif step[0].anchor:
+                later_anchors.add(step[0].anchor)
+        self.dependencies = self.analyze_dependencies()
+
+    def analyze_dependencies(self):
+        """分析规则间的顺序依赖, 返回按规则顺序排列的 [(前一条规则, 后一条规则, 类型)]
+
+        creates: 前一条规则的替换结果一定包含后一条字面量规则的模式, 后一条规则依赖该顺序;
+        may-create: 前一条规则的替换结果可能产生或破坏后一条规则的匹配;
+        shadows: 后一条规则的替换结果一定包含前一条字面量规则的模式, 但前一条规则已执行过, 不会再处理这些内容。
+        """
+        rules = [self.literal_rules[step[0]] if kind == "literal" else step[0] for kind, *step in self.steps]
+        anchor_rules = {}
+        for i, rule in enumerate(rules):
+            anchor = rule.old_val if isinstance(rule, LiteralRule) else rule.anchor
+            if anchor:
+                anchor_rules.setdefault(anchor, []).append(i)
+
+        dependencies = {}
+        for i, rule in enumerate(rules):
+            if isinstance(rule, LiteralRule):
+                possible = self.created_anchors.get(self.steps[i][1], ())
+                for anchor in possible:
+                    for j in anchor_rules[anchor]:
+                        if j > i:
+                            dependencies.setdefault((i, j), "may-create")
+                produced, existing = [rule.new_val], self.find_anchors(rule.old_val)
+            else:
+                produced, existing = template_literals(rule.new_val), set()
+            for anchor in set().union(set(), *map(self.find_anchors, produced)) - existing:
+                for j in anchor_rules[anchor]:
+                    if j > i:
+                        # 正则规则的锚点出现并不代表一定匹配
+                        if isinstance(rules[j], LiteralRule):
+                            dependencies[(i, j)] = "creates"
+                        else:
+                            dependencies.setdefault((i, j), "may-create")
+                    elif j < i and isinstance(rules[j], LiteralRule):
+                        dependencies[(j, i)] = "shadows"
+        return [(rules[i].line, rules[j].line, kind) for (i, j), kind in sorted(dependencies.items())]
+
+    def find_anchors(self, content, spans=None):
+        """一次扫描找出内容中出现的锚点; 指定 spans 时只扫描这些区间附近"""
+        if self.anchor_matcher is None:
+            return set()
+        patterns = self.anchor_matcher.patterns
+        if spans is not None:
+            content = "\0".join(span_windows(content, spans, self.anchor_margin))
+        return {patterns[index] for _, _, index in self.anchor_matcher.find_all(content)}
+
+    def find_literal_matches(self, content, pending, pending_segments):
+        """查找待执行字面量规则的全部命中 (起始位置, 结束位置, 字面量规则序号)
+
+        涉及的分段较少时逐段用各自的小匹配器扫描, 否则用全部字面量规则的匹配器整体扫描一次后过滤。
+        """
+        if len(pending) <= DIRECT_FIND_LIMIT or len(pending_segments) > SEGMENT_SCAN_LIMIT:
+            return self.literal_matcher.find_all(content, pending)
+        matches = []
+        for segment, indices in pending_segments.items():
+            offset = self.segment_starts[segment]
+            matches.extend((start, end, offset + index)
+                           for start, end, index in self.segment_matchers[segment].find_all(content, indices))
+        return matches
+
+    def apply(self, content, applied_rules, profile=None):
+        """按顺序对内容执行所有规则, 并记录生效的规则
+
+        先一次扫描找出内容中出现的锚点, 锚点不存在的规则不可能匹配, 直接跳过;
+        字面量规则累积到遇到会命中的正则规则或有依赖关系的字面量规则时才合并执行一次,
+        执行后只在新写入的区间附近检查可能由替换产生的锚点。
+        指定 profile 时记录每条规则的耗时、扫描文件数、替换次数与改写字节数。
+        """
+        if not content:
+            return content
+        applied_rules.update(self.comments)
+        started = time.perf_counter()
+        present = self.find_anchors(content)
+        if profile is not None:
+            profile.prefilter_seconds += time.perf_counter() - started
+        # 待执行的字面量规则序号、所在分段, 及其替换结果可能产生的锚点
+        pending, pending_segments, pending_anchors = [], {}, set()
+
+        def flush():
+            nonlocal content
+            if not pending:
+                return
+            started = time.perf_counter()
+            matches = self.find_literal_matches(content, pending, pending_segments)
+            content, spans = apply_literal_batch(content, matches, self.literal_rules, applied_rules, profile)
+            if profile is not None:
+                # 合并执行的字面量规则共用一次扫描, 耗时按候选规则平均分摊
+                share = (time.perf_counter() - started) / len(pending)
+                for i in pending:
+                    profile.record_scan(self.literal_rules[i].line, share)
+            created_anchors = pending_anchors - present
+            if spans and created_anchors:
+                margin = max(map(len, created_anchors)) - 1
+                windows = "\0".join(span_windows(content, spans, margin))
+                present.update(anchor for anchor in created_anchors if anchor in windows)
+            pending.clear()
+            pending_segments.clear()
+            pending_anchors.clear()
+
+        for kind, *step in self.steps:
+            if kind == "literal":
+                index, segment, new_batch = step
+                if new_batch:
+                    flush()
+                if self.literal_rules[index].old_val in present:
+                    pending.append(index)
+                    pending_segments.setdefault(segment, []).append(index - self.segment_starts[segment])
+                    pending_anchors.update(self.created_anchors.get(index, ()))
+                continue
+            rule, = step
+            # 正则规则可能命中时, 先执行之前累积的字面量规则以保持顺序语义
+            if not rule.anchor or rule.anchor in present or rule.anchor in pending_anchors:
+                flush()
+            if rule.anchor and rule.anchor not in present:
+                continue
+            started = time.perf_counter()
+            try:
+                content, spans = apply_regex_rule(content, rule, applied_rules, profile)
+            except re.error as e:
+                logging.error(f"Regex error: {rule.line} → {str(e)}")
+                continue
+            finally:
+                if profile is not None:
+                    profile.record_scan(rule.line, time.perf_counter() - started)
+            if spans:
+                present |= self.find_anchors(content, spans)
+        flush()
+        return content
+
+
+# 工作进程内的规则集与归档, 由 _init_replace_worker 在进程启动时设置一次
+_worker_rule_set = None
+_worker_archive = None
+_worker_profile = False
+# 批量模式的工作进程按路径缓存已打开的归档
+_worker_archives = {}
+
+
+def _init_replace_worker(rule_set, archive_path, unpacked_dir, profile=False):
+    """工作进程初始化: 接收规则集并以内存映射方式打开归档"""
+    global _worker_rule_set, _worker_archive, _worker_profile
+    _worker_rule_set = rule_set
+    _worker_archive = AsarArchive(archive_path, unpacked_dir)
+    _worker_profile = profile
+
+
+def _replace_worker(path):
+    """工作进程中替换单个文件, 内容未变化时不回传"""
+    data = _worker_archive.read(path)
+    try:
+        content = str(data, "utf-8")
+    finally:
+        if isinstance(data, memoryview):
+            data.release()
+    applied_rules = set()
+    profile = RuleProfile() if _worker_profile else None
+    new_content = _worker_rule_set.apply(content, applied_rules, profile)
+    return path, (new_content if new_content != content else None), applied_rules, profile
+
+
+def _check_worker(path):
+    """工作进程中检查单个文件生效的规则, 替换结果直接丢弃"""
+    matched_rules = set()
+    data = _worker_archive.read(path)
+    try:
+        content = str(data, "utf-8")
+    finally:
+        if isinstance(data, memoryview):
+            data.release()
+    _worker_rule_set.apply(content, matched_rules)
+    return matched_rules
+
+
+def _init_batch_worker(rule_set):
+    """批量模式工作进程初始化: 只接收一次规则集, 归档在首次用到时打开"""
+    global _worker_rule_set, _worker_archives
+    _worker_rule_set = rule_set
+    _worker_archives = {}
+
+
+def _batch_replace_worker(task):
+    """批量模式中替换某个归档内的单个文件, 并在工作进程内完成编码与哈希; 内容未变化时不回传"""
+    archive_path, unpacked_dir, path = task
+    started = time.perf_counter()
+    archive = _worker_archives.get(archive_path)
+    if archive is None:
+        archive = _worker_archives[archive_path] = AsarArchive(archive_path, unpacked_dir)
+    data = archive.read(path)
+    try:
+        content = str(data, "utf-8")
+    finally:
+        if isinstance(data, memoryview):
+            data.release()
+    applied_rules = set()
+    new_content = _worker_rule_set.apply(content, applied_rules)
+    data = digest = None
+    if new_content != content:
+        data = new_content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+    return archive_path, path, data, digest, applied_rules, time.perf_counter() - started
+
+
+class LiteralMatcher:
+    """多模式字面量匹配器, 一次从左到右扫描即可找出所有模式的全部命中位置"""
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self._trie = {}
+        for index, pattern in enumerate(patterns):
+            node = self._trie
+            for char in pattern:
+                node = node.setdefault(char, {})
+            # 以 None 作为终止标记, 记录在此结束的模式序号
+            node.setdefault(None, []).append(index)
+        # 由前缀树生成正则, 借助 re 的 C 实现快速跳到可能的起始位置
+        self._scanner = re.compile(_trie_to_regex(self._trie))
+
+    def __getstate__(self):
+        # 前缀树嵌套过深, 序列化时只保存模式本身与生成的正则
+        return self.patterns, self._scanner.pattern
+
+    def __setstate__(self, state):
+        patterns, scanner = state
+        self.patterns = patterns
+        self._trie = {}
+        for index, pattern in enumerate(patterns):
+            node = self._trie
+            for char in pattern:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(index)
+        self._scanner = re.compile(scanner)
+
+    def find_all(self, text, indices=None):
+        """返回所有命中 (起始位置, 结束位置, 模式序号), 包含相互重叠的命中
+
+        indices 指定候选模式时只返回这些模式的命中; 候选较少时逐个模式用 str.find 查找比整体扫描更快。
+        """
+        if indices is not None and len(indices) <= DIRECT_FIND_LIMIT:
+            return self._find_each(text, indices)
+        matches = []
+        text_len = len(text)
+        search = self._scanner.search
+        match = search(text)
+        while match:
+            start = pos = match.start()
+            node = self._trie
+            while True:
+                for index in node.get(None, ()):
+                    matches.append((start, pos, index))
+                if pos >= text_len:
+                    break
+                node = node.get(text[pos])
+                if node is None:
+                    break
+                pos += 1
+            match = search(text, start + 1)
+        if indices is not None:
+            wanted = set(indices)
+            matches = [match for match in matches if match[2] in wanted]
+        return matches
+
+    def _find_each(self, text, indices):
+        """逐个模式查找所有命中"""
+        matches = []
+        for index in indices:
+            pattern = self.patterns[index]
+            start = text.find(pattern)
+            while start != -1:
+                matches.append((start, start + len(pattern), index))
+                start = text.find(pattern, start + 1)
+        return matches
+
+
+def _trie_to_regex(node):
+    """将前缀树转换为等价的正则表达式"""
+    branches = []
+    for char, child in node.items():
+        if char is None:
+            continue
+        # 合并单链路径, 避免长模式导致递归过深
+        chain = [char]
+        while len(child) == 1 and None not in child:
+            next_char, child = next(iter(child.items()))
+            chain.append(next_char)
+        branches.append(re.escape("".join(chain)) + _trie_to_regex(child))
+    if not branches:
+        return ""
+    regex = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    return f"(?:{regex})?" if None in node else regex
+
+
+def split_affixes(old_val, new_val):
+    """计算替换前后共同的前缀/后缀长度, 替换实际只改动中间部分(至少保留一个被替换字符)"""
+    limit = min(len(old_val), len(new_val))
+    prefix_len = 0
+    while prefix_len < limit and old_val[prefix_len] == new_val[prefix_len]:
+        prefix_len += 1
+    prefix_len = min(prefix_len, len(old_val) - 1)
+    suffix_len = 0
+    limit = min(len(old_val) - prefix_len - 1, len(new_val) - prefix_len)
+    while suffix_len < limit and old_val[-1 - suffix_len] == new_val[-1 - suffix_len]:
+        suffix_len += 1
+    return prefix_len, suffix_len
+
+
+def apply_literal_batch(content, matches, batch, applied_rules, profile=None):
+    """根据一次扫描得到的命中 (起始位置, 结束位置, 规则序号) 应用一批字面量规则, 结果与按规则顺序逐条 str.replace 一致"""
+    if not matches:
+        return content, []
+    # 按规则顺序逐条接受命中: 同一规则内从左到右互不重叠,
+    # 且不得与之前规则实际改动的区间(去掉共同前后缀后的部分)相交
+    matches.sort(key=lambda m: (m[2], m[0]))
+    core_starts, core_ends, core_rules = [], [], []
+    last_index, last_end = None, 0
+    for start, end, index in matches:
+        line, old_val, new_val, prefix_len, suffix_len = batch[index]
+        if old_val == new_val:
+            continue
+        if index != last_index:
+            last_index, last_end = index, 0
+        if start < last_end:
+            continue
+        i = bisect.bisect_left(core_starts, end)
+        if i and core_ends[i - 1] > start:
+            continue
+        last_end = end
+        i = bisect.bisect_left(core_starts, start + prefix_len)
+        core_starts.insert(i, start + prefix_len)
+        core_ends.insert(i, end - suffix_len)
+        core_rules.insert(i, index)
+
+    # 拼接结果, 同时记录新写入内容在结果中的区间
+    parts, spans = [], []
+    last = size = 0
+    for start, end, index in zip(core_starts, core_ends, core_rules):
+        line, _, new_val, prefix_len, suffix_len = batch[index]
+        replacement = new_val[prefix_len:len(new_val) - suffix_len]
+        parts.append(content[last:start])
+        size += start - last
+        parts.append(replacement)
+        spans.append((size, size + len(replacement)))
+        size += len(replacement)
+        if profile is not None:
+            profile.record_substitution(line, content[start - prefix_len:end + suffix_len])
+        last = end
+        applied_rules.add(line)
+    parts.append(content[last:])
+    return "".join(parts), spans
+
+
+def apply_regex_rule(content, rule, applied_rules, profile=None):
+    """应用一条正则规则(等价于 pattern.sub), 返回新内容及新写入内容的区间"""
+    parts, spans = [], []
+    last = size = 0
+    for match in rule.pattern.finditer(content):
+        replacement = match.expand(rule.new_val)
+        parts.append(content[last:match.start()])
+        size += match.start() - last
+        parts.append(replacement)
+        spans.append((size, size + len(replacement)))
+        size += len(replacement)
+        if profile is not None:
+            profile.record_substitution(rule.line, match.group())
+        last = match.end()
+    if not spans:
+        return content, spans
+    parts.append(content[last:])
+    new_content = "".join(parts)
+    if new_content != content:
+        # 仅关注内容是否改变
+        applied_rules.add(rule.line)
+    return new_content, spans
+
+
+def extract_anchor(pattern):
+    """提取正则匹配时必然出现的最长连续字面量, 无法确定时返回空字符串"""
+    if pattern.flags & re.IGNORECASE:
+        return ""
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return ""
+    runs = []
+    _collect_literal_runs(list(parsed), runs)
+    return max(runs, key=len, default="")
+
+
+def template_literals(template):
+    """提取替换模板中的字面量片段(分组引用处断开)"""
+    literals = []
+    for segment in TEMPLATE_GROUP_REF.split(template):
+        segment = re.sub(r"\\(.)", lambda m: TEMPLATE_ESCAPES.get(m.group(1), m.group(1)), segment)
+        if segment:
+            literals.append(segment)
+    return literals
+
+
+def template_joins_groups(template):
+    """判断替换模板是否以分组引用开头或结尾, 或含相邻的分组引用"""
+    segments = TEMPLATE_GROUP_REF.split(template)
+    return len(segments) > 1 and not all(segments)
+
+
+def _collect_literal_runs(items, runs):
+    """收集必然出现的连续字面量片段, 分组会被展开, 零宽断言不打断连续性"""
+    zero_width = (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT)
+    repeats = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None))
+    current = []
+    for op, av in _flatten_groups(items):
+        if op is sre_constants.LITERAL:
+            current.append(chr(av))
+            continue
+        if op in zero_width:
+            continue
+        runs.append("".join(current))
+        current = []
+        if op in repeats and av[0] >= 1:
+            # 至少重复一次的内容必然出现, 但与前后内容不连续
+            _collect_literal_runs(list(av[2]), runs)
+    runs.append("".join(current))
+
+
+def _flatten_groups(items):
+    """展开不带内联标志的分组"""
+    for op, av in items:
+        if op is sre_constants.SUBPATTERN and not av[1] and not av[2]:
+            yield from _flatten_groups(list(av[3]))
         else:
-            logging.warning(f"No results found for terms {find_terms}.")
+            yield op, av
 
 
-def run_command(cmd, shell=False):
-    """执行系统命令"""
-    logging.info(f"Running command: {cmd}")
+def lint_regex(pattern):
+    """静态检查正则表达式中容易导致大量回溯或全文扫描的写法, 返回 [(级别, 说明)]"""
     try:
-        subprocess.run(cmd, shell=shell, check=True)
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Command failed: {e}")
-        sys.exit(1)
+        parsed = list(sre_parse.parse(pattern.pattern, pattern.flags))
     except Exception as e:
-        logging.error(f"Error: {e}")
-        sys.exit(1)
+        return [("error", f"cannot be parsed: {e}")]
+    # 用于比较字符集是否重叠的探测字符: 常见 ASCII 字符、部分非 ASCII 字符及模式中出现的字面量
+    probes = set(LINT_PROBE_CHARS)
+    _collect_pattern_chars(parsed, probes)
+    findings = []
+    _lint_items(parsed, probes, False, findings)
+    items = list(_flatten_groups(parsed))
+    if items and items[0][0] in LINT_REPEATS and items[0][1][1] == sre_constants.MAXREPEAT:
+        findings.append(("info", "starts with an unbounded repeat, every start position rescans the repeated run"))
+    if not extract_anchor(pattern):
+        findings.append(("info", "has no required literal, it cannot be prefiltered and runs on every file"))
+    # 同一问题在嵌套结构中可能被多次报告
+    return list(dict.fromkeys(findings))
+
+
+def _lint_items(items, probes, in_repeat, findings):
+    """递归检查嵌套量词、重复内的重叠分支、相邻的重叠量词及无界通配"""
+    items = list(items)
+    previous = None
+    for op, av in items:
+        if op in LINT_REPEATS:
+            low, high, body = av
+            unbounded = high == sre_constants.MAXREPEAT
+            possessive = op is getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+            if unbounded and in_repeat and not possessive:
+                findings.append(("error", "nested unbounded quantifiers, e.g. (a+)+, can backtrack exponentially"))
+            body = list(body)
+            chars = _single_char_set(body, probes)
+            if unbounded and chars is not None and chars >= probes:
+                findings.append(("warning", "unbounded wildcard (.*, [\\s\\S]*) can run to the end of a single-line bundle"))
+            if unbounded and not possessive:
+                branches = [branch for sub_op, sub_av in _flatten_groups(body) if sub_op is sre_constants.BRANCH
+                            for branch in sub_av[1]]
+                firsts = [_first_char_set(branch, probes) for branch in branches]
+                known = [first for first in firsts if first]
+                if any(a & b for i, a in enumerate(known) for b in known[i + 1:]):
+                    findings.append(("error", "alternation branches starting with the same character inside a repeat can backtrack exponentially"))
+                if previous is not None and chars is not None and previous & chars:
+                    findings.append(("warning", "adjacent unbounded quantifiers over overlapping characters, e.g. \\w+\\w+, backtrack polynomially"))
+            previous = chars if unbounded and not possessive else None
+            _lint_items(body, probes, in_repeat or (unbounded and not possessive), findings)
+            continue
+        previous = None
+        if op is sre_constants.SUBPATTERN:
+            _lint_items(av[3], probes, in_repeat, findings)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                _lint_items(branch, probes, in_repeat, findings)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _lint_items(av[1], probes, in_repeat, findings)
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            # 原子分组内不会回溯
+            _lint_items(av, probes, False, findings)
+
+
+def _single_char_set(items, probes):
+    """单字符的重复体(如 \\w、[^,]、.)可匹配的探测字符集合, 其他结构返回 None"""
+    items = list(_flatten_groups(items))
+    if len(items) != 1:
+        return None
+    op, av = items[0]
+    if op is sre_constants.LITERAL:
+        return {chr(av)}
+    if op is sre_constants.NOT_LITERAL:
+        return probes - {chr(av)}
+    if op is sre_constants.ANY:
+        return set(probes)
+    if op is sre_constants.IN:
+        return {char for char in probes if _class_matches(av, char)}
+    return None
+
+
+def _first_char_set(items, probes):
+    """分支首个字符可能的探测字符集合, 无法确定时返回 None"""
+    for op, av in _flatten_groups(items):
+        if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            continue
+        if op in LINT_REPEATS:
+            return _first_char_set(av[2], probes) if av[0] >= 1 else None
+        if op is sre_constants.BRANCH:
+            firsts = [_first_char_set(branch, probes) for branch in av[1]]
+            return set().union(*firsts) if all(firsts) else None
+        return _single_char_set([(op, av)], probes)
+    return None
+
+
+def _class_matches(items, char):
+    """判断字符是否属于字符类 [...]"""
+    negate = False
+    matched = False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            matched |= char == chr(av)
+        elif op is sre_constants.RANGE:
+            matched |= av[0] <= ord(char) <= av[1]
+        elif op is sre_constants.CATEGORY:
+            category = LINT_CATEGORIES.get(str(av))
+            matched |= bool(category and category.match(char))
+    return matched != negate
+
+
+def _collect_pattern_chars(items, chars):
+    """收集模式中出现的全部字面量字符"""
+    for op, av in items:
+        if op in (sre_constants.LITERAL, sre_constants.NOT_LITERAL):
+            chars.add(chr(av))
+        elif op is sre_constants.RANGE:
+            chars.update(map(chr, av))
+        elif op in LINT_REPEATS:
+            _collect_pattern_chars(av[2], chars)
+        elif op is sre_constants.SUBPATTERN:
+            _collect_pattern_chars(av[3], chars)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                _collect_pattern_chars(branch, chars)
+        elif op is sre_constants.IN:
+            _collect_pattern_chars(av, chars)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _collect_pattern_chars(av[1], chars)
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            _collect_pattern_chars(av, chars)
+
+
+def regex_as_literal(old_val, new_val):
+    """模式只由字面量组成且替换模板不引用分组时, 返回等价的字面量规则, 否则返回 None"""
+    try:
+        parsed = list(sre_parse.parse(old_val[1:-1]))
+    except Exception:
+        return None
+    if not parsed or any(op is not sre_constants.LITERAL for op, _ in parsed):
+        return None
+    if re.search(r"\\(?:g<|\d)", new_val):
+        return None
+    literal = "".join(chr(av) for _, av in parsed)
+    replacement = re.sub(r"\\(.)", lambda m: TEMPLATE_ESCAPES.get(m.group(1), m.group(1)), new_val)
+    # 字面量规则以第一个 | 分割, 注释行与正则写法也不能用字面量表示
+    if "|" in literal or is_regex_pattern(literal) or is_comment_line(literal):
+        return None
+    return f"{literal}|{replacement}"
+
+
+def _lint_timing_worker(connection, patterns, contents):
+    """在独立进程中依次计时各正则规则(先发送就绪信号), 主进程超时后可直接终止该进程"""
+    connection.send(None)
+    for index, pattern, files in patterns:
+        started = time.perf_counter()
+        count = sum(1 for i in files for _ in pattern.finditer(contents[i]))
+        connection.send((index, time.perf_counter() - started, count))
+    connection.close()
+
+
+def span_windows(content, spans, margin):
+    """返回覆盖各区间(两侧各扩展 margin 个字符)的内容片段, 相互重叠的区间会被合并"""
+    windows = []
+    window_start = window_end = None
+    for start, end in spans:
+        start, end = max(0, start - margin), end + margin
+        if window_end is not None and start <= window_end:
+            window_end = max(window_end, end)
+            continue
+        if window_end is not None:
+            windows.append(content[window_start:window_end])
+        window_start, window_end = start, end
+    if window_end is not None:
+        windows.append(content[window_start:window_end])
+    return windows
+
+
+class CreationIndex:
+    """锚点索引: 快速找出一条字面量规则的替换结果可能产生或破坏其匹配的全部锚点
+
+    替换结果包含锚点、锚点包含替换结果, 或替换结果首尾与锚点交叠且越过未改动的共同前后缀时,
+    都可能跨边界形成新的匹配, 均视为有影响。
+    """
+
+    def __init__(self, anchors):
+        self.anchors = sorted(anchors)
+        # 所有锚点以 \0 连接, 用于查找包含某字符串的锚点
+        self._joined = "\0".join(self.anchors)
+        self._starts = list(itertools.accumulate((len(anchor) + 1 for anchor in self.anchors[:-1]), initial=0))
+        self._matcher = LiteralMatcher(self.anchors) if self.anchors else None
+        # 锚点的真前缀/真后缀 → 锚点
+        self._prefixes, self._suffixes = {}, {}
+        for anchor in self.anchors:
+            for length in range(1, len(anchor)):
+                self._prefixes.setdefault(anchor[:length], []).append(anchor)
+                self._suffixes.setdefault(anchor[-length:], []).append(anchor)
+
+    def created_by(self, rule):
+        """返回 rule 的替换结果可能产生或破坏其匹配的锚点集合"""
+        produced, prefix_len, suffix_len = rule.new_val, rule.prefix_len, rule.suffix_len
+        if not produced:
+            # 整段删除可能拼接出新的匹配
+            return set(self.anchors)
+        created = set()
+        # 替换结果包含锚点
+        if self._matcher is not None:
+            created.update(self.anchors[index] for _, _, index in self._matcher.find_all(produced))
+        # 锚点包含替换结果
+        start = self._joined.find(produced)
+        while start != -1:
+            created.add(self.anchors[bisect.bisect_right(self._starts, start) - 1])
+            start = self._joined.find(produced, start + 1)
+        # 替换结果的后缀与锚点的前缀交叠, 且越过未改动的共同后缀
+        produced_len = len(produced)
+        for overlap in range(suffix_len + 1, produced_len):
+            created.update(self._prefixes.get(produced[produced_len - overlap:], ()))
+        # 替换结果的前缀与锚点的后缀交叠, 且越过未改动的共同前缀
+        for overlap in range(prefix_len + 1, produced_len):
+            created.update(self._suffixes.get(produced[:overlap], ()))
+        return created
+
+
+def rule_steps(rule_set):
+    """按执行顺序返回规则集中的规则"""
+    return [rule_set.literal_rules[step[0]] if kind == "literal" else step[0] for kind, *step in rule_set.steps]
+
+
+class RuleChange:
+    """两次读取的规则集之间的差异, 用于判断哪些文件的结果可能改变
+
+    只修改替换内容的字面量规则: 执行到该规则前的内容不变, 上次没有改动过的文件这次也不会命中, 按删除原规则处理;
+    其余新增的规则按锚点判断是否可能命中。
+    """
+
+    def __init__(self, old_set, new_set):
+        old_rules, new_rules = rule_steps(old_set), rule_steps(new_set)
+        old_lines, new_lines = [rule.line for rule in old_rules], [rule.line for rule in new_rules]
+        self.old_rules = dict(zip(old_lines, old_rules))
+        old_counts, new_counts = Counter(old_lines), Counter(new_lines)
+
+        def unique_literal(rules, counts, i):
+            rule = rules[i]
+            return rule if isinstance(rule, LiteralRule) and counts[rule.line] == 1 else None
+
+        # 上次生效过的规则被删除或修改时, 该文件需要重新替换
+        self.removed = set()
+        self.edited = 0
+        added = []
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            # 块内按匹配模式配对修改前后的字面量规则
+            candidates = {}
+            for j in range(j1, j2):
+                rule = unique_literal(new_rules, new_counts, j)
+                if rule is not None:
+                    candidates.setdefault(rule.old_val, []).append(j)
+            paired = set()
+            for i in range(i1, i2):
+                self.removed.add(old_lines[i])
+                rule = unique_literal(old_rules, old_counts, i)
+                # 原文与译文相同的规则从不记为生效, 无法据此判断是否命中
+                if rule is not None and rule.old_val != rule.new_val and candidates.get(rule.old_val):
+                    paired.add(candidates[rule.old_val].pop(0))
+                    self.edited += 1
+            added.extend(new_rules[j] for j in range(j1, j2) if j not in paired)
+
+        # 新增规则的锚点, 无法确定锚点的正则规则可能命中任何文件
+        self.added = len(added)
+        self.added_anchors = {rule.old_val if isinstance(rule, LiteralRule) else rule.anchor for rule in added}
+        self.anchorless = "" in self.added_anchors
+        self.added_anchors.discard("")
+        self.added_index = CreationIndex(self.added_anchors) if self.added_anchors else None
+        self.added_matcher = LiteralMatcher(sorted(self.added_anchors)) if len(self.added_anchors) > DIRECT_FIND_LIMIT else None
+
+    def affects(self, watched):
+        """判断删除、修改或新增的规则是否可能改变该文件的结果"""
+        if self.removed & watched.applied or self.anchorless:
+            return True
+        if not self.added_anchors:
+            return False
+        for content in (watched.pristine, watched.output):
+            if self.added_matcher is not None:
+                if self.added_matcher.find_all(content):
+                    return True
+            elif any(anchor in content for anchor in self.added_anchors):
+                return True
+        # 锚点也可能只出现在中间结果中: 由生效的规则写入后又被后续规则改写
+        for line in watched.applied:
+            rule = self.old_rules.get(line)
+            if isinstance(rule, LiteralRule):
+                if self.added_index.created_by(rule):
+                    return True
+            elif isinstance(rule, RegexRule):
+                # 分组内容与模板首尾或相邻分组拼接时, 可能产生任意锚点
+                if template_joins_groups(rule.new_val):
+                    return True
+                literals = template_literals(rule.new_val)
+                if not literals or any(self.added_index.created_by(LiteralRule(line, literal, literal, 0, 0))
+                                       for literal in literals):
+                    return True
+        return False
+
+
+class WatchedFile:
+    """--watch 模式下的单个代码文件: 原始内容、当前替换结果及生效的规则"""
+
+    def __init__(self, path, pristine, before):
+        self.path = path
+        self.pristine = pristine
+        self.before = before
+        self.after = before
+        self.output = pristine
+        self.data = None
+        self.applied = set()
+
+    def update(self, output, applied):
+        """记录新的替换结果, 内容变化时重新编码; 返回内容是否变化"""
+        self.applied = applied
+        if output == self.output:
+            return False
+        self.output = output
+        if output == self.pristine:
+            self.data, self.after = None, self.before
+        else:
+            self.data = output.encode("utf-8")
+            self.after = hashlib.sha256(self.data).hexdigest()
+        return True
 
 
 def _handle_remove_readonly(func, path, _):
@@ -234,6 +1924,116 @@ def safe_rmtree(path):
         shutil.rmtree(path, onerror=_handle_remove_readonly)
 
 
+def clone_file(src, dst, hardlink=True):
+    """以写时复制方式将 src 复制为 dst, 返回 (方式, 复制时计算的 SHA-256 或 None)
+
+    依次尝试 reflink(FICLONE)、硬链接(hardlink 为 True 时)和带哈希计算的缓冲复制; 先写入临时文件再替换, 目标不会处于半写状态。
+    硬链接与 reflink 不读取数据, 因此不计算哈希。安装程序可能原地覆盖 app.asar, 备份不能与其共用 inode, 创建备份时不使用硬链接。
+    """
+    tmp_path = f"{dst}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        if fcntl is not None:
+            with open(src, "rb") as src_file, open(tmp_path, "wb") as dst_file:
+                try:
+                    fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+                    method, digest = "reflink", None
+                except OSError:
+                    method = None
+            if method:
+                os.replace(tmp_path, dst)
+                return method, digest
+            os.remove(tmp_path)
+        if hardlink:
+            try:
+                os.link(src, tmp_path)
+                os.replace(tmp_path, dst)
+                return "hardlink", None
+            except OSError:
+                pass
+        digest = copy_file_with_hash(src, tmp_path)
+        os.replace(tmp_path, dst)
+        return "copy", digest
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def copy_file_with_hash(src, dst):
+    """缓冲复制文件并同时计算 SHA-256"""
+    digest = hashlib.sha256()
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        while chunk := src_file.read(COPY_BUFFER_SIZE):
+            digest.update(chunk)
+            dst_file.write(chunk)
+    shutil.copystat(src, dst)
+    return digest.hexdigest()
+
+
+def hash_file(file_path):
+    """计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(COPY_BUFFER_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_tree_cache(archive_path, unpacked_dir, tree_dir):
+    """将原始归档解压为只读目录树, 先写入临时目录再重命名, 中断时不会留下不完整的缓存"""
+    tmp_dir = f"{tree_dir}.{os.getpid()}.tmp"
+    safe_rmtree(tmp_dir)
+    try:
+        with AsarArchive(archive_path, unpacked_dir) as archive:
+            archive.extract(tmp_dir)
+        # 缓存文件设为只读, 避免经由硬链接被意外修改
+        for dir_path, _, file_names in os.walk(tmp_dir):
+            for name in file_names:
+                file_path = os.path.join(dir_path, name)
+                os.chmod(file_path, stat.S_IMODE(os.stat(file_path).st_mode) & ~0o222)
+        os.replace(tmp_dir, tree_dir)
+    except Exception as e:
+        safe_rmtree(tmp_dir)
+        logging.error(f"Failed to extract {archive_path}: {e}")
+        sys.exit(1)
+
+
+def prune_tree_cache(cache_dir, limit):
+    """只保留最近使用的 limit 个目录树"""
+    trees = [entry for entry in os.scandir(cache_dir) if entry.is_dir() and not entry.name.endswith(".tmp")]
+    trees.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in trees[limit:]:
+        safe_rmtree(entry.path)
+        logging.debug(f"Removed cached app tree {entry.name}.")
+
+
+def clone_tree(tree_dir, dest_dir, replacements):
+    """以硬链接克隆目录树, replacements 中的文件写入新内容; 无法硬链接时回退为复制, 返回链接的文件数"""
+    safe_rmtree(dest_dir)
+    linked = 0
+    for dir_path, _, file_names in os.walk(tree_dir):
+        rel_dir = os.path.relpath(dir_path, tree_dir)
+        target_dir = os.path.normpath(os.path.join(dest_dir, rel_dir))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in file_names:
+            rel_path = name if rel_dir == "." else f"{rel_dir.replace(os.sep, '/')}/{name}"
+            source, target = os.path.join(dir_path, name), os.path.join(target_dir, name)
+            content = replacements.get(rel_path)
+            if content is not None:
+                with open(target, "wb") as file:
+                    file.write(content)
+                shutil.copymode(source, target)
+                os.chmod(target, stat.S_IMODE(os.stat(target).st_mode) | stat.S_IWUSR)
+                continue
+            try:
+                os.link(source, target)
+                linked += 1
+            except OSError:
+                shutil.copy2(source, target)
+    return linked
+
+
 def read_file(file_path, strip_empty=True):
     """安全读取文件内容"""
     try:
@@ -244,6 +2044,120 @@ def read_file(file_path, strip_empty=True):
         sys.exit(1)
 
 
+def read_rule_lines(file_paths):
+    """读取规则文件的全部非空行, 出错时抛出异常而不退出"""
+    lines = []
+    for file_path in file_paths:
+        with open(file_path, "r", encoding="utf-8") as file:
+            lines.extend(line.rstrip("\r\n") for line in file if line.strip())
+    return lines
+
+
+def rule_file_stamps(file_paths):
+    """规则文件的 (修改时间, 大小), 文件不存在时为 None"""
+    stamps = []
+    for file_path in file_paths:
+        try:
+            stat_result = os.stat(file_path)
+            stamps.append((stat_result.st_mtime_ns, stat_result.st_size))
+        except OSError:
+            stamps.append(None)
+    return stamps
+
+
+def hash_rule_files(file_paths):
+    """根据规则文件内容、所选规则及缓存格式生成缓存键"""
+    digest = hashlib.sha256(f"{RULE_CACHE_VERSION}:{__name__}:{sys.version_info[:2]}".encode())
+    for file_path in file_paths:
+        try:
+            with open(file_path, "rb") as file:
+                digest.update(os.path.basename(file_path).encode() + b"\0" + file.read() + b"\0")
+        except Exception as e:
+            logging.error(f"Read error: {file_path} - {e}")
+            sys.exit(1)
+    return digest.hexdigest()[:32]
+
+
+def load_rule_cache(cache_path):
+    """读取编译后的规则集缓存, 缓存缺失或损坏时返回 None"""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, "rb") as file:
+            rule_set = pickle.load(file)
+        return rule_set if isinstance(rule_set, RuleSet) else None
+    except Exception as e:
+        logging.debug(f"Ignoring unreadable rule cache {cache_path}: {e}")
+        return None
+
+
+def save_rule_cache(cache_path, rule_set):
+    """保存编译后的规则集缓存, 写入失败不影响主流程"""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(rule_set, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logging.debug(f"Failed to write rule cache {cache_path}: {e}")
+
+
+def compile_search_term(term):
+    """编译搜索条件: /pattern/ 按正则处理(与规则文件语法一致, 在解码后的文本上匹配), 其余按字面量处理"""
+    if is_regex_pattern(term):
+        return term, re.compile(term[1:-1])
+    return term, re.compile(re.escape(term))
+
+
+def search_buffer(data, terms, context):
+    """在内容中查找所有条件, 任一条件未命中时返回 None, 否则返回 [(条件, 字节偏移, 上下文)]"""
+    # 无法按 UTF-8 解码的字节以代理字符保留, 编码回去时还原, 保证偏移换算准确
+    text = str(data, "utf-8", "surrogateescape")
+    spans = []
+    for term, pattern in terms:
+        matches = list(itertools.islice(pattern.finditer(text), FIND_MAX_HITS))
+        if not matches:
+            return None
+        spans.append((term, matches))
+    hits = []
+    for term, matches in spans:
+        # 命中按位置递增, 增量地把字符位置换算为字节偏移
+        char_pos = byte_pos = 0
+        for match in matches:
+            start, end = match.span()
+            byte_pos += len(text[char_pos:start].encode("utf-8", "surrogateescape"))
+            char_pos = start
+            start, end = byte_pos, byte_pos + len(match.group().encode("utf-8", "surrogateescape"))
+            left, right = max(0, start - context), min(len(data), end + context)
+            # 上下文边界避开 UTF-8 多字节字符的中间
+            while left < start and 0x80 <= data[left] < 0xC0:
+                left += 1
+            while right > end and right < len(data) and 0x80 <= data[right] < 0xC0:
+                right -= 1
+            snippet = bytes(data[left:right]).decode("utf-8", errors="replace")
+            hits.append((term, start, snippet.replace("\n", "\\n")))
+    return hits
+
+
+def read_mapped_file(file_path):
+    """以内存映射方式打开文件, 空文件返回 b''"""
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def collect_tree_files(root, extensions):
+    """获取解包目录中所有代码文件的相对路径"""
+    code_files = []
+    for prefix in CODE_DIRS:
+        for dir_path, _, file_names in os.walk(os.path.join(root, prefix)):
+            rel_dir = os.path.relpath(dir_path, root).replace(os.sep, "/")
+            code_files.extend(f"{rel_dir}/{name}" for name in sorted(file_names) if name.endswith(extensions))
+    return code_files
+
+
 def is_comment_line(line):
     """判断是否为注释行"""
     return line.strip().startswith("#")
@@ -259,7 +2173,10 @@ def parse_replace_rule(rule):
     if "|" not in rule:
         raise ValueError("Invalid replacement rule format.")
     # 最多分割一次
-    return rule.split("|", 1)
+    old_val, new_val = rule.split("|", 1)
+    if not old_val:
+        raise ValueError("Empty match pattern.")
+    return old_val, new_val
 
 
 def is_valid_path(path):
@@ -272,13 +2189,11 @@ def check_asar_existence(path):
     return os.path.exists(os.path.join(path, "app.asar"))
 
 
-def check_asar_installed():
-    """检查是否安装了 asar 命令"""
-    run_command("asar --version", shell=True)
-
-
 def select_directory(title):
     """弹出文件夹选择对话框, 手动文件夹路径"""
+    if tk is None:
+        logging.error("tkinter is not available, pass the resources directory with --batch instead.")
+        sys.exit(1)
     try:
         root = tk.Tk()
         root.withdraw()
@@ -324,23 +2239,52 @@ def main():
     parser.add_argument("-l", "--localize", action="store_true", help="Enable localization patch (Chinese translation/adaptation).")
     parser.add_argument("-s", "--style", action="store_true", help="UI/UX customization preset.")
     parser.add_argument("-r", "--restore", action="store_true", help="Restore software to initial state.")
+    parser.add_argument("-c", "--check", action="store_true", help="Report which selected rules take effect on the original app.asar, as a normal run would, without modifying anything.")
+    parser.add_argument("--lint", action="store_true", help="Check selected regex rules for backtracking hazards and literal rewrites, and time them on the original app.asar")
+    parser.add_argument("--lint-budget", type=int, default=LINT_BUDGET_MS, metavar="MS", help="Per-rule time budget for --lint; rules 10x over it are aborted (default: %(default)s)")
     parser.add_argument("-f", "--find", nargs="+", help="Multi-mode search operation.")
+    parser.add_argument("-C", "--context", type=int, default=40, metavar="BYTES", help="Bytes of context shown around each --find hit (default: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes for rule replacement, 0 for all CPUs (default: 1, all CPUs with --batch)")
+    parser.add_argument("-b", "--batch", nargs="+", metavar="DIR", help="Headlessly patch several resources directories (each containing app.asar) in one run, compiling the rules once")
+    parser.add_argument("--report", metavar="FILE", help="JSON file for the --batch per-target report (default: .cache/batch.json)")
+    parser.add_argument("-w", "--watch", action="store_true", help="Keep running, and re-patch incrementally whenever the selected rule files are saved")
+    parser.add_argument("-x", "--extract", action="store_true", help="Also write the patched app as an extracted resources/app directory, hardlinked from a cached pristine tree")
+    parser.add_argument("--max-memory", type=int, default=0, metavar="MB", help="Stream files one at a time and keep at most MB of patched content in memory (default: load everything)")
+    parser.add_argument("--profile", nargs="?", const="", metavar="FILE", help="Report per-rule time, files, substitutions and bytes, and write them as JSON to FILE (default: .cache/profile.json)")
     parser.add_argument("--log-level", type=lambda s: s.upper(), choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default='INFO', help="Set logging level: DEBUG|INFO|WARNING|ERROR|CRITICAL (default: %(default)s)")
 
     args = parser.parse_args()
+    if args.batch:
+        # 批量模式只执行修改, 其余操作不能与之组合, 以免被静默忽略
+        conflicts = [flag for flag, enabled in (("--check", args.check), ("--watch", args.watch), ("--lint", args.lint),
+                                                ("--find", args.find), ("--restore", args.restore)) if enabled]
+        if conflicts:
+            parser.error(f"--batch cannot be combined with {', '.join(conflicts)}")
 
     # 日志配置
     logging.basicConfig(level=args.log_level, format="%(asctime)s - %(levelname)7s - %(message)s", force=True)
 
+    if args.jobs is None:
+        args.jobs = 0 if args.batch else 1
+
     # 如果没有提供参数，默认执行 `--localize`
     if not any((args.trial, args.find, args.style, args.skip_login, args.localize, args.restore)):
         args.localize = True
 
-    check_asar_installed()
+    if args.batch:
+        BatchModifier(args.batch, args).run()
+        return
+
     termius_path = get_termius_path()
     modifier = TermiusModifier(termius_path, args)
 
-    if any((args.trial, args.style, args.skip_login, args.localize)):
+    if args.lint:
+        modifier.lint_rules()
+    elif args.check:
+        modifier.check_rules()
+    elif args.watch:
+        modifier.watch_rules()
+    elif any((args.trial, args.style, args.skip_login, args.localize)):
         modifier.apply_changes()
     elif args.find:
         modifier.find_in_content()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# lang.py 位于仓库根目录, android 下的模块以脚本目录为导入根
+sys.path[:0] = [ROOT, os.path.join(ROOT, "android")]
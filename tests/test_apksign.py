@@ -0,0 +1,78 @@
+import datetime
+import struct
+import zipfile
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from apksign import ApkSignError, sign_apk_file, verify_apk_file
+from arsc import read_min_sdk
+
+NO_INDEX = 0xFFFFFFFF
+
+
+def compiled_manifest(min_sdk=None):
+    """A minimal binary AndroidManifest.xml: <manifest><uses-sdk android:minSdkVersion=.../></manifest>"""
+    strings = ["minSdkVersion", "manifest", "uses-sdk"]
+    data = b"".join(struct.pack("<H", len(s)) + s.encode("utf-16-le") + b"\0\0" for s in strings)
+    data += b"\0" * (-len(data) % 4)
+    offsets, pos = [], 0
+    for s in strings:
+        offsets.append(pos)
+        pos += 4 + 2 * len(s)
+    header = 28 + 4 * len(strings)
+    pool = struct.pack("<HHIIIIII", 0x0001, 28, header + len(data), len(strings), 0, 0, header, 0)
+    pool += struct.pack(f"<{len(strings)}I", *offsets) + data
+    resource_map = struct.pack("<HHII", 0x0180, 8, 12, 0x0101020C)
+
+    def start_element(name, attributes):
+        body = struct.pack("<IIHHHHHH", NO_INDEX, name, 20, 20, len(attributes), 0, 0, 0)
+        for attr_name, value in attributes:
+            body += struct.pack("<IIIHBBI", NO_INDEX, attr_name, NO_INDEX, 8, 0, 0x10, value)
+        return struct.pack("<HHIII", 0x0102, 16, 16 + len(body), 1, NO_INDEX) + body
+
+    elements = start_element(1, []) + start_element(2, [] if min_sdk is None else [(0, min_sdk)])
+    body = pool + resource_map + elements
+    return struct.pack("<HHI", 0x0003, 8, 8 + len(body)) + body
+
+
+def signing_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(1).not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    return key, [cert]
+
+
+def write_apk(path, min_sdk):
+    with zipfile.ZipFile(path, "w") as apk:
+        apk.writestr("AndroidManifest.xml", compiled_manifest(min_sdk))
+        apk.writestr("classes.dex", b"dex\n035\0")
+
+
+@pytest.mark.parametrize("min_sdk, expected", [(21, 21), (28, 28), (None, 1)])
+def test_read_min_sdk(min_sdk, expected):
+    assert read_min_sdk(compiled_manifest(min_sdk)) == expected
+
+
+def test_sign_refuses_apk_that_needs_v1(tmp_path):
+    apk = tmp_path / "old.apk"
+    write_apk(apk, 21)
+    before = apk.read_bytes()
+    with pytest.raises(ApkSignError, match="v1 signature"):
+        sign_apk_file(str(apk), *signing_key())
+    assert apk.read_bytes() == before
+
+
+def test_sign_and_verify_v2_v3(tmp_path):
+    apk = tmp_path / "new.apk"
+    write_apk(apk, 26)
+    sign_apk_file(str(apk), *signing_key())
+    assert verify_apk_file(str(apk)) == [2, 3]
+    with zipfile.ZipFile(apk) as signed:
+        assert signed.read("classes.dex") == b"dex\n035\0"
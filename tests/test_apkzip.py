@@ -0,0 +1,66 @@
+import io
+import zipfile
+
+import pytest
+
+from apkzip import FLAG_DATA_DESCRIPTOR, PAGE_ALIGNMENT, is_aligned, zipalign
+
+ENTRIES = [
+    ("AndroidManifest.xml", b"\x03\x00\x08\x00" * 300, zipfile.ZIP_DEFLATED),
+    ("lib/arm64-v8a/libtermius.so", bytes(range(256)) * 20, zipfile.ZIP_STORED),
+    ("resources.arsc", b"\x02\x00\x0c\x00" * 500, zipfile.ZIP_STORED),
+    ("res/raw/a.bin", b"odd" * 7, zipfile.ZIP_STORED),
+    ("lib/x86/libx.so", b"\x7fELF" * 33, zipfile.ZIP_STORED),
+]
+
+
+class Unseekable(io.RawIOBase):
+    """A write-only stream, so zipfile follows every entry with a data descriptor"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+
+def build_zip(path, data_descriptor):
+    output = Unseekable() if data_descriptor else open(path, "wb")
+    with zipfile.ZipFile(output, "w") as archive:
+        for name, content, method in ENTRIES:
+            archive.writestr(zipfile.ZipInfo(name, (2024, 1, 1, 0, 0, 0)), content, method)
+    if data_descriptor:
+        path.write_bytes(output.data)
+    else:
+        output.close()
+
+
+@pytest.mark.parametrize("data_descriptor", [False, True])
+def test_zipalign_aligns_stored_entries(tmp_path, data_descriptor):
+    src, dst = tmp_path / "in.apk", tmp_path / "out.apk"
+    build_zip(src, data_descriptor)
+    with zipfile.ZipFile(src) as archive:
+        assert all(bool(info.flag_bits & FLAG_DATA_DESCRIPTOR) == data_descriptor for info in archive.infolist())
+    assert not is_aligned(str(src))
+
+    zipalign(str(src), str(dst))
+    assert is_aligned(str(dst))
+    with zipfile.ZipFile(dst) as archive:
+        assert archive.testzip() is None
+        assert [(info.filename, archive.read(info), info.compress_type) for info in archive.infolist()] == ENTRIES
+        for info in archive.infolist():
+            assert not info.flag_bits & FLAG_DATA_DESCRIPTOR
+    with zipfile.ZipFile(dst) as archive, open(dst, "rb") as file:
+        # Shared libraries start on a page boundary
+        info = archive.getinfo("lib/arm64-v8a/libtermius.so")
+        file.seek(info.header_offset + 26)
+        name_len, extra_len = int.from_bytes(file.read(2), "little"), int.from_bytes(file.read(2), "little")
+        assert (info.header_offset + 30 + name_len + extra_len) % PAGE_ALIGNMENT == 0
+
+    # Aligning an aligned APK leaves it unchanged
+    zipalign(str(dst), str(tmp_path / "again.apk"))
+    assert (tmp_path / "again.apk").read_bytes() == dst.read_bytes()
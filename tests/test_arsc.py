@@ -0,0 +1,119 @@
+import struct
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from arsc import (RES_STRING_POOL_TYPE, RES_TABLE_PACKAGE_TYPE, RES_TABLE_TYPE, RES_TABLE_TYPE_TYPE, SPAN_END,
+                  UTF8_FLAG, VALUE_TYPE_STRING, ResourceTable, StringPool, flatten_element, iter_chunks,
+                  iter_type_entries, patch_string_resources)
+
+
+def flatten(xml):
+    return flatten_element(ET.fromstring(xml))
+
+
+@pytest.mark.parametrize("xml, expected", [
+    (r"<string>Don\'t say \"hi\"</string>", "Don't say \"hi\""),
+    ('<string>"  quoted  value "</string>', "  quoted  value "),
+    ('<string>"%1$s" copied</string>', "%1$s copied"),
+    ("<string>  a   b\n c  </string>", "a b c"),
+    (r"<string>设置\n\t\@\?\#\1024</string>", "设置\n\t@?#1024"),
+    ("<string>mosh </string>", "mosh"),
+])
+def test_flatten_unescapes_like_aapt(xml, expected):
+    assert flatten(xml) == (expected, [])
+
+
+def test_flatten_spans_follow_collapsed_text():
+    text, spans = flatten('<string> x  <b>"bold "</b>  <i>end</i> </string>')
+    assert text == "x bold  end"
+    assert spans == [("b", 2, 6), ("i", 8, 10)]
+
+
+def build_pool(strings, flags=0):
+    """Serialize a string pool with the patcher's own StringPool, starting from an empty one"""
+    pool = StringPool(struct.pack("<HHIIIIII", RES_STRING_POOL_TYPE, 28, 28, 0, 0, flags, 28, 0), 0)
+    for text in strings:
+        pool.add(text)
+    return pool.build()
+
+
+def build_type(type_id, config, values):
+    """A ResTable_type chunk with one simple string entry per (key index, string index)"""
+    config = struct.pack("<I", 4 + len(config)) + config
+    header_size = 20 + len(config)
+    entries = b"".join(struct.pack("<HHIHBBI", 8, 0, key, 8, 0, VALUE_TYPE_STRING, value) for key, value in values)
+    offsets = struct.pack(f"<{len(values)}I", *range(0, 16 * len(values), 16))
+    entries_start = header_size + len(offsets)
+    header = struct.pack("<HHIBBHII", RES_TABLE_TYPE_TYPE, header_size, entries_start + len(entries), type_id, 0, 0,
+                         len(values), entries_start)
+    return header + config + offsets + entries
+
+
+def build_table(strings, keys, default_values, localized_values):
+    type_pool, key_pool = build_pool(["string"]), build_pool(keys)
+    types = build_type(1, b"\0" * 60, default_values) + build_type(1, b"\0" * 4 + b"de" + b"\0" * 54, localized_values)
+    package_header = 288
+    name = "com.termius.android".encode("utf-16-le").ljust(256, b"\0")
+    package_size = package_header + len(type_pool) + len(key_pool) + len(types)
+    package = struct.pack("<HHII", RES_TABLE_PACKAGE_TYPE, package_header, package_size, 0x7F) + name + struct.pack(
+        "<IIIII", package_header, 1, package_header + len(type_pool), len(keys), 0) + type_pool + key_pool + types
+    pool = build_pool(strings, UTF8_FLAG)
+    return struct.pack("<HHII", RES_TABLE_TYPE, 12, 12 + len(pool) + len(package), 1) + pool + package
+
+
+def read_strings(data):
+    """Map each default and localized string resource to its (text, [(tag, first, last)])"""
+    table = ResourceTable(data)
+    pool = table.string_pool
+    values = {}
+    for name, entry in table.iter_default_entries("string"):
+        index = struct.unpack_from("<I", table.data, entry + 12)[0]
+        spans = []
+        if index < len(pool.style_offsets):
+            pos = pool.style_offsets[index]
+            while struct.unpack_from("<I", pool.styles_data, pos)[0] != SPAN_END:
+                tag, first, last = struct.unpack_from("<III", pool.styles_data, pos)
+                spans.append((pool.get(tag), first, last))
+                pos += 12
+        values[name] = (pool.get(index), spans)
+    return values
+
+
+def iter_all_entries(table):
+    package = table.packages[0]
+    header_size, size = struct.unpack_from("<HI", table.data, package + 2)
+    for offset, chunk_type in iter_chunks(table.data, package + header_size, package + size):
+        if chunk_type == RES_TABLE_TYPE_TYPE:
+            for entry in iter_type_entries(table.data, offset):
+                yield offset, entry
+
+
+def test_patch_resources_arsc_reads_back(tmp_path):
+    keys = ["app_name", "quote", "styled", "upstream_only"]
+    data = build_table(["Termius", "Don't", "Press Enter", "New", "Nicht"], keys,
+                       [(0, 0), (1, 1), (2, 2), (3, 3)], [(1, 4)])
+    xml = tmp_path / "strings.xml"
+    xml.write_text("<resources>"
+                   "<string name=\"app_name\">Termius</string>"
+                   "<string name=\"quote\">别说 \\'hi\\' 和 \\\"bye\\\"</string>"
+                   "<string name=\"styled\">按 <b>回车</b> <i>\"  键 \"</i></string>"
+                   "<string name=\"missing\">缺失</string>"
+                   "</resources>", encoding="utf-8")
+    patched, changed, untranslated, stale = patch_string_resources(data, str(xml))
+    assert changed == {"app_name", "quote", "styled"}
+    assert untranslated == ["upstream_only"]
+    assert stale == ["missing"]
+    assert read_strings(patched) == {
+        "app_name": ("Termius", []),
+        "quote": ("别说 'hi' 和 \"bye\"", []),
+        "styled": ("按 回车   键 ", [("b", 2, 3), ("i", 5, 8)]),
+        "upstream_only": ("New", []),
+    }
+    # The localized configuration is left alone
+    table = ResourceTable(patched)
+    localized = [entry for _, entry in iter_all_entries(table)][-1]
+    assert table.string_pool.get(struct.unpack_from("<I", table.data, localized + 12)[0]) == "Nicht"
+    # Patching the patched table again is stable
+    assert read_strings(patch_string_resources(patched, str(xml))[0]) == read_strings(patched)
+
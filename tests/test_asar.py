@@ -0,0 +1,146 @@
+import os
+from types import SimpleNamespace
+
+import benchmark
+import lang
+from asar import AsarArchive, build_header, compute_integrity, walk_entries
+
+PACKED = {
+    "package.json": b'{"name":"termius-app"}',
+    "ui-process/assets/main.js": b'label:"Settings";' * 50,
+    "ui-process/assets/style.css": b"body{}",
+}
+UNPACKED = {"node_modules/@termius/native/index.js": b"module.exports=1;"}
+
+
+def make_archive(path):
+    """手工写出一个含打包条目、解包条目、可执行文件与符号链接的归档"""
+    root = {"files": {}}
+    data = b""
+    for file_path, content in {**PACKED, **UNPACKED}.items():
+        node = root
+        *dirs, name = file_path.split("/")
+        for part in dirs:
+            node = node["files"].setdefault(part, {"files": {}})
+        if file_path in UNPACKED:
+            node["files"][name] = {"size": len(content), "unpacked": True, "executable": True}
+            full_path = os.path.join(f"{path}.unpacked", *file_path.split("/"))
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "wb") as file:
+                file.write(content)
+            continue
+        node["files"][name] = {"size": len(content), "offset": str(len(data)), "integrity": compute_integrity(content)}
+        data += content
+    root["files"]["current"] = {"link": "ui-process"}
+    with open(path, "wb") as file:
+        file.write(build_header(root) + data)
+
+
+def read_all(archive):
+    contents = {}
+    for path, _ in walk_entries(archive.header["files"]):
+        data = archive.read(path)
+        contents[path] = bytes(data)
+        if isinstance(data, memoryview):
+            data.release()
+    return contents
+
+
+def assert_consistent(archive):
+    """打包条目的偏移连续且不重叠, 完整性信息与内容一致"""
+    offset = 0
+    for path, entry in walk_entries(archive.header["files"]):
+        data = archive.read(path)
+        assert len(data) == entry["size"]
+        if "integrity" in entry:
+            assert entry["integrity"] == compute_integrity(data)
+        if isinstance(data, memoryview):
+            data.release()
+        if not entry.get("unpacked"):
+            assert int(entry["offset"]) == offset
+            offset += entry["size"]
+    assert os.path.getsize(archive.path) == archive.data_offset + offset
+
+
+def test_write_without_changes_is_byte_identical(tmp_path):
+    source = str(tmp_path / "app.asar")
+    make_archive(source)
+    with AsarArchive(source) as archive:
+        archive.write(str(tmp_path / "copy.asar"), unpack_dirs=lang.UNPACK_DIRS)
+    assert (tmp_path / "copy.asar").read_bytes() == (tmp_path / "app.asar").read_bytes()
+    with AsarArchive(str(tmp_path / "copy.asar")) as copy:
+        assert read_all(copy) == {**PACKED, **UNPACKED}
+        assert copy.get_entry("current") == {"link": "ui-process"}
+
+
+def test_write_replacements_round_trip(tmp_path):
+    source = str(tmp_path / "app.asar")
+    make_archive(source)
+    replacements = {
+        "ui-process/assets/main.js": 'label:"设置";'.encode() * 50,
+        "node_modules/@termius/native/index.js": b"module.exports=2;",
+    }
+    dest = str(tmp_path / "out" / "app.asar")
+    os.makedirs(os.path.dirname(dest))
+    with AsarArchive(source) as archive:
+        archive.write(dest, replacements, lang.UNPACK_DIRS)
+    with AsarArchive(dest) as archive:
+        assert read_all(archive) == {**PACKED, **UNPACKED, **replacements}
+        assert_consistent(archive)
+        unpacked = archive.get_entry("node_modules/@termius/native/index.js")
+        assert unpacked["unpacked"] and "offset" not in unpacked
+    unpacked_file = tmp_path / "out" / "app.asar.unpacked" / "node_modules" / "@termius" / "native" / "index.js"
+    assert os.access(unpacked_file, os.X_OK)
+    # 原归档与其解包目录保持不变
+    with AsarArchive(source) as archive:
+        assert read_all(archive) == {**PACKED, **UNPACKED}
+
+
+def test_write_moves_files_under_unpack_dirs(tmp_path):
+    source = str(tmp_path / "app.asar")
+    make_archive(source)
+    with AsarArchive(source) as archive:
+        archive.write(str(tmp_path / "new.asar"), unpack_dirs=("ui-process",))
+    with AsarArchive(str(tmp_path / "new.asar")) as archive:
+        assert archive.get_entry("ui-process/assets/style.css")["unpacked"]
+        assert read_all(archive) == {**PACKED, **UNPACKED}
+        assert_consistent(archive)
+
+
+def patch_workspace(work_dir, **options):
+    """在 benchmark 生成的合成安装上执行一次完整替换, 返回修改器与结果归档的字节"""
+    args = SimpleNamespace(size=0.25, rules=120, regex_ratio=0.1, match_ratio=0.9, seed=7, jobs=1)
+    benchmark.prepare_workspace(str(work_dir), args)
+    modifier = benchmark.create_modifier(str(work_dir), args)
+    for name, value in options.items():
+        setattr(modifier.args, name, value)
+    modifier.apply_changes()
+    return modifier, (work_dir / "resources" / "app.asar").read_bytes()
+
+
+def test_max_memory_spill_matches_in_memory(tmp_path, monkeypatch):
+    spills = []
+    spill = lang.ReplacementSpool._spill
+    monkeypatch.setattr(lang.ReplacementSpool, "_spill", lambda self: spills.append(len(self._buffered)) or spill(self))
+    _, in_memory = patch_workspace(tmp_path / "memory")
+    # 上限远小于单个文件, 每个修改过的文件都会写入临时文件
+    streamed_modifier, streamed = patch_workspace(tmp_path / "stream", max_memory=0.01)
+    assert spills
+    assert streamed == in_memory
+    assert not os.path.exists(f"{streamed_modifier._original_path}.spool")
+
+
+def test_extract_links_unchanged_files_from_tree_cache(tmp_path):
+    modifier, _ = patch_workspace(tmp_path, extract=True)
+    app_dir = tmp_path / "resources" / "app"
+    tree_dir = tmp_path / "cache" / "trees" / modifier.read_backup_hash()
+    with AsarArchive(modifier._original_path) as archive:
+        for path, entry in walk_entries(archive.header["files"]):
+            data = archive.read(path)
+            assert (app_dir / path).read_bytes() == bytes(data)
+            if isinstance(data, memoryview):
+                data.release()
+            # 未修改的文件与缓存共用同一 inode, 修改过的文件单独写入
+            hashes = modifier.manifest.get(path)
+            unchanged = hashes is None or hashes["before"] == hashes["after"]
+            assert (os.stat(app_dir / path).st_ino == os.stat(tree_dir / path).st_ino) == unchanged
@@ -0,0 +1,91 @@
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import benchmark
+import lang
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """benchmark 生成的小型安装; 禁用 reflink, 还原时走硬链接"""
+    monkeypatch.setattr(lang, "fcntl", None)
+    args = SimpleNamespace(size=0.05, rules=40, regex_ratio=0.1, match_ratio=0.9, seed=3, jobs=1)
+    benchmark.prepare_workspace(str(tmp_path), args)
+    return lambda: benchmark.create_modifier(str(tmp_path), args)
+
+
+def sha256(path):
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def test_clone_file_methods(tmp_path, monkeypatch):
+    monkeypatch.setattr(lang, "fcntl", None)
+    src = tmp_path / "src"
+    src.write_bytes(b"asar" * 1000)
+    assert lang.clone_file(str(src), str(tmp_path / "link")) == ("hardlink", None)
+    assert os.path.samefile(src, tmp_path / "link")
+    # 创建备份时不使用硬链接, 复制时顺带计算哈希
+    assert lang.clone_file(str(src), str(tmp_path / "copy"), hardlink=False) == ("copy", sha256(src))
+    assert not os.path.samefile(src, tmp_path / "copy")
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_pack_breaks_hardlink_left_by_restore(workspace):
+    modifier = workspace()
+    modifier.apply_changes()
+    backup_hash = modifier.read_backup_hash()
+    assert sha256(modifier._backup_path) == backup_hash
+    assert sha256(modifier._original_path) != backup_hash
+
+    # 下一次运行先以硬链接还原, 随后的打包写入新文件再替换, 不会原地改动备份
+    modifier = workspace()
+    modifier.manage_workspace()
+    assert os.path.samefile(modifier._original_path, modifier._backup_path)
+    modifier.open_asar()
+    modifier.load_rules()
+    modifier.load_files()
+    modifier.replace_rules()
+    modifier.write_files()
+    modifier.pack_to_asar()
+    assert not os.path.samefile(modifier._original_path, modifier._backup_path)
+    assert sha256(modifier._backup_path) == backup_hash
+    assert sha256(modifier._original_path) != backup_hash
+
+
+def test_backup_shared_with_app_asar_is_separated(workspace):
+    modifier = workspace()
+    modifier.manage_workspace()
+    os.remove(modifier._backup_path)
+    os.link(modifier._original_path, modifier._backup_path)
+    modifier.create_backup()
+    assert not os.path.samefile(modifier._original_path, modifier._backup_path)
+    assert sha256(modifier._backup_path) == modifier.read_backup_hash()
+
+
+def test_restore_trusts_link_and_verifies_copy(workspace, monkeypatch):
+    modifier = workspace()
+    modifier.apply_changes()
+    hashed = []
+    hash_file = lang.hash_file
+    monkeypatch.setattr(lang, "hash_file", lambda path: hashed.append(path) or hash_file(path))
+    modifier.restore_backup()
+    # 大小与备份不同时无需读取 app.asar, 硬链接还原后也不重新计算哈希
+    assert hashed == []
+    assert os.path.samefile(modifier._original_path, modifier._backup_path)
+
+    # 已与备份一致时跳过还原
+    inode = os.stat(modifier._original_path).st_ino
+    modifier.restore_backup()
+    assert os.stat(modifier._original_path).st_ino == inode
+
+    # 回退为复制时校验备份的哈希
+    modifier.apply_changes()
+    monkeypatch.setattr(lang.os, "link", lambda *args: (_ for _ in ()).throw(OSError("no links")))
+    with open(modifier._backup_hash_path, "w", encoding="utf-8") as file:
+        file.write(f"{'0' * 64}  app.asar\n")
+    with pytest.raises(SystemExit):
+        modifier.restore_backup()
@@ -0,0 +1,19 @@
+import sys
+
+import pytest
+
+import lang
+
+
+@pytest.mark.parametrize("flags", [["--restore"], ["--check"], ["--watch"], ["--lint"], ["--find", "term"]])
+def test_batch_rejects_other_modes(monkeypatch, tmp_path, capsys, flags):
+    """--batch 与其余操作组合时报错退出, 不会以空规则集重新打包各安装"""
+    (tmp_path / "app.asar").write_bytes(b"untouched")
+    monkeypatch.setattr(sys, "argv", ["lang.py", "--batch", str(tmp_path), *flags])
+    monkeypatch.setattr(lang, "BatchModifier", None)
+    with pytest.raises(SystemExit) as exc_info:
+        lang.main()
+    assert exc_info.value.code == 2
+    assert f"--batch cannot be combined with {flags[0]}" in capsys.readouterr().err
+    assert (tmp_path / "app.asar").read_bytes() == b"untouched"
+    assert not (tmp_path / "app.asar.bak").exists()
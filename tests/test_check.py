@@ -0,0 +1,41 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+import benchmark
+
+REPORT_PREFIXES = ("Rules applied:", "Found ", "Unmatched rules", "All rules matched.")
+
+
+def report(caplog, run):
+    """执行 run 并返回 report_rules 输出的规则生效报告"""
+    caplog.clear()
+    with caplog.at_level(logging.DEBUG):
+        run()
+    return [record.getMessage() for record in caplog.records if record.getMessage().startswith(REPORT_PREFIXES)]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_check_reports_like_apply_without_touching_install(tmp_path, caplog, jobs):
+    args = SimpleNamespace(size=0.1, rules=80, regex_ratio=0.1, match_ratio=0.8, seed=5, jobs=jobs)
+    benchmark.prepare_workspace(str(tmp_path), args)
+    # 追加不会命中的规则, 以及只能命中前一条规则结果的规则
+    with open(tmp_path / "rules" / "localize.txt", "a", encoding="utf-8") as file:
+        file.write("never present in the corpus|X\nvar |var_\nvar_|VAR \n/never (\\d+)/|N\\1\n")
+    resources = tmp_path / "resources"
+    pristine = (resources / "app.asar").read_bytes()
+
+    checked = report(caplog, benchmark.create_modifier(str(tmp_path), args).check_rules)
+    assert (resources / "app.asar").read_bytes() == pristine
+    assert sorted(path.name for path in resources.iterdir()) == ["app.asar", "app.asar.unpacked"]
+
+    applied = report(caplog, benchmark.create_modifier(str(tmp_path), args).apply_changes)
+    assert checked == applied
+    assert any(message.startswith("Unmatched rules") for message in checked)
+
+    # 已修改过的安装以备份作为原始内容, app.asar 与备份均不改动
+    patched = (resources / "app.asar").read_bytes()
+    assert report(caplog, benchmark.create_modifier(str(tmp_path), args).check_rules) == applied
+    assert (resources / "app.asar").read_bytes() == patched
+    assert (resources / "app.asar.bak").read_bytes() == pristine
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import apktools
+
+PAYLOAD = bytes(range(256)) * 40
+VERSION = "5.12.3"
+SLUG = "termius-modern-ssh-client-5-12-3"
+APK_PATH = "/apk/termius-corporation/termius-ssh-telnet-client/"
+
+
+class StandIn:
+    """State shared with the handler: served files, Range support, requests to cut short, and a request log"""
+
+    def __init__(self):
+        self.files = {"/files/Termius.apkm": PAYLOAD, "/files/APKEditor.jar": PAYLOAD[::-1]}
+        self.ranges = True
+        # Paths (with the requested range start) whose next response is cut off halfway
+        self.interrupt = set()
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def pages(self, url):
+        return {
+            APK_PATH: '<div id="primary"><div class="listWidget p-relative"><div class="appRow">'
+                      f'<h5 class="appRowTitle">Termius - Modern SSH Client {VERSION}</h5></div></div></div>',
+            f"{APK_PATH}{SLUG}-release/{SLUG}-android-apk-download/":
+                f'<a class="downloadButton" href="{APK_PATH}download/">Download APK</a>',
+            # The download button's link is requested without its trailing slash
+            f"{APK_PATH}download": '<a id="download-link" href="/files/Termius.apkm">here</a>',
+            "/repos/REAndroid/APKEditor/releases/latest": json.dumps({"assets": [{
+                "browser_download_url": f"{url}/files/APKEditor.jar",
+                "size": len(PAYLOAD),
+                "digest": f"sha256:{hashlib.sha256(PAYLOAD[::-1]).hexdigest()}",
+            }]}),
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    stand_in = None
+    url = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        stand_in = self.stand_in
+        range_header = self.headers.get("Range")
+        with stand_in.lock:
+            stand_in.requests.append((self.path, range_header))
+        page = stand_in.pages(self.url).get(self.path)
+        if page is not None:
+            return self.respond(200, page.encode(), {"Content-Type": "text/html"})
+        data = stand_in.files.get(self.path)
+        if data is None:
+            return self.respond(404, b"not found")
+        headers = {"ETag": '"v1"'}
+        if not stand_in.ranges or not range_header:
+            return self.respond(200, data, headers, (self.path, range_header))
+        first, _, last = range_header.removeprefix("bytes=").partition("-")
+        first, last = int(first), min(int(last) if last else len(data) - 1, len(data) - 1)
+        headers["Content-Range"] = f"bytes {first}-{last}/{len(data)}"
+        self.respond(206, data[first:last + 1], headers, (self.path, first))
+
+    def respond(self, status, body, headers=(), key=None):
+        self.send_response(status)
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        key = key or (self.path, None)
+        with self.stand_in.lock:
+            cut = key in self.stand_in.interrupt
+            self.stand_in.interrupt.discard(key)
+        # An interrupted response announces the full length but stops halfway and closes the connection
+        self.wfile.write(body[:len(body) // 2] if cut else body)
+        self.close_connection = True
+
+
+class RecordingBar:
+    """Stands in for tqdm and keeps the running total"""
+
+    instances = []
+
+    def __init__(self, total=None, initial=0, **kwargs):
+        self.total = total
+        self.n = initial
+        self.updates = []
+        RecordingBar.instances.append(self)
+
+    def update(self, n):
+        self.n += n
+        self.updates.append(n)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    state = StandIn()
+    handler = type("StandInHandler", (Handler,), {"stand_in": state})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    handler.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    monkeypatch.setattr(apktools, "APKMIRROR_URL", handler.url)
+    monkeypatch.setattr(apktools, "BASE_APK_URL", f"{handler.url}{APK_PATH}")
+    monkeypatch.setattr(apktools, "GITHUB_API_URL", handler.url)
+    monkeypatch.setattr(apktools, "DOWNLOAD_CHUNK_SIZE", 256)
+    monkeypatch.setattr(apktools, "DOWNLOAD_SEGMENT_MIN_SIZE", 1024)
+    monkeypatch.setattr(apktools, "tqdm", RecordingBar)
+    RecordingBar.instances.clear()
+    state.url = handler.url
+    yield state
+    server.shutdown()
+    server.server_close()
+    apktools.close_session()
+
+
+def test_download_termius_apk_from_listing_pages(stand_in, tmp_path):
+    apktools.download_termius_apk(str(tmp_path), apktools.APKM_FILENAME)
+    assert (tmp_path / apktools.APKM_FILENAME).read_bytes() == PAYLOAD
+    assert not list(tmp_path.glob("*.part*"))
+    paths = [path for path, _ in stand_in.requests]
+    assert paths[:3] == [APK_PATH, f"{APK_PATH}{SLUG}-release/{SLUG}-android-apk-download/", f"{APK_PATH}download"]
+
+
+def test_download_apk_editor_checks_size_and_digest(stand_in, tmp_path):
+    apktools.download_apk_editor_jar(str(tmp_path), apktools.APK_EDITOR_FILENAME)
+    assert (tmp_path / apktools.APK_EDITOR_FILENAME).read_bytes() == PAYLOAD[::-1]
+
+
+def test_download_rejects_digest_mismatch(stand_in, tmp_path):
+    save_path = str(tmp_path / "Termius.apkm")
+    ok = apktools.download_file(apktools.create_session(), f"{stand_in.url}/files/Termius.apkm", save_path,
+                                len(PAYLOAD), "0" * 64)
+    assert not ok
+    assert not os.listdir(tmp_path)
+
+
+def test_download_splits_ranges_and_resumes_part_file(stand_in, tmp_path):
+    save_path = str(tmp_path / "Termius.apkm")
+    part_path = save_path + apktools.PART_SUFFIX
+    segments = apktools.plan_segments(len(PAYLOAD), True)
+    assert len(segments) == apktools.DOWNLOAD_SEGMENTS
+    # A previous run stopped 100 bytes into the first segment and finished the second one
+    with open(part_path, "wb") as f:
+        f.write(PAYLOAD[:100])
+    with open(apktools.segment_path(part_path, 1), "wb") as f:
+        f.write(PAYLOAD[segments[1][0]:segments[1][1] + 1])
+    with open(part_path + ".json", "w") as f:
+        json.dump({"size": len(PAYLOAD), "validator": '"v1"', "segments": segments}, f)
+
+    assert apktools.download_file(apktools.create_session(), f"{stand_in.url}/files/Termius.apkm", save_path,
+                                  len(PAYLOAD), hashlib.sha256(PAYLOAD).hexdigest())
+    assert open(save_path, "rb").read() == PAYLOAD
+    ranges = sorted(r for path, r in stand_in.requests if r and r != "bytes=0-0")
+    assert ranges == sorted([f"bytes=100-{segments[0][1]}"] + [f"bytes={s}-{e}" for s, e in segments[2:]])
+    assert RecordingBar.instances[-1].n == len(PAYLOAD)
+
+
+def test_download_restarts_when_validator_changes(stand_in, tmp_path):
+    save_path = str(tmp_path / "Termius.apkm")
+    part_path = save_path + apktools.PART_SUFFIX
+    with open(part_path, "wb") as f:
+        f.write(b"stale" * 20)
+    with open(part_path + ".json", "w") as f:
+        json.dump({"size": len(PAYLOAD), "validator": '"old"', "segments": [[0, len(PAYLOAD) - 1]]}, f)
+    assert apktools.download_file(apktools.create_session(), f"{stand_in.url}/files/Termius.apkm", save_path)
+    assert open(save_path, "rb").read() == PAYLOAD
+
+
+def test_download_without_range_support(stand_in, tmp_path):
+    stand_in.ranges = False
+    save_path = str(tmp_path / "Termius.apkm")
+    assert apktools.download_file(apktools.create_session(), f"{stand_in.url}/files/Termius.apkm", save_path)
+    assert open(save_path, "rb").read() == PAYLOAD
+    # One probe plus a single full download, no byte ranges
+    assert len(stand_in.requests) == 2
+    assert RecordingBar.instances[-1].n == len(PAYLOAD)
+
+
+def test_interrupted_segment_resumes_from_disk(stand_in, tmp_path):
+    segments = apktools.plan_segments(len(PAYLOAD), True)
+    stand_in.interrupt.add(("/files/Termius.apkm", segments[2][0]))
+    save_path = str(tmp_path / "Termius.apkm")
+    assert apktools.download_file(apktools.create_session(), f"{stand_in.url}/files/Termius.apkm", save_path)
+    assert open(save_path, "rb").read() == PAYLOAD
+    retried = [r for _, r in stand_in.requests if r and r.startswith("bytes=") and r != "bytes=0-0"
+               and segments[2][0] < int(r[6:].partition("-")[0]) <= segments[2][1]]
+    assert len(retried) == 1
+    assert RecordingBar.instances[-1].n == len(PAYLOAD)
+
+
+def test_interrupted_download_without_ranges_rolls_back_progress(stand_in, tmp_path):
+    stand_in.ranges = False
+    stand_in.interrupt.add(("/files/Termius.apkm", None))
+    save_path = str(tmp_path / "Termius.apkm")
+    assert apktools.download_file(apktools.create_session(), f"{stand_in.url}/files/Termius.apkm", save_path)
+    assert open(save_path, "rb").read() == PAYLOAD
+    # The restarted download counts every byte again, so the cut attempt must have been taken back off
+    bar = RecordingBar.instances[-1]
+    assert bar.n == len(PAYLOAD)
+    assert -len(PAYLOAD) // 2 in bar.updates
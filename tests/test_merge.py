@@ -0,0 +1,46 @@
+import xml.etree.ElementTree as ET
+
+from apktools import merge_language_xml
+
+TOOLS = "http://schemas.android.com/tools"
+XLIFF = "urn:oasis:names:tc:xliff:document:1.2"
+
+UPSTREAM = f"""<?xml version="1.0" encoding="utf-8"?>
+<resources xmlns:tools="{TOOLS}" xmlns:xliff="{XLIFF}">
+    <string name="app_name">Termius</string>
+    <string name="settings" tools:ignore="MissingTranslation">Settings</string>
+    <string name="copied">Copied <xliff:g id="count">%d</xliff:g> items</string>
+    <plurals name="hosts"><item quantity="one">%d host</item><item quantity="other">%d hosts</item></plurals>
+    <string name="upstream_only">New &amp; shiny</string>
+</resources>
+"""
+
+TRANSLATED = f"""<?xml version="1.0" encoding="utf-8"?>
+<resources xmlns:tools="{TOOLS}" xmlns:xliff="{XLIFF}">
+    <string name="settings" tools:ignore="MissingTranslation">设置</string>
+    <string name="copied">已复制 <xliff:g id="count">%d</xliff:g> 项</string>
+    <string name="removed_upstream">旧的</string>
+</resources>
+"""
+
+
+def test_merge_keeps_upstream_and_namespaced_attributes(tmp_path):
+    upstream, translated, out = tmp_path / "upstream.xml", tmp_path / "translated.xml", tmp_path / "out.xml"
+    upstream.write_text(UPSTREAM, encoding="utf-8")
+    translated.write_text(TRANSLATED, encoding="utf-8")
+    names, untranslated, stale = merge_language_xml(str(upstream), str(translated), str(out))
+    assert names == {"settings", "copied"}
+    assert untranslated == ["app_name", "upstream_only"]
+    assert stale == ["removed_upstream"]
+
+    root = ET.parse(out).getroot()
+    assert [(element.tag, element.get("name")) for element in root] == [
+        ("string", "app_name"), ("string", "settings"), ("string", "copied"), ("plurals", "hosts"),
+        ("string", "upstream_only")]
+    elements = {element.get("name"): element for element in root}
+    assert elements["settings"].text == "设置"
+    assert elements["settings"].get(f"{{{TOOLS}}}ignore") == "MissingTranslation"
+    assert "".join(elements["copied"].itertext()) == "已复制 %d 项"
+    assert elements["copied"][0].tag == f"{{{XLIFF}}}g"
+    assert elements["upstream_only"].text == "New & shiny"
+    assert [item.text for item in elements["hosts"]] == ["%d host", "%d hosts"]
@@ -0,0 +1,96 @@
+import random
+import re
+
+import pytest
+
+import lang
+
+
+def apply_sequentially(lines, content):
+    """逐条执行规则的参考实现(str.replace / re.sub), 返回 (结果, 生效的规则)"""
+    applied = set()
+    if not content:
+        return content, applied
+    for line in lines:
+        if lang.is_comment_line(line):
+            applied.add(line)
+            continue
+        try:
+            old_val, new_val = lang.parse_replace_rule(line)
+            before = content
+            if lang.is_regex_pattern(old_val):
+                content = re.sub(old_val[1:-1], new_val, content)
+            else:
+                content = content.replace(old_val, new_val)
+        except (ValueError, re.error):
+            continue
+        if content != before:
+            applied.add(line)
+    return content, applied
+
+
+def assert_same_as_sequential(lines, content):
+    applied = set()
+    assert (lang.RuleSet(lines).apply(content, applied), applied) == apply_sequentially(lines, content)
+
+
+@pytest.mark.parametrize("lines, content", [
+    # 后一条规则的模式由前一条规则产生
+    (["Open|Op", "Op|打开"], "Open Options"),
+    (["Sign in|Login", "Login|登录"], '"Sign in" "Login"'),
+    # 后一条规则的模式被前一条规则破坏
+    (["Settings|设置", "tings|X"], "Settings Meetings"),
+    # 重叠的字面量: 先执行的规则优先, 同一规则从左到右不重叠
+    (["abc|1", "bcd|2", "cd|3"], "abcd bcd cdcd"),
+    (["aa|a"], "aaaaa"),
+    (["ab|ba", "ba|ab"], "abab baba"),
+    # 删除文本后拼接出新的匹配
+    (["-|", "ab|Z"], "a-b a--b"),
+    # 前缀、后缀与原文相同的替换
+    (["Open file|Open files", "files|文件"], "Open file, Open files"),
+    # 正则规则: 分组引用、命名分组与反向引用
+    (["/(\\w+)=(\\1)/|\\2==\\1", "x==x|same"], "x=x y=z"),
+    (["/(?P<q>[\"'])(?P<t>Close)(?P=q)/|\\g<q>关闭\\g<q>", "关闭|關閉"], "\"Close\" 'Close' \"Close'"),
+    (["Dev|Developer", "/Developer (\\w+)/|开发者\\1"], "Dev Tools"),
+    # 锚点不存在的规则被跳过, 但其锚点可能由前面的规则产生
+    (["/missing(\\d+)/|M\\1", "absent|A"], "nothing to see"),
+    (["foo|missing1", "/missing(\\d+)/|M\\1"], "foo"),
+    (["/a+/|missing", "missing|found"], "caat"),
+    # 注释与无效规则
+    (["# 注释", "no separator", "/[/|x", "a|b"], "aaa"),
+    # 替换结果与原文相同的规则不算生效
+    (["same|same", "/s(a)me/|s\\1me", "same|SAME"], "same"),
+])
+def test_apply_matches_sequential_rules(lines, content):
+    assert_same_as_sequential(lines, content)
+
+
+def test_apply_batches_many_literal_rules():
+    # 超过 DIRECT_FIND_LIMIT 条候选规则并分成多个分段时改用整体扫描
+    words = [f"w{i}" for i in range(40)]
+    lines = [f"{word}|{words[(i + 1) % len(words)]}" for i, word in enumerate(words)]
+    lines[10:10] = ["/w(\\d)x/|v\\1"]
+    content = " ".join(f"{word}x {word}" for word in words)
+    assert_same_as_sequential(lines, content)
+
+
+def random_rule(rng, alphabet):
+    if rng.random() < 0.2:
+        pattern = rng.choice(["a(b)c", "(x)y*", "(a)(b)", "b[ac]", "y+", "(c)\\1", "a.?b", "(?P<g>z)(?P=g)?"])
+        template = rng.choice(["", "Q", "\\1", "Q\\1", "\\1\\1", "z\\1y"])
+        if "(" not in pattern:
+            template = template.replace("\\1", "")
+        return f"/{pattern}/|{template}"
+    old_val = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 3)))
+    new_val = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 4)))
+    return f"{old_val}|{new_val}"
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_apply_matches_sequential_on_random_rules(seed):
+    rng = random.Random(seed)
+    alphabet = "abcxyz"
+    for _ in range(400):
+        lines = [random_rule(rng, alphabet) for _ in range(rng.randint(1, 20))]
+        content = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+        assert_same_as_sequential(lines, content)
@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+
+import apktools
+
+SIGN = {"sign.keystore": "test.p12", "sign.keystore.password": "pw", "sign.key.alias": "key", "sign.key.password": "pw"}
+
+
+def write_properties(path, properties):
+    path.write_text("".join(f"{key}={value}\n" for key, value in properties.items()), encoding="utf-8")
+
+
+def test_load_variants(tmp_path):
+    write_properties(tmp_path / "other.properties", {**SIGN, "sign.keystore": "other.p12"})
+    manifest = tmp_path / "variants.json"
+    manifest.write_text(json.dumps([{"name": "zh", "strings": "zh.xml"},
+                                    {"name": "zh-TW", "strings": "tw.xml", "sign": "other.properties"}]))
+    variants = apktools.load_variants(str(manifest), str(tmp_path), SIGN)
+    assert variants == [
+        {"name": "zh", "language_xml": str(tmp_path / "zh.xml"), "sign_properties": SIGN},
+        {"name": "zh-TW", "language_xml": str(tmp_path / "tw.xml"), "sign_properties": {**SIGN, "sign.keystore": "other.p12"}},
+    ]
+
+
+@pytest.mark.parametrize("specs, message", [
+    ([], "No variants defined"),
+    ([{"name": "zh"}, {"name": "zh"}], "Duplicate variant name"),
+    ([{"name": "../zh"}], "Invalid variant name"),
+    ([{"strings": "zh.xml"}], "Invalid variant name"),
+    ([{"name": "zh", "sign": "missing.properties"}], "Invalid signature configuration"),
+])
+def test_load_variants_rejects_bad_manifest(tmp_path, specs, message):
+    (tmp_path / "missing.properties").write_text("sign.keystore=x.p12\n", encoding="utf-8")
+    manifest = tmp_path / "variants.json"
+    manifest.write_text(json.dumps(specs))
+    with pytest.raises(Exception, match=message):
+        apktools.load_variants(str(manifest), str(tmp_path), SIGN)
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """Replace the external tools and resource patching with stand-ins that record which stages ran"""
+    runs = []
+
+    def apkm_to_apk(apk_editor_jar, apkm_file, apk_file):
+        runs.append(("merge", os.path.basename(apkm_file)))
+        with open(apkm_file, "rb") as src, open(apk_file, "wb") as dst:
+            dst.write(b"apk:" + src.read())
+
+    def patch_apk_strings(apk_file, language_xml, out_apk_file):
+        runs.append(("patch", os.path.basename(language_xml)))
+        with open(apk_file, "rb") as apk, open(language_xml, "rb") as strings, open(out_apk_file, "wb") as out:
+            out.write(apk.read() + b"|" + strings.read())
+
+    def sign_apk(file_dir, tmp_dir, apk_filename, sign_properties, cross_check=False):
+        runs.append(("sign", apk_filename))
+        path = os.path.join(tmp_dir, apk_filename + apktools.EXT_APK)
+        with open(path, "rb") as apk:
+            data = apk.read()
+        # Like the real signer, replace the file instead of writing through a hardlink into the cache
+        with open(f"{path}.tmp", "wb") as apk:
+            apk.write(data + b"|signed:" + sign_properties["sign.keystore"].encode())
+        os.replace(f"{path}.tmp", path)
+
+    monkeypatch.setattr(apktools, "apkm_to_apk", apkm_to_apk)
+    monkeypatch.setattr(apktools, "patch_apk_strings", patch_apk_strings)
+    monkeypatch.setattr(apktools, "sign_apk", sign_apk)
+    for name, data in ((apktools.APKM_FILENAME, b"apkm"), (apktools.APK_EDITOR_FILENAME, b"jar"), ("test.p12", b"key"),
+                       ("zh.xml", b"<zh/>"), ("tw.xml", b"<tw/>")):
+        (tmp_path / name).write_bytes(data)
+    variants = [{"name": "zh", "language_xml": str(tmp_path / "zh.xml"), "sign_properties": SIGN},
+                {"name": "tw", "language_xml": str(tmp_path / "tw.xml"), "sign_properties": SIGN}]
+
+    def run(**kwargs):
+        runs.clear()
+        apktools.apk_file_modify(str(tmp_path), variants, **kwargs)
+        return sorted(runs)
+
+    return tmp_path, run
+
+
+def test_stage_cache_reruns_only_changed_stages(pipeline):
+    file_dir, run = pipeline
+    assert run() == [("merge", "Termius.apkm"), ("patch", "tw.xml"), ("patch", "zh.xml"),
+                     ("sign", "Termius_tw"), ("sign", "Termius_zh")]
+    outputs = {name: (file_dir / "out" / f"Termius_{name}.apk").read_bytes() for name in ("zh", "tw")}
+    assert outputs["zh"] == b"apk:apkm|<zh/>|signed:test.p12"
+
+    # Nothing changed: every stage is a cache hit and the exported APKs are the same
+    assert run() == []
+    assert {name: (file_dir / "out" / f"Termius_{name}.apk").read_bytes() for name in outputs} == outputs
+
+    # Editing one strings file re-runs only that variant's patch and sign
+    (file_dir / "zh.xml").write_bytes(b"<zh>new</zh>")
+    assert run() == [("patch", "zh.xml"), ("sign", "Termius_zh")]
+    assert (file_dir / "out" / "Termius_zh.apk").read_bytes() == b"apk:apkm|<zh>new</zh>|signed:test.p12"
+    assert (file_dir / "out" / "Termius_tw.apk").read_bytes() == outputs["tw"]
+
+    # A new keystore invalidates the sign stage only, a new APKM everything downstream of the merge
+    (file_dir / "test.p12").write_bytes(b"new key")
+    assert run() == [("sign", "Termius_tw"), ("sign", "Termius_zh")]
+    (file_dir / apktools.APKM_FILENAME).write_bytes(b"apkm v2")
+    assert run() == [("merge", "Termius.apkm"), ("patch", "tw.xml"), ("patch", "zh.xml"),
+                     ("sign", "Termius_tw"), ("sign", "Termius_zh")]
+
+    # Cached outputs were never modified through the hardlinks handed to later stages
+    for entry in (file_dir / apktools.DIR_CACHE / "patch").iterdir():
+        assert b"signed" not in entry.read_bytes()
+
+
+def test_no_cache_runs_every_stage(pipeline):
+    file_dir, run = pipeline
+    run()
+    assert len(run(use_cache=False)) == 5
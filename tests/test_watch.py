@@ -0,0 +1,67 @@
+import pytest
+
+import lang
+
+
+def watch_update(old_lines, new_lines, contents):
+    """像 --watch 一样增量更新多个文件, 返回 (更新后的文件, 新规则集, 重新替换的文件)"""
+    old_set, new_set = lang.RuleSet(old_lines), lang.RuleSet(new_lines)
+    watched = {}
+    for path, content in contents.items():
+        watched[path] = lang.WatchedFile(path, content, "before")
+        applied = set()
+        watched[path].update(old_set.apply(content, applied), applied)
+    change = lang.RuleChange(old_set, new_set)
+    replaced = {path for path, file in watched.items() if change.affects(file)}
+    for path in replaced:
+        applied = set()
+        watched[path].update(new_set.apply(contents[path], applied), applied)
+    return watched, new_set, replaced
+
+
+def assert_matches_full_run(watched, rule_set):
+    for file in watched.values():
+        applied = set()
+        assert file.output == rule_set.apply(file.pristine, applied)
+        assert file.applied | set(rule_set.comments) == applied
+
+
+@pytest.mark.parametrize("old_lines, new_lines, content", [
+    # 之后的正则规则在自己执行时能看到修改后的文本, 而最终结果中该处已被删除
+    (["a|", "/b[ac]/|Q", "b|"], ["a|c", "/b[ac]/|Q", "b|"], "accccba"),
+    (["aab|azb", "cc|bbz", "/ab?c/|", "a|z"], ["aab|azb", "/ab?c/|", "a|z"], "cccaaaccbacccb"),
+    # 正则命中可以离修改处任意远
+    (["old|new", "/Xa*Y/|Z"], ["old|Ynew", "/Xa*Y/|Z"], "X" + "a" * 5000 + "old"),
+    (["ab|x", "cd|", "xd|Q"], ["ab|y", "cd|", "xd|Q"], "abcdd"),
+])
+def test_watch_matches_full_run(old_lines, new_lines, content):
+    watched, rule_set, replaced = watch_update(old_lines, new_lines, {"app.js": content})
+    assert replaced == {"app.js"}
+    assert_matches_full_run(watched, rule_set)
+
+
+def test_watch_replaces_only_files_the_edited_rule_changed():
+    old_lines = ["/Dev (\\w+)/|开发\\1", "Settings|设置", "Open|打开"]
+    new_lines = ["/Dev (\\w+)/|开发\\1", "Settings|偏好设置", "Open|打开"]
+    contents = {"a.js": 'label:"Settings",title:"Open Dev Tools"', "b.js": 'title:"Open"', "c.js": "Dev Tools"}
+    watched, rule_set, replaced = watch_update(old_lines, new_lines, contents)
+    assert replaced == {"a.js"}
+    assert watched["a.js"].output == 'label:"偏好设置",title:"打开 开发Tools"'
+    assert_matches_full_run(watched, rule_set)
+
+
+def test_watch_added_rule_matching_text_joined_by_regex():
+    # 正则规则删掉 c 后分组内容 b 与其后的 y 拼成新规则的模式 by, 最终结果中 y 又被替换掉
+    old_lines = ["/a(b)c/|Q\\1", "y|w"]
+    new_lines = ["/a(b)c/|Q\\1", "by|Z", "y|w"]
+    watched, rule_set, replaced = watch_update(old_lines, new_lines, {"app.js": "xabcy"})
+    assert replaced == {"app.js"}
+    assert watched["app.js"].output == "xQZ"
+    assert_matches_full_run(watched, rule_set)
+
+
+def test_watch_skips_files_without_added_anchor():
+    watched, rule_set, replaced = watch_update(["Open|打开"], ["Open|打开", "Close|关闭"],
+                                               {"a.js": "Open", "b.js": "Close"})
+    assert replaced == {"b.js"}
+    assert_matches_full_run(watched, rule_set)